@@ -0,0 +1,299 @@
+# api_async.py
+"""
+Varian ASGI (async) dari JSON API dashboard.
+
+Builder context sama dengan app.py (build_*_context, dijalankan di thread
+pool) dan membaca snapshot yang sama (snapshots). Hanya saat snapshot masih
+dingin, query PostgreSQL-nya diambil dulu lewat asyncpg (pool async) supaya
+worker tidak tertahan menunggu database; snapshot yang sudah hangat tidak
+memicu query apa pun. Selama circuit breaker DB terbuka (db_breaker), query
+async dilewati dan loader langsung memakai fallback Excel.
+
+Jalankan:
+    uvicorn api_async:app --host 0.0.0.0 --port 8000 --workers 2
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import asyncpg
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import data_versions
+import db_breaker
+import snapshots
+from asuransi_module import build_asuransi_context
+from dana_pensiun_module import build_dana_pensiun_context
+from database import DATABASE_URL
+from db_loaders import QUERIES, use_prefetched
+from executor import run_sections_async, submit_to
+from komoditas_module import (
+    build_komoditas_context,
+    build_kredit_lokasi_context,
+    empty_komoditas_context,
+    empty_kredit_lokasi_context,
+)
+from perbankan_module import build_dashboard_context
+from serialization import to_jsonable
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Ukuran pool asyncpg per worker
+ASYNC_DB_POOL_MIN = int(os.environ.get("ASYNC_DB_POOL_MIN", "1"))
+ASYNC_DB_POOL_MAX = int(os.environ.get("ASYNC_DB_POOL_MAX", "10"))
+ASYNC_DB_TIMEOUT = float(os.environ.get("ASYNC_DB_TIMEOUT", "10"))
+
+# Batas waktu (detik) per section dashboard, sama seperti app.py
+SECTION_TIMEOUT = float(os.environ.get("SECTION_TIMEOUT", "20"))
+
+# SSE, sama seperti app.py; di sini koneksi hanya menunggu secara async
+SSE_MAX_DURATION = float(os.environ.get("SSE_MAX_DURATION", "300"))
+SSE_KEEPALIVE = float(os.environ.get("SSE_KEEPALIVE", "15"))
+SSE_SWAP_WAIT = float(os.environ.get("SSE_SWAP_WAIT", "30"))
+_SWAP_POLL = 0.25
+
+_pool = None
+_version_changed = None  # asyncio.Event, diganti baru setiap ada event versi
+
+
+# -------------------------------------------------
+# POOL & QUERY ASYNC
+# -------------------------------------------------
+def _is_outage(error: BaseException) -> bool:
+    """Error asyncpg yang menandakan DB tidak bisa dihubungi (dihitung oleh breaker)."""
+    return isinstance(error, (
+        OSError,
+        asyncio.TimeoutError,
+        asyncpg.exceptions.PostgresConnectionError,
+        asyncpg.exceptions.InterfaceError,
+    ))
+
+
+async def fetch_frame(name: str) -> pd.DataFrame:
+    """Jalankan query dataset `name` lewat asyncpg dan kembalikan DataFrame mentah."""
+    db_breaker.check()
+    if _pool is None:
+        raise ConnectionError("pool database async tidak tersedia")
+    try:
+        async with _pool.acquire(timeout=ASYNC_DB_TIMEOUT) as conn:
+            stmt = await conn.prepare(QUERIES[name])
+            columns = [a.name for a in stmt.get_attributes()]
+            rows = await stmt.fetch(timeout=ASYNC_DB_TIMEOUT)
+    except Exception as e:
+        if _is_outage(e):
+            db_breaker.record_failure(e)
+        raise
+    db_breaker.record_success()
+    return pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+
+def _is_warm(name: str) -> bool:
+    """Data query `name` sudah ada di memori (nama query = nama snapshot dashboard-nya)."""
+    return snapshots.is_loaded(name)
+
+
+async def prefetch(names: list[str]) -> dict:
+    """
+    Ambil dataset yang snapshot-nya masih dingin secara konkuren; dataset
+    yang sudah hangat dilewati (builder membaca snapshot).
+    Return: dict nama → DataFrame, atau exception kalau query gagal
+    (loader sinkron akan langsung fallback ke Excel tanpa mencoba DB lagi).
+    """
+    names = [n for n in names if not _is_warm(n)]
+    if not names:
+        return {}
+    results = await asyncio.gather(*(fetch_frame(n) for n in names), return_exceptions=True)
+    frames = {}
+    for name, res in zip(names, results):
+        if isinstance(res, BaseException):
+            logger.error(f"❌ [ASYNC] Gagal query '{name}': {res}")
+        frames[name] = res
+    return frames
+
+
+def _build_job(builder, frames: dict, args):
+    """Builder context tanpa argumen yang memakai frame prefetch (untuk pool section)."""
+    req = SimpleNamespace(args=args)
+
+    def job():
+        with use_prefetched(frames):
+            return builder(req)
+
+    return job
+
+
+async def run_build(builder, frames: dict, args):
+    """Jalankan builder context (CPU-bound, pandas) di thread pool dengan frame prefetch."""
+    return await asyncio.wrap_future(submit_to("section", _build_job(builder, frames, args)))
+
+
+# -------------------------------------------------
+# SERIALISASI JSON
+# -------------------------------------------------
+def json_response(ctx: dict, status_code: int = 200) -> JSONResponse:
+    return JSONResponse(to_jsonable(ctx), status_code=status_code)
+
+
+# -------------------------------------------------
+# ENDPOINT
+# -------------------------------------------------
+async def api_perbankan(request):
+    frames = await prefetch(["perbankan", "npl_ldr", "umkm", "konv_syariah"])
+    ctx = await run_build(build_dashboard_context, frames, request.query_params)
+    return json_response(ctx)
+
+
+async def api_dana_pensiun(request):
+    frames = await prefetch(["dana_pensiun"])
+    ctx = await run_build(build_dana_pensiun_context, frames, request.query_params)
+    return json_response(ctx)
+
+
+async def api_asuransi(request):
+    frames = await prefetch(["asuransi"])
+    ctx = await run_build(build_asuransi_context, frames, request.query_params)
+    return json_response(ctx)
+
+
+async def api_komoditas(request):
+    frames = await prefetch(["jumlah_petani", "kredit_lokasi"])
+    args = request.query_params
+
+    # Kedua section dibangun bersamaan (slot & batas waktu sama dengan app.py);
+    # yang gagal / lambat / tidak kebagian slot jadi placeholder
+    results = await run_sections_async(
+        {
+            "komoditas": _build_job(build_komoditas_context, frames, args),
+            "kredit_lokasi": _build_job(build_kredit_lokasi_context, frames, args),
+        },
+        timeout=SECTION_TIMEOUT,
+    )
+
+    kom_ctx, kom_err = results["komoditas"]
+    krl_ctx, krl_err = results["kredit_lokasi"]
+    ctx = kom_ctx if kom_ctx is not None else empty_komoditas_context(kom_err)
+    ctx.update(krl_ctx if krl_ctx is not None else empty_kredit_lokasi_context(krl_err))
+    return json_response(ctx)
+
+
+# -------------------------------------------------
+# EVENT PERUBAHAN DATA (SSE)
+# -------------------------------------------------
+def _signal_versions():
+    global _version_changed
+    changed, _version_changed = _version_changed, asyncio.Event()
+    changed.set()
+
+
+def _watch_versions(loop):
+    """Satu thread per proses menunggu event data_versions lalu membangunkan semua stream."""
+    seq = data_versions.current_seq()
+    while not loop.is_closed():
+        seq, events = data_versions.wait_events(seq, timeout=SSE_KEEPALIVE)
+        if not events:
+            continue
+        try:
+            loop.call_soon_threadsafe(_signal_versions)
+        except RuntimeError:
+            return  # event loop sudah ditutup
+
+
+async def _wait_served(dataset: str, version: int):
+    """Versi async dari snapshots.wait_served (maks SSE_SWAP_WAIT detik)."""
+    deadline = time.monotonic() + SSE_SWAP_WAIT
+    while snapshots.served_version(dataset) < version and time.monotonic() < deadline:
+        await asyncio.sleep(_SWAP_POLL)
+
+
+async def events_data_versions(request):
+    """
+    Server-sent events, format sama dengan /events/data-versions di app.py.
+    Koneksi menunggu di event loop (tanpa menahan thread), jadi jumlah tab
+    yang terbuka tidak dibatasi jumlah worker.
+    """
+    async def stream():
+        seq = data_versions.current_seq()
+        yield "retry: 3000\n"
+        versions = {k: str(v) for k, v in data_versions.snapshot().items()}
+        yield f"id: {seq}\nevent: snapshot\ndata: {json.dumps(versions)}\n\n"
+
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while time.monotonic() < deadline:
+            # Ambil Event sebelum cek, supaya event di antara keduanya tidak terlewat
+            changed = _version_changed
+            seq, events = data_versions.wait_events(seq, timeout=0)
+            if not events:
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                continue
+            for ev_seq, dataset, version in events:
+                await _wait_served(dataset, version)
+                payload = json.dumps({"dataset": dataset, "version": str(version)})
+                yield f"id: {ev_seq}\nevent: data-version\ndata: {payload}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+async def api_health(request):
+    status = {"status": "ok", "db_pool": _pool is not None, "db_breaker": db_breaker.status()}
+    if _pool is not None:
+        status["db_pool_size"] = _pool.get_size()
+        status["db_pool_idle"] = _pool.get_idle_size()
+    return json_response(status)
+
+
+# -------------------------------------------------
+# LIFESPAN & APP
+# -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app):
+    global _pool, _version_changed
+    logger.info("🚀 Memulai API async...")
+    _version_changed = asyncio.Event()
+    data_versions.ensure_started()
+    threading.Thread(
+        target=_watch_versions, args=(asyncio.get_running_loop(),), name="sse-versions", daemon=True
+    ).start()
+    try:
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=ASYNC_DB_POOL_MIN,
+            max_size=ASYNC_DB_POOL_MAX,
+            timeout=ASYNC_DB_TIMEOUT,
+        )
+        logger.info(f"✅ Pool asyncpg siap: {ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} koneksi")
+    except Exception as e:
+        # Tetap jalan: semua loader akan fallback ke Excel
+        logger.error(f"❌ Gagal membuat pool asyncpg: {e}")
+        _pool = None
+    try:
+        yield
+    finally:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+app = Starlette(
+    routes=[
+        Route("/api/v1/perbankan", api_perbankan),
+        Route("/api/v1/dana-pensiun", api_dana_pensiun),
+        Route("/api/v1/asuransi", api_asuransi),
+        Route("/api/v1/komoditas", api_komoditas),
+        Route("/api/v1/health", api_health),
+        Route("/events/data-versions", events_data_versions),
+    ],
+    lifespan=lifespan,
+)
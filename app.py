@@ -1,17 +1,47 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, send_file, stream_with_context
+import hashlib
+import json
 import logging
 import os
-
-from perbankan_module import build_dashboard_context
-from dana_pensiun_module import build_dana_pensiun_context
-from asuransi_module import build_asuransi_context
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+
+from perbankan_module import build_dashboard_context, build_dashboard_filters
+from dana_pensiun_module import (
+    DP_LEADERBOARD_METRICS,
+    build_dana_pensiun_context,
+    build_dana_pensiun_filters,
+    dana_pensiun_leaderboard,
+    get_dana_pensiun_matrix,
+)
+from asuransi_module import build_asuransi_context, build_asuransi_filters
 from komoditas_module import (
     build_komoditas_context,
+    build_komoditas_filters,
     build_kredit_lokasi_context,
+    build_kredit_lokasi_filters,
+    empty_komoditas_context,
+    empty_kredit_lokasi_context,
+    get_kredit_lokasi_matrix,
+    kredit_lokasi_heatmap,
 )
 from database import init_db, test_db_connection, db
 from models import PerbankanSummary, Asuransi, DanaPensiun
+from regions import canonical_province
+from executor import run_sections
+from compression import init_compression
+from assets import init_assets
+from templating import init_template_cache, precompile_templates, register_macros, render_blocks
+import data_versions
+import db_breaker
+import snapshots
+from context_cache import get_or_build, make_key
+from query_engine import QueryError, QueryTimeout, query_catalog, run_query
+from exporter import EXPORT_DATASETS, EXPORT_SYNC_WAIT, ExportBusy, csv_stream, get_job, job_file, open_export, start_xlsx_job
+from serialization import to_jsonable
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,6 +49,24 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-key")
+init_template_cache(app)  # sebelum jinja_env dipakai (init_assets)
+init_compression(app)
+init_assets(app)
+register_macros(app)  # macro format dipakai juga saat render block panel
+
+# Batas waktu (detik) per section dashboard yang dibangun paralel
+SECTION_TIMEOUT = float(os.environ.get("SECTION_TIMEOUT", "20"))
+
+# Lama maksimum satu koneksi SSE (detik); browser otomatis reconnect setelahnya,
+# jadi worker sync tidak tertahan selamanya oleh satu tab
+SSE_MAX_DURATION = float(os.environ.get("SSE_MAX_DURATION", "300"))
+SSE_KEEPALIVE = float(os.environ.get("SSE_KEEPALIVE", "15"))
+# Event versi ditahan sampai snapshot versi itu terpasang (maks detik ini)
+SSE_SWAP_WAIT = float(os.environ.get("SSE_SWAP_WAIT", "30"))
+# Batas koneksi SSE bersamaan per proses: tiap koneksi menahan satu thread
+# worker, jadi harus jauh di bawah jumlah thread (gunicorn -k gthread --threads)
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", "4"))
+_sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
 
 
 def month_name(num: int | str) -> str | None:
@@ -50,15 +98,210 @@ logger.info("=" * 50)
 logger.info("🚀 Memulai aplikasi Flask...")
 logger.info("=" * 50)
 init_db(app)
+precompile_templates(app)
 logger.info("=" * 50)
 
+def build_komoditas_page_context(req):
+    # Kedua section independen → dibangun bersamaan di thread pool.
+    # request (context-local Flask) tidak bisa dipakai dari thread lain,
+    # jadi builder menerima salinan query string saja.
+    results = run_sections(
+        {
+            "komoditas": lambda: build_komoditas_context(req),
+            "kredit_lokasi": lambda: build_kredit_lokasi_context(req),
+        },
+        timeout=SECTION_TIMEOUT,
+    )
+
+    # Section yang gagal / lambat dirender sebagai placeholder
+    kom_ctx, kom_err = results["komoditas"]
+    krl_ctx, krl_err = results["kredit_lokasi"]
+    ctx = kom_ctx if kom_ctx is not None else empty_komoditas_context(kom_err)
+    ctx.update(krl_ctx if krl_ctx is not None else empty_kredit_lokasi_context(krl_err))  # gabung kedua context
+    return ctx
+
+
+def build_komoditas_page_filters(req):
+    """Dropdown & filter terpilih halaman komoditas (untuk shell HTML, tanpa agregasi)."""
+    ctx = {}
+    for name, build, empty in (
+        ("komoditas", build_komoditas_filters, empty_komoditas_context),
+        ("kredit_lokasi", build_kredit_lokasi_filters, empty_kredit_lokasi_context),
+    ):
+        try:
+            ctx.update(build(req))
+        except Exception as e:
+            # Dropdown kosong; panel section ini menampilkan pesan error-nya sendiri
+            logger.error(f"❌ [DASHBOARD] Filter {name} gagal dibangun: {e}")
+            ctx.update(empty("gagal memuat data"))
+    return ctx
+
+
+# -------------------------------------------------
+# REGISTRI DASHBOARD: builder, dataset sumber, data chart
+# -------------------------------------------------
+# Halaman dashboard hanya shell HTML (template + dropdown dari `filters`);
+# isi panel (KPI, tabel) dimuat lewat /api/panels/<dashboard> dan data chart
+# (nilai default kalau key tidak ada di context) lewat /api/charts/<dashboard>.
+DASHBOARDS = {
+    "perbankan": {
+        "builder": build_dashboard_context,
+        "filters": build_dashboard_filters,
+        "template": "dashboard.html",
+        "datasets": ("perbankan", "umkm", "konv_syariah"),
+        "charts": {
+            "mini_labels": [], "mini_aset": [], "mini_kredit": [], "mini_dpk": [],
+            "year_labels": [], "year_giro_series": [], "year_tab_series": [], "year_dep_series": [],
+            "share_giro": 0, "share_tab": 0, "share_dep": 0,
+            "share_kons": 0, "share_prod": 0, "share_mk": 0, "share_inv": 0,
+            "giro_val": 0, "tab_val": 0, "dep_val": 0,
+            "produktif_val": 0, "konsumtif_val": 0, "mk_val": 0, "inv_val": 0,
+            "npl_labels": [], "npl_series": [], "ldr_series": [],
+            "umkm_year_labels": [], "umkm_year_kredit": [], "umkm_year_npl_ratio": [], "umkm_year_kpr": [],
+            "umkm_share_labels": [], "umkm_share_values": [],
+            "ks_share_labels": [], "ks_share_values": [],
+        },
+    },
+    "dana-pensiun": {
+        "builder": build_dana_pensiun_context,
+        "filters": build_dana_pensiun_filters,
+        "template": "dashboard_dana_pensiun.html",
+        "datasets": ("dana_pensiun",),
+        "charts": {
+            "dp_mini_labels": [], "dp_mini_aset": [], "dp_mini_invest": [],
+            "dp_ratio_labels": [], "dp_ratio_invest": [], "dp_ratio_asetnet": [],
+        },
+    },
+    "asuransi": {
+        "builder": build_asuransi_context,
+        "filters": build_asuransi_filters,
+        "template": "dashboard_asuransi.html",
+        "datasets": ("asuransi",),
+        "charts": {
+            "as_trend_labels": [], "as_trend_premi": [], "as_trend_klaim": [], "as_trend_lossratio": [],
+            "as_trend_lossratio_peserta": [], "as_trend_lossratio_polis": [],
+            "as_trend_avg_premi_polis": [], "as_trend_avg_klaim_peserta": [],
+            "as_share_labels": [], "as_share_values": [],
+        },
+    },
+    "komoditas": {
+        "builder": build_komoditas_page_context,
+        "filters": build_komoditas_page_filters,
+        "template": "dashboard_komoditas.html",
+        "datasets": ("komoditas", "komoditas_kabkota", "jumlah_petani", "kredit_lokasi"),
+        "charts": {
+            "kom_kom_labels": [], "kom_kom_values": [], "kom_prov_labels": [], "kom_prov_values": [],
+            "kab_prod_top_labels": [], "kab_prod_top_values": [],
+            "kab_luas_top_labels": [], "kab_luas_top_values": [],
+            "kab_prodperha_top_labels": [], "kab_prodperha_top_values": [],
+            "kab_labels": [], "kab_prod_values": [], "kab_luas_values": [], "kab_prod_per_ha_values": [],
+            "krl_lokasi_labels": [], "krl_lokasi_values": [],
+            "krl_sektor_labels": [], "krl_sektor_values": [],
+            "petani_labels": [], "petani_values": [],
+        },
+    },
+}
+
+# Nilai share dibulatkan 2 desimal (sebelumnya |round(2) di template)
+ROUNDED_CHART_KEYS = {"share_giro", "share_tab", "share_dep", "share_kons", "share_prod", "share_mk", "share_inv"}
+
+# Data chart memuat versi data di URL-nya, jadi aman di-cache browser lama
+CHART_DATA_MAX_AGE = int(os.environ.get("CHART_DATA_MAX_AGE", "86400"))
+# Shell HTML dashboard: ETag dari versi data + filter, boleh dipakai ulang
+# browser selama sekian detik sebelum divalidasi ulang (304 kalau sama)
+DASHBOARD_SHELL_MAX_AGE = int(os.environ.get("DASHBOARD_SHELL_MAX_AGE", "60"))
+
+
+def _shell_revision() -> str:
+    """Sidik template & manifest aset: ETag shell berganti setiap deploy."""
+    h = hashlib.blake2b(digest_size=8)
+    paths = [os.path.join(app.static_folder, "dist", "manifest.json")]
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        paths.extend(os.path.join(root, f) for f in sorted(files))
+    for path in sorted(paths):
+        try:
+            h.update(f"{path}:{os.stat(path).st_mtime_ns}".encode())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+SHELL_REVISION = _shell_revision()
+
+
+def data_version_token(name: str) -> str:
+    """
+    Gabungan versi dataset sumber sebuah dashboard (untuk URL & kunci cache).
+    Memakai versi snapshot yang sedang dilayani, jadi token baru berganti
+    setelah refresher memasang data versi baru.
+    """
+    return "-".join(str(snapshots.served_version(d)) for d in DASHBOARDS[name]["datasets"])
+
+
+def dashboard_context(name: str):
+    """Context dashboard untuk request ini, dibangun sekali per filter + versi data."""
+    args = request.args.copy()
+    args.pop("v", None)  # penanda versi di URL data chart, bukan filter
+    key = make_key(name, args, data_version_token(name))
+    builder = DASHBOARDS[name]["builder"]
+    return get_or_build(key, lambda: builder(SimpleNamespace(args=args)))
+
+
+def dashboard_filters(name: str):
+    """Dropdown & filter terpilih dashboard (tanpa agregasi), di-cache seperti context."""
+    args = request.args.copy()
+    args.pop("v", None)
+    key = make_key(f"{name}:filters", args, data_version_token(name))
+    build = DASHBOARDS[name]["filters"]
+    return get_or_build(key, lambda: build(SimpleNamespace(args=args)))
+
+
+def render_dashboard(name: str):
+    """
+    Shell HTML dashboard: hanya dropdown & filter terpilih. Panel dan chart
+    diisi browser dari endpoint JSON ber-versi, jadi render halaman tidak
+    menunggu builder context penuh. Revalidasi dengan ETag yang sama → 304.
+    """
+    token = data_version_token(name)
+    chart_args = {k: v for k, v in request.args.items() if k != "v"}
+    digest = hashlib.blake2b(repr((SHELL_REVISION, make_key(name, chart_args, token))).encode(), digest_size=16)
+    etag = digest.hexdigest()
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(render_template(
+            DASHBOARDS[name]["template"],
+            chart_data_url=url_for("chart_data", dashboard=name, v=token, **chart_args),
+            panels_url=url_for("panel_data", dashboard=name, v=token, **chart_args),
+            panels=False,
+            **dashboard_filters(name),
+        ), mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.max_age = DASHBOARD_SHELL_MAX_AGE
+    response.cache_control.private = True
+    return response
+
+
+def versioned_json(payload: dict, dashboard: str):
+    """Respons JSON data dashboard (chart / panel) dengan ETag."""
+    response = jsonify(to_jsonable(payload))
+    response.add_etag()
+    # URL dengan ?v=<versi data> tidak akan berubah isinya → boleh di-cache lama
+    if request.args.get("v") == data_version_token(dashboard):
+        response.cache_control.max_age = CHART_DATA_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
 # -------------------------------------------------
 # ROUTE DASHBOARD PERBANKAN (utama)
 # -------------------------------------------------
 @app.route("/")
 def dashboard():
-    ctx = build_dashboard_context(request)
-    return render_template("dashboard.html", **ctx)
+    return render_dashboard("perbankan")
 
 
 # -------------------------------------------------
@@ -74,8 +317,7 @@ def dashboard_perbankan():
 # -------------------------------------------------
 @app.route("/dashboard/nonbank/dana-pensiun")
 def dashboard_dana_pensiun():
-    ctx = build_dana_pensiun_context(request)
-    return render_template("dashboard_dana_pensiun.html", **ctx)
+    return render_dashboard("dana-pensiun")
 
 
 # -------------------------------------------------
@@ -83,22 +325,223 @@ def dashboard_dana_pensiun():
 # -------------------------------------------------
 @app.route("/dashboard/nonbank/asuransi")
 def dashboard_asuransi():
-    ctx = build_asuransi_context(request)
-    return render_template("dashboard_asuransi.html", **ctx)
+    return render_dashboard("asuransi")
 
 
-# -------------------------------------------------
-# ROUTE DASHBOARD komoditas
-# -------------------------------------------------
 # -------------------------------------------------
 # ROUTE DASHBOARD komoditas + kredit lokasi
 # -------------------------------------------------
 @app.route("/dashboard/komoditas")
 def dashboard_komoditas():
-    kom_ctx = build_komoditas_context(request)
-    krl_ctx = build_kredit_lokasi_context(request)
-    kom_ctx.update(krl_ctx)  # gabung kedua context
-    return render_template("dashboard_komoditas.html", **kom_ctx)
+    return render_dashboard("komoditas")
+
+
+# -------------------------------------------------
+# ROUTE DATA CHART (JSON per dashboard)
+# -------------------------------------------------
+@app.route("/api/charts/<dashboard>")
+def chart_data(dashboard):
+    """Series chart sebuah dashboard untuk filter yang sama dengan halaman."""
+    if dashboard not in DASHBOARDS:
+        return jsonify({"error": f"dashboard '{dashboard}' tidak dikenal"}), 404
+
+    ctx = dashboard_context(dashboard)
+    payload = {}
+    for key, default in DASHBOARDS[dashboard]["charts"].items():
+        val = ctx.get(key)
+        if val is None:
+            val = default
+        elif key in ROUNDED_CHART_KEYS:
+            val = round(float(val), 2)
+        payload[key] = val
+    return versioned_json(payload, dashboard)
+
+
+# -------------------------------------------------
+# ROUTE PANEL DASHBOARD (HTML per panel, JSON)
+# -------------------------------------------------
+@app.route("/api/panels/<dashboard>")
+def panel_data(dashboard):
+    """HTML tiap panel (block panel_* template) untuk filter yang sama dengan halaman."""
+    if dashboard not in DASHBOARDS:
+        return jsonify({"error": f"dashboard '{dashboard}' tidak dikenal"}), 404
+
+    ctx = dict(dashboard_context(dashboard), panels=True)
+    return versioned_json(render_blocks(app, DASHBOARDS[dashboard]["template"], "panel_", ctx), dashboard)
+
+
+# -------------------------------------------------
+# ROUTE HEATMAP KREDIT LOKASI (sektor × lokasi)
+# -------------------------------------------------
+@app.route("/api/kredit-lokasi/heatmap")
+def kredit_lokasi_heatmap_data():
+    """Matriks kredit sektor × lokasi, urut total menurun (opsional grup, top_sektor / top_lokasi)."""
+    try:
+        top_sektor = int(request.args["top_sektor"]) if request.args.get("top_sektor") else None
+        top_lokasi = int(request.args["top_lokasi"]) if request.args.get("top_lokasi") else None
+    except ValueError:
+        return jsonify({"error": "top_sektor / top_lokasi harus bilangan bulat positif"}), 400
+    if (top_sektor is not None and top_sektor < 1) or (top_lokasi is not None and top_lokasi < 1):
+        return jsonify({"error": "top_sektor / top_lokasi harus bilangan bulat positif"}), 400
+
+    # grup: SEMUA (sektor utama), nama sektor utama, atau PERKEBUNAN; default semua sub-sektor
+    matrix = get_kredit_lokasi_matrix()
+    grup = (request.args.get("grup") or "").strip()
+    if grup and grup not in matrix["views"]:
+        return jsonify({"error": f"grup '{grup}' tidak dikenal", "grup_list": list(matrix["views"])}), 400
+    payload = kredit_lokasi_heatmap(matrix["views"][grup] if grup else matrix, top_sektor, top_lokasi)
+    response = jsonify(to_jsonable(payload))
+    response.add_etag()
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+# -------------------------------------------------
+# ROUTE LEADERBOARD PROVINSI DANA PENSIUN
+# -------------------------------------------------
+@app.route("/api/dana-pensiun/leaderboard")
+def dana_pensiun_leaderboard_data():
+    """Peringkat provinsi menurut satu metrik pada satu periode (metric, tahun, bulan, negara, order, limit)."""
+    metric = request.args.get("metric") or "aset"
+    if metric not in DP_LEADERBOARD_METRICS:
+        return jsonify({"error": f"metric '{metric}' tidak dikenal", "metric_list": list(DP_LEADERBOARD_METRICS)}), 400
+    order = request.args.get("order") or "desc"
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "order harus 'asc' atau 'desc'"}), 400
+    try:
+        tahun = int(request.args["tahun"]) if request.args.get("tahun") else None
+        bulan = int(request.args["bulan"]) if request.args.get("bulan") else None
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+    except ValueError:
+        return jsonify({"error": "tahun / bulan / limit harus bilangan bulat"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "limit harus bilangan bulat positif"}), 400
+
+    payload = dana_pensiun_leaderboard(
+        get_dana_pensiun_matrix(), metric, tahun, bulan,
+        negara=request.args.get("negara") or "", descending=order == "desc", limit=limit,
+    )
+    response = jsonify(to_jsonable(payload))
+    response.add_etag()
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+# -------------------------------------------------
+# ROUTE QUERY AD-HOC (spec JSON, lihat query_engine)
+# -------------------------------------------------
+@app.route("/api/v1/query", methods=["GET", "POST"])
+def api_query():
+    """GET: katalog dataset & batas. POST: jalankan spec query JSON."""
+    if request.method == "GET":
+        return jsonify(query_catalog())
+
+    spec = request.get_json(silent=True)
+    start = time.perf_counter()
+    try:
+        result = run_query(spec)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueryTimeout as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    except Exception as e:
+        logger.error(f"❌ [QUERY] Gagal menjalankan query: {e}")
+        return jsonify({"error": "gagal memuat data"}), 503
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return jsonify(to_jsonable(result))
+
+
+# -------------------------------------------------
+# ROUTE EKSPOR DATA (filter sama dengan dashboard)
+# -------------------------------------------------
+@app.route("/export/<dataset>.csv")
+def export_csv(dataset):
+    """Stream baris dataset sebagai CSV per chunk (lihat exporter)."""
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"error": f"dataset '{dataset}' tidak dikenal", "dataset_list": list(EXPORT_DATASETS)}), 404
+    try:
+        export = open_export(dataset, request.args)
+    except ExportBusy as e:
+        response = jsonify({"error": f"ekspor sedang penuh ({e}), coba lagi sebentar"})
+        response.headers["Retry-After"] = "10"
+        return response, 503
+    except Exception as e:
+        logger.error(f"❌ [EXPORT] Gagal menyiapkan ekspor {dataset}: {e}")
+        return jsonify({"error": "gagal memuat data"}), 503
+
+    response = Response(csv_stream(export["columns"], export["chunks"]), mimetype="text/csv")
+    # HEAD / klien putus sebelum body dibaca: generator tidak pernah jalan,
+    # jadi cursor & slot dilepas saat respons ditutup
+    response.call_on_close(export["close"])
+    response.headers["Content-Disposition"] = f'attachment; filename="{dataset}.csv"'
+    response.headers["X-Export-Source"] = export["source"]
+    response.cache_control.no_store = True
+    return response
+
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _export_job_response(job: dict, status: int = 200):
+    """Status job ekspor + link status & unduhan (202 selama belum selesai)."""
+    payload = dict(job, status_url=url_for("export_job_status", job_id=job["id"]))
+    if job["status"] == "selesai":
+        payload["download_url"] = url_for("export_job_download", job_id=job["id"])
+    response = jsonify(payload)
+    response.status_code = status
+    if status == 202:
+        response.headers["Location"] = payload["status_url"]
+    response.cache_control.no_store = True
+    return response
+
+
+def _send_export_file(job: dict, path: str):
+    response = send_file(path, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=f"{job['dataset']}.xlsx")
+    response.headers["X-Export-Source"] = job["source"] or ""
+    response.cache_control.no_store = True
+    return response
+
+
+@app.route("/export/<dataset>.xlsx")
+def export_xlsx(dataset):
+    """
+    Ekspor XLSX (sheet Data + sheet agregat). Kalau selesai dalam
+    EXPORT_SYNC_WAIT detik file langsung dikirim; kalau belum → 202 + link job.
+    """
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"error": f"dataset '{dataset}' tidak dikenal", "dataset_list": list(EXPORT_DATASETS)}), 404
+    job, future = start_xlsx_job(dataset, request.args)
+    try:
+        job = future.result(timeout=EXPORT_SYNC_WAIT)
+    except FutureTimeoutError:
+        logger.info(f"⏳ [EXPORT] {dataset}.xlsx berlanjut di background (job {job['id']})")
+        return _export_job_response(get_job(job["id"]) or job, 202)
+
+    path = job_file(job)
+    if path is None:
+        return jsonify({"error": job["error"] or "gagal memuat data"}), 503
+    return _send_export_file(job, path)
+
+
+@app.route("/export/jobs/<job_id>")
+def export_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "job ekspor tidak ditemukan atau sudah kedaluwarsa"}), 404
+    return _export_job_response(job)
+
+
+@app.route("/export/jobs/<job_id>/download")
+def export_job_download(job_id):
+    job = get_job(job_id)
+    path = job_file(job) if job is not None else None
+    if path is None:
+        return jsonify({"error": "file ekspor belum siap atau sudah kedaluwarsa"}), 404
+    return _send_export_file(job, path)
 
 
 # -------------------------------------------------
@@ -143,6 +586,7 @@ def submit_data_perbankan():
         record = PerbankanSummary(**data)
         db.session.add(record)
         db.session.commit()
+        data_versions.bump("perbankan")
         flash("Data perbankan berhasil disimpan.", "success")
     except Exception as e:
         db.session.rollback()
@@ -189,6 +633,7 @@ def submit_data_asuransi():
         record = Asuransi(**data)
         db.session.add(record)
         db.session.commit()
+        data_versions.bump("asuransi")
         flash("Data asuransi berhasil disimpan.", "success")
     except Exception as e:
         db.session.rollback()
@@ -216,7 +661,7 @@ def submit_data_dana_pensiun():
         prov = request.form.get("provinsi", "")
         data = {
             "negara": "INDONESIA",
-            "provinsi": (prov.strip().upper() if prov else None),
+            "provinsi": canonical_province(prov) if prov else None,
             "bulan": month_name(bulan_input) if bulan_input else None,
             "tahun": to_year(request.form.get("tahun")),
             "jumlah_dana_pensiun": to_int(request.form.get("jumlah_dana_pensiun")),
@@ -228,6 +673,7 @@ def submit_data_dana_pensiun():
         record = DanaPensiun(**data)
         db.session.add(record)
         db.session.commit()
+        data_versions.bump("dana_pensiun")
         flash("Data dana pensiun berhasil disimpan.", "success")
     except Exception as e:
         db.session.rollback()
@@ -236,6 +682,63 @@ def submit_data_dana_pensiun():
     return redirect(url_for("input_data"))
 
 
+# -------------------------------------------------
+# ROUTE EVENT PERUBAHAN DATA (SSE)
+# -------------------------------------------------
+@app.route("/events/data-versions")
+def events_data_versions():
+    """
+    Server-sent events: kirim snapshot versi saat terhubung, lalu satu event
+    "data-version" setiap kali dataset berubah (submit-data atau file di data/).
+
+    Versi ini menahan satu thread worker per tab; di produksi arahkan
+    /events/data-versions ke api_async (tanpa batas thread). Di sini jumlah
+    koneksi dibatasi SSE_MAX_STREAMS, sisanya ditolak 503.
+    """
+    if not _sse_slots.acquire(blocking=False):
+        logger.warning(f"⚠️  [SSE] Koneksi ditolak, sudah {SSE_MAX_STREAMS} stream aktif")
+        return Response("stream SSE penuh", status=503, headers={"Retry-After": "30"})
+
+    def stream():
+        # Snapshot dikirim di setiap koneksi (termasuk reconnect), jadi event
+        # yang terlewat selama terputus tetap terdeteksi oleh browser
+        data_versions.ensure_started()
+        seq = data_versions.current_seq()
+        yield "retry: 3000\n"
+        # Versi dikirim sebagai string: nanodetik melebihi presisi Number di JS
+        versions = {k: str(v) for k, v in data_versions.snapshot().items()}
+        yield f"id: {seq}\nevent: snapshot\ndata: {json.dumps(versions)}\n\n"
+
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while time.monotonic() < deadline:
+            seq, events = data_versions.wait_events(seq, timeout=SSE_KEEPALIVE)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for ev_seq, dataset, version in events:
+                # Browser memuat ulang begitu menerima event; tunggu datanya terpasang dulu
+                snapshots.wait_served(dataset, version, timeout=SSE_SWAP_WAIT)
+                payload = json.dumps({"dataset": dataset, "version": str(version)})
+                yield f"id: {ev_seq}\nevent: data-version\ndata: {payload}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream", headers=headers)
+    # Dipanggil juga kalau klien putus sebelum stream mulai
+    response.call_on_close(_sse_slots.release)
+    return response
+
+
+# -------------------------------------------------
+# ROUTE STATUS SNAPSHOT DATA
+# -------------------------------------------------
+@app.route("/api/v1/data-status")
+def data_status():
+    """Umur & kesegaran snapshot tiap dataset, plus status circuit breaker DB."""
+    response = jsonify({"snapshots": snapshots.status(), "db_breaker": db_breaker.status()})
+    response.cache_control.no_store = True
+    return response
+
+
 # -------------------------------------------------
 # ROUTE TEST DATABASE CONNECTION
 # -------------------------------------------------
@@ -0,0 +1,84 @@
+# assets.py
+"""
+Aset statis ber-hash hasil build_assets.py.
+
+- asset_url_for(): pengganti url_for di template. Untuk endpoint 'static' yang
+  ada di manifest, filename diganti ke versi ber-hash; selain itu sama persis
+  dengan url_for (jadi tanpa build pun halaman tetap jalan).
+- /static/dist/<file>: disajikan dengan Cache-Control immutable 1 tahun, dan
+  memakai file .br/.gz yang sudah dikompres saat build kalau browser mendukung.
+"""
+import json
+import logging
+import mimetypes
+import os
+
+from flask import abort, request, send_from_directory, url_for
+
+from compression import choose_encoding
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_manifest = {}
+
+
+def load_manifest(static_folder: str) -> dict:
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("⚠️  [ASSETS] Manifest belum ada, jalankan build_assets.py; memakai file asli")
+    except Exception as e:
+        logger.error(f"❌ [ASSETS] Manifest tidak bisa dibaca: {e}")
+    return {}
+
+
+def asset_url_for(endpoint: str, **values) -> str:
+    """url_for yang mengarahkan aset static ke nama file ber-hash (kalau ada)."""
+    if endpoint == "static":
+        filename = values.get("filename")
+        hashed = _manifest.get(filename)
+        if hashed:
+            values["filename"] = hashed
+    return url_for(endpoint, **values)
+
+
+def init_assets(app):
+    """Muat manifest, daftarkan helper template & route aset ber-hash."""
+    global _manifest
+    _manifest = load_manifest(app.static_folder)
+    app.jinja_env.globals["asset_url_for"] = asset_url_for
+
+    dist_folder = os.path.join(app.static_folder, DIST_DIR)
+
+    @app.route(f"{app.static_url_path}/{DIST_DIR}/<path:filename>", endpoint="dist_asset")
+    def dist_asset(filename):
+        if filename.endswith((".gz", ".br")) or filename == MANIFEST_NAME:
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        suffix = {"br": ".br", "gzip": ".gz"}.get(encoding)
+        if suffix and os.path.isfile(os.path.join(dist_folder, filename + suffix)):
+            response = send_from_directory(
+                dist_folder, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+            )
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = send_from_directory(
+                dist_folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+            )
+
+        # Nama file sudah memuat hash isi → aman di-cache selamanya
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    logger.info(f"📦 [ASSETS] {len(_manifest)} aset ber-hash terdaftar")
+    return app
@@ -1,8 +1,12 @@
 # asuransi_module.py
 import os
+import time
+import numpy as np
 import pandas as pd
 import logging
+import snapshots
 from db_loaders import load_asuransi_data_from_db
+from regions import add_region_ids, kabkota_id, region_id
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +16,21 @@ SHEET_NAME_AS = "ASURANSI"   # sesuaikan dengan nama sheet
 # -------------------------------------------------
 # LOAD & CLEAN DATA
 # -------------------------------------------------
+def clean_num(s: pd.Series) -> pd.Series:
+    """
+    Angka format Indonesia ("1.234,56") → float. Sel yang sudah numerik
+    (dari DB / Excel) dipakai apa adanya; hanya sel teks yang dibersihkan.
+    """
+    if s.dtype != object:
+        return pd.to_numeric(s, errors="coerce")
+    is_text = s.map(lambda v: isinstance(v, str))
+    out = pd.to_numeric(s.where(~is_text), errors="coerce")
+    if is_text.any():
+        text = s[is_text].str.replace(r"[\s.]", "", regex=True).str.replace(",", ".", regex=False)
+        out[is_text] = pd.to_numeric(text, errors="coerce")
+    return out
+
+
 def load_asuransi_data():
     """Load asuransi data from database, fallback to Excel if needed"""
     df = None
@@ -75,43 +94,21 @@ def load_asuransi_data():
 
     df["Quarter"] = df["Periode"].apply(parse_quarter).astype(int)
 
-    # Helper: angka Indonesia → float
-    def clean_num(s):
-        return (
-            s.astype(str)
-             .str.strip()
-             .str.replace(" ", "", regex=False)
-             .str.replace(".", "", regex=False)
-             .str.replace(",", ".", regex=False)
-        )
-
     # Premi & Klaim (Rp Juta) → float
     for col in ["Premi", "Klaim"]:
-        if df[col].dtype == object:
-            df[col] = clean_num(df[col])
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+        df[col] = clean_num(df[col]).fillna(0.0)
 
-    # Peserta & Polis → integer
+    # Peserta & Polis → integer (format seperti 394,00 → 394)
     for col in ["Peserta Premi", "Peserta Klaim", "Polis Premi", "Polis Klaim"]:
         if col in df.columns:
-            if df[col].dtype == object:
-                # format seperti 394,00 → 394
-                df[col] = (
-                    df[col]
-                    .astype(str)
-                    .str.strip()
-                    .str.replace(" ", "", regex=False)
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
-            df[col] = df[col].round(0).astype(int)
+            df[col] = clean_num(df[col]).fillna(0.0).round(0).astype(int)
 
     # Tanggal representatif per quarter (pakai bulan ke-3 tiap triwulan: Mar, Jun, Sep, Des)
     df["periode_dt"] = pd.to_datetime(
         dict(year=df["Tahun"], month=df["Quarter"] * 3, day=1)
     )
 
+    add_region_ids(df, "Provinsi", "Kabupaten")
     return df
 
 # -------------------------------------------------
@@ -176,135 +173,264 @@ def compute_growth(agg, metric, selected_year, selected_quarter):
 
 
 # -------------------------------------------------
-# BUILD CONTEXT UNTUK TEMPLATE
+# CUBE ASURANSI
 # -------------------------------------------------
-def build_asuransi_context(request):
-    df = load_asuransi_data()
+# Interval muat ulang cube di background (detik); tabel DB bisa diubah di luar aplikasi
+AS_CACHE_TTL = float(os.environ.get("AS_CACHE_TTL", "300"))
+
+# Ukuran aditif yang dijumlahkan di cube; "Baris" = jumlah baris sumber,
+# dipakai untuk membedakan sel kosong dari sel bernilai 0
+AS_MEASURES = ("Premi", "Klaim", "Peserta Premi", "Peserta Klaim", "Polis Premi", "Polis Klaim", "Baris")
+AS_MEASURE_INDEX = {m: i for i, m in enumerate(AS_MEASURES)}
+_BARIS = AS_MEASURE_INDEX["Baris"]
+
+AS_QUARTER_LABEL = {1: "Triw I", 2: "Triw II", 3: "Triw III", 4: "Triw IV"}
+
+# Metrik turunan: nama → (pembilang, penyebut, pengali)
+AS_DERIVED = {
+    "loss_ratio_klaim": ("Klaim", "Premi", 100.0),
+    "loss_ratio_peserta": ("Peserta Klaim", "Peserta Premi", 100.0),
+    "loss_ratio_polis": ("Polis Klaim", "Polis Premi", 100.0),
+    "avg_premi_polis": ("Premi", "Polis Premi", 1.0),
+    "avg_klaim_peserta": ("Klaim", "Peserta Klaim", 1.0),
+}
+AS_DERIVED_INDEX = {m: i for i, m in enumerate(AS_DERIVED)}
+
+def build_asuransi_cube(df: pd.DataFrame) -> dict:
+    """
+    Cube ukuran aditif asuransi berdimensi (wilayah, jenis, periode).
 
-    # Dropdown list
+    - wilayah: (prov_id|None, kab_id|None), termasuk rollup per provinsi,
+      per kab/kota dan nasional (None, None),
+    - jenis: indeks jenis_list; slot terakhir = semua jenis,
+    - periode: (Tahun, Quarter) urut waktu.
+
+    values[wilayah, jenis, periode, ukuran]; context dashboard cukup
+    mengambil satu irisan lalu menjumlahkan sumbu periode / jenis.
+    derived[wilayah, jenis, periode, metrik] = rasio per sel (AS_DERIVED).
+    """
     provinsi_list = sorted(df["Provinsi"].dropna().unique().tolist())
     kabupaten_list = sorted(df["Kabupaten"].dropna().unique().tolist())
     jenis_list = sorted(df["Jenis"].dropna().unique().tolist())
     tahun_list = sorted(df["Tahun"].dropna().unique().tolist())
 
-    # Periode label (Triwulan I, II, ...) pakai urutan Quarter
-    periode_order = (
-        df[["Periode", "Quarter"]]
-        .drop_duplicates()
-        .sort_values("Quarter")
-    )
+    periode_order = df[["Periode", "Quarter"]].drop_duplicates().sort_values("Quarter")
     periode_list = periode_order["Periode"].tolist()
+    periode_quarter = dict(zip(periode_order["Periode"], periode_order["Quarter"].astype(int)))
+
+    # Periode (Tahun, Quarter) urut waktu
+    period_key = df["Tahun"].to_numpy(np.int64) * 10 + df["Quarter"].to_numpy(np.int64)
+    periods, p_code = np.unique(period_key, return_inverse=True)
+    period_tahun = periods // 10
+    period_quarter = periods % 10
+
+    n_jenis = len(jenis_list)
+    j_code = pd.Categorical(df["Jenis"], categories=jenis_list).codes.astype(np.int64)
+
+    # Kunci wilayah per level rollup: nasional, provinsi, kab/kota, (provinsi, kab/kota)
+    prov_codes, prov_ids = pd.factorize(df["prov_id"])
+    kab_codes, kab_ids = pd.factorize(df["kab_id"])
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([df["prov_id"], df["kab_id"]]))
+
+    region_keys = [(None, None)]
+    region_keys += [(int(p), None) for p in prov_ids]
+    region_keys += [(None, int(k)) for k in kab_ids]
+    region_keys += [(int(p), int(k)) for p, k in pairs]
+    region_index = {key: i for i, key in enumerate(region_keys)}
+
+    n = len(df)
+    offsets = (0, 1, 1 + len(prov_ids), 1 + len(prov_ids) + len(kab_ids))
+    level_codes = (np.zeros(n, dtype=np.int64), prov_codes, kab_codes, pair_codes)
+
+    measures = np.column_stack(
+        [df[m].to_numpy(np.float64) for m in AS_MEASURES[:-1]] + [np.ones(n)]
+    )
+
+    values = np.zeros((len(region_keys), n_jenis + 1, len(periods), len(AS_MEASURES)))
+    for offset, codes in zip(offsets, level_codes):
+        rows = codes >= 0
+        r = codes[rows] + offset
+        np.add.at(values, (r, np.full(r.size, n_jenis), p_code[rows]), measures[rows])
+        jrows = rows & (j_code >= 0)
+        np.add.at(values, (codes[jrows] + offset, j_code[jrows], p_code[jrows]), measures[jrows])
+
+    period_labels = [
+        f"{AS_QUARTER_LABEL.get(q, f'Triw {q}')} '{str(y)[-2:]}"
+        for y, q in zip(period_tahun.tolist(), period_quarter.tolist())
+    ]
+
+    return dict(
+        provinsi_list=provinsi_list,
+        kabupaten_list=kabupaten_list,
+        jenis_list=jenis_list,
+        tahun_list=tahun_list,
+        periode_list=periode_list,
+        periode_quarter=periode_quarter,
+        period_tahun=period_tahun,
+        period_quarter=period_quarter,
+        period_labels=period_labels,
+        region_index=region_index,
+        jenis_index={j: i for i, j in enumerate(jenis_list)},
+        values=values,
+        derived=derive_asuransi_metrics(values),
+    )
+
+
+def derive_asuransi_metrics(measures: np.ndarray) -> np.ndarray:
+    """
+    Metrik turunan (AS_DERIVED) dari array ukuran aditif dengan sumbu
+    terakhir = AS_MEASURES. Pembagian aman: penyebut <= 0 → 0.
+    Hasil berbentuk sama dengan sumbu terakhir = AS_DERIVED.
+    """
+    idx = AS_MEASURE_INDEX
+    num = measures[..., [idx[n] for n, _, _ in AS_DERIVED.values()]]
+    den = measures[..., [idx[d] for _, d, _ in AS_DERIVED.values()]]
+    scale = np.array([k for _, _, k in AS_DERIVED.values()])
+    return np.divide(num * scale, den, out=np.zeros_like(num), where=den > 0)
+
+
+def _build_asuransi_snapshot(df: pd.DataFrame) -> dict:
+    start = time.perf_counter()
+    cube = build_asuransi_cube(df)
+    logger.info(
+        f"🧊 [ASURANSI] Cube dibangun: {len(cube['region_index'])} wilayah × "
+        f"{len(cube['jenis_list'])} jenis × {len(cube['period_labels'])} periode "
+        f"({(time.perf_counter() - start) * 1000:.0f} ms)"
+    )
+    return cube
+
+
+# Frame bersih dimuat sekali per versi; cube (dashboard) dan frame query /
+# ekspor (query_engine) sama-sama memakai snapshot ini
+snapshots.register("asuransi_frame", load_asuransi_data, dataset="asuransi", interval=AS_CACHE_TTL)
+snapshots.register("asuransi", _build_asuransi_snapshot, source="asuransi_frame")
+
+
+def get_asuransi_cube() -> dict:
+    """
+    Snapshot cube asuransi terakhir. Dibangun sekali, dipakai bersama semua
+    request; dimuat ulang di background saat versi data "asuransi" berubah
+    atau setelah AS_CACHE_TTL detik.
+    """
+    return snapshots.get("asuransi")
+
+
+def _asuransi_slice(cube: dict, provinsi: str, kabupaten: str, jenis: str):
+    """
+    Indeks (wilayah, jenis) di cube untuk filter dashboard, atau None kalau
+    kombinasi filter tidak punya data sama sekali.
+    """
+    prov_key = region_id(provinsi) if provinsi else None
+    kab_key = kabkota_id(kabupaten) if kabupaten else None
+    if (provinsi and prov_key is None) or (kabupaten and kab_key is None):
+        return None
+    r = cube["region_index"].get((prov_key, kab_key))
+    j = cube["jenis_index"].get(jenis) if jenis else len(cube["jenis_list"])
+    if r is None or j is None or not cube["values"][r, j, :, _BARIS].any():
+        return None
+    return r, j
+
+
+# -------------------------------------------------
+# BUILD CONTEXT UNTUK TEMPLATE
+# -------------------------------------------------
+def build_asuransi_filters(request) -> dict:
+    """Dropdown dan filter terpilih dashboard asuransi (cukup untuk shell HTML)."""
+    cube = get_asuransi_cube()
+    return dict(
+        provinsi_list=cube["provinsi_list"],
+        kabupaten_list=cube["kabupaten_list"],
+        jenis_list=cube["jenis_list"],
+        tahun_list=cube["tahun_list"],
+        periode_list=cube["periode_list"],
+        provinsi_selected=request.args.get("provinsi") or "",
+        kabupaten_selected=request.args.get("kabupaten") or "",
+        jenis_selected=request.args.get("jenis") or "",
+        tahun_selected=request.args.get("tahun") or "",
+        periode_selected=request.args.get("periode") or "",  # isi: "Triwulan I", dst
+    )
+
+
+def build_asuransi_context(request):
+    cube = get_asuransi_cube()
+    values = cube["values"]
 
     # Ambil filter dari query string
-    provinsi = request.args.get("provinsi") or ""
-    kabupaten = request.args.get("kabupaten") or ""
-    jenis = request.args.get("jenis") or ""
-    tahun = request.args.get("tahun") or ""
-    periode = request.args.get("periode") or ""  # isi: "Triwulan I", dst
+    filters = build_asuransi_filters(request)
+    provinsi = filters["provinsi_selected"]
+    kabupaten = filters["kabupaten_selected"]
+    jenis = filters["jenis_selected"]
+    tahun = filters["tahun_selected"]
+    periode = filters["periode_selected"]
 
     selected_year = int(tahun) if tahun else None
-    selected_quarter = None
-    if periode:
-        # map ulang ke quarter, sama dengan yang di load_asuransi_data
-        selected_quarter = df.loc[df["Periode"] == periode, "Quarter"]
-        selected_quarter = int(selected_quarter.iloc[0]) if not selected_quarter.empty else None
-
-    # Filter wilayah & jenis
-    df_region = df.copy()
-    if provinsi:
-        df_region = df_region[df_region["Provinsi"] == provinsi]
-    if kabupaten:
-        df_region = df_region[df_region["Kabupaten"] == kabupaten]
-    if jenis:
-        df_region = df_region[df_region["Jenis"] == jenis]
-
-    if df_region.empty:
-        df_region = df.copy()
-
-    # Data untuk KPI & rasio (mengikuti filter tahun/periode kalau ada)
-    df_filtered = df_region.copy()
+    selected_quarter = cube["periode_quarter"].get(periode) if periode else None
+
+    # Filter wilayah & jenis; kombinasi tanpa data → semua data
+    picked = _asuransi_slice(cube, provinsi, kabupaten, jenis)
+    if picked is None:
+        picked = (cube["region_index"][(None, None)], len(cube["jenis_list"]))
+    r, j = picked
+    region = values[r, j]  # (periode, ukuran)
+    present = region[:, _BARIS] > 0
+
+    # Periode untuk KPI & rasio (mengikuti filter tahun/periode kalau ada)
+    mask = present.copy()
     if selected_year is not None:
-        df_filtered = df_filtered[df_filtered["Tahun"] == selected_year]
+        mask &= cube["period_tahun"] == selected_year
     if periode:
-        df_filtered = df_filtered[df_filtered["Periode"] == periode]
+        mask &= cube["period_quarter"] == selected_quarter if selected_quarter is not None else False
 
-    # Kalau setelah filter kosong, fallback ke df_region (supaya nggak 0 terus)
-    if df_filtered.empty:
-        df_filtered = df_region.copy()
+    # Kalau setelah filter kosong, fallback ke semua periode (supaya nggak 0 terus)
+    if not mask.any():
+        mask = present
 
-    # ---------------- KPI utama: Premi, Klaim, Loss Ratio (Nominal) ----------------
-    as_premi_total = df_filtered["Premi"].sum()
-    as_klaim_total = df_filtered["Klaim"].sum()
+    totals = region[mask].sum(axis=0)
+    t = lambda m: totals[AS_MEASURE_INDEX[m]]
+    ratios = derive_asuransi_metrics(totals)
+    d = lambda m: float(ratios[AS_DERIVED_INDEX[m]])
 
-    as_loss_ratio_klaim = 0.0
-    if as_premi_total > 0:
-        as_loss_ratio_klaim = as_klaim_total / as_premi_total * 100.0
+    # ---------------- KPI utama: Premi, Klaim, Loss Ratio (Nominal) ----------------
+    as_premi_total = float(t("Premi"))
+    as_klaim_total = float(t("Klaim"))
+    as_loss_ratio_klaim = d("loss_ratio_klaim")
 
     # ---------------- KPI Peserta / Polis ----------------
-    as_peserta_premi = df_filtered["Peserta Premi"].sum()
-    as_peserta_klaim = df_filtered["Peserta Klaim"].sum()
-    as_polis_premi = df_filtered["Polis Premi"].sum()
-    as_polis_klaim = df_filtered["Polis Klaim"].sum()
+    as_peserta_premi = int(t("Peserta Premi"))
+    as_peserta_klaim = int(t("Peserta Klaim"))
+    as_polis_premi = int(t("Polis Premi"))
+    as_polis_klaim = int(t("Polis Klaim"))
 
     # INI YANG KAMU MAKSUD: LOSS RATIO BERDASARKAN PESERTA PREMI
-    as_loss_ratio_peserta = 0.0
-    if as_peserta_premi > 0:
-        as_loss_ratio_peserta = as_peserta_klaim / as_peserta_premi * 100.0
-
-    # ---------------- Aggregasi quarter untuk chart tren ----------------
-    agg_quarter = (
-        df_region
-        .groupby(["Tahun", "Quarter"], as_index=False)
-        .agg({
-            "Premi": "sum",
-            "Klaim": "sum",
-            "Peserta Premi": "sum",
-            "Peserta Klaim": "sum",
-        })
-    )
-    agg_quarter["periode_dt"] = pd.to_datetime(
-        dict(year=agg_quarter["Tahun"], month=agg_quarter["Quarter"] * 3, day=1)
-    )
-    agg_quarter = agg_quarter.sort_values("periode_dt")
+    as_loss_ratio_peserta = d("loss_ratio_peserta")
+    as_loss_ratio_polis = d("loss_ratio_polis")
 
-    # Label timeline: misal "Triw I '24"
-    label_map = {1: "Triw I", 2: "Triw II", 3: "Triw III", 4: "Triw IV"}
-    as_trend_labels = [
-        f"{label_map.get(q, f'Triw {q}')} '{str(y)[-2:]}"
-        for y, q in zip(agg_quarter["Tahun"], agg_quarter["Quarter"])
-    ]
-    as_trend_premi = agg_quarter["Premi"].tolist()
-    as_trend_klaim = agg_quarter["Klaim"].tolist()
-
-    # Loss ratio klaim per quarter (Klaim/Premi)
-    lr_series = []
-    for p, k in zip(as_trend_premi, as_trend_klaim):
-        if p > 0:
-            lr_series.append(k / p * 100.0)
-        else:
-            lr_series.append(0.0)
+    # ---------------- KPI rata-rata (Rp Juta) ----------------
+    as_avg_premi_polis = d("avg_premi_polis")
+    as_avg_klaim_peserta = d("avg_klaim_peserta")
+
+    # ---------------- Tren per quarter (hanya periode yang ada datanya) ----------------
+    trend = region[present]
+    trend_ratio = cube["derived"][r, j][present]
+    series = lambda m: trend_ratio[:, AS_DERIVED_INDEX[m]].tolist()
+    as_trend_labels = [label for label, ok in zip(cube["period_labels"], present) if ok]
+    as_trend_premi = trend[:, AS_MEASURE_INDEX["Premi"]].tolist()
+    as_trend_klaim = trend[:, AS_MEASURE_INDEX["Klaim"]].tolist()
 
     # ---------------- Share Premi per Jenis (Pie) ----------------
-    share_base = df_filtered.copy()
-    share_jenis = (
-        share_base.groupby("Jenis", as_index=False)["Premi"].sum()
-    ).sort_values("Premi", ascending=False)
+    n_jenis = len(cube["jenis_list"])
+    jenis_idx = np.arange(n_jenis) if j == n_jenis else np.array([j])
+    share = values[r, jenis_idx][:, mask].sum(axis=1)
+    jenis_idx = jenis_idx[share[:, _BARIS] > 0]
+    share = share[share[:, _BARIS] > 0, AS_MEASURE_INDEX["Premi"]]
+    order = np.argsort(-share, kind="stable")
 
-    as_share_labels = share_jenis["Jenis"].tolist()
-    as_share_values = share_jenis["Premi"].tolist()
+    as_share_labels = [cube["jenis_list"][i] for i in jenis_idx[order]]
+    as_share_values = share[order].tolist()
 
     # ---------------- Context untuk template ----------------
     ctx = dict(
-        provinsi_list=provinsi_list,
-        kabupaten_list=kabupaten_list,
-        jenis_list=jenis_list,
-        tahun_list=tahun_list,
-        periode_list=periode_list,
-        provinsi_selected=provinsi,
-        kabupaten_selected=kabupaten,
-        jenis_selected=jenis,
-        tahun_selected=tahun,
-        periode_selected=periode,
+        **filters,
 
         # KPI nominal
         as_premi_total=as_premi_total,
@@ -317,12 +443,23 @@ def build_asuransi_context(request):
         as_polis_premi=as_polis_premi,
         as_polis_klaim=as_polis_klaim,
         as_loss_ratio_peserta=as_loss_ratio_peserta,
+        as_loss_ratio_polis=as_loss_ratio_polis,
+
+        # KPI rata-rata
+        as_avg_premi_polis=as_avg_premi_polis,
+        as_avg_klaim_peserta=as_avg_klaim_peserta,
 
         # Tren Premi & Klaim (quarter)
         as_trend_labels=as_trend_labels,
         as_trend_premi=as_trend_premi,
         as_trend_klaim=as_trend_klaim,
-        as_trend_lossratio=lr_series,
+
+        # Tren metrik turunan (quarter)
+        as_trend_lossratio=series("loss_ratio_klaim"),
+        as_trend_lossratio_peserta=series("loss_ratio_peserta"),
+        as_trend_lossratio_polis=series("loss_ratio_polis"),
+        as_trend_avg_premi_polis=series("avg_premi_polis"),
+        as_trend_avg_klaim_peserta=series("avg_klaim_peserta"),
 
         # Pie share premi per jenis
         as_share_labels=as_share_labels,
@@ -0,0 +1,180 @@
+# bench_templates.py
+"""
+Benchmark latency render PERTAMA tiap dashboard (per proses baru), untuk
+membandingkan:
+
+- lazy        : tanpa bytecode cache, template dikompilasi saat render pertama
+                (perilaku lama)
+- bytecode    : FileSystemBytecodeCache sudah hangat, tanpa precompile
+                (mis. worker baru setelah restart)
+- precompiled : bytecode cache + precompile_templates() saat boot
+                (render pertama tidak lagi membayar kompilasi)
+
+Setiap mode dijalankan di subprocess baru sebanyak --runs kali; yang
+dilaporkan median (ms). Seperti app.py, yang diukur adalah shell halaman
+(context filter, panels=False) lalu block panel_* (context penuh,
+render_blocks). Context dibangun sekali dari loader (DB / Excel).
+
+    python bench_templates.py --runs 5
+"""
+import argparse
+import json
+import os
+import pickle
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+TEMPLATE_DIR = "templates"
+DASHBOARDS = [
+    "dashboard.html",
+    "dashboard_dana_pensiun.html",
+    "dashboard_asuransi.html",
+    "dashboard_komoditas.html",
+]
+MODES = ["lazy", "bytecode", "precompiled"]
+
+
+def build_contexts() -> dict:
+    """Per template: context shell (filter saja) dan context panel (lengkap)."""
+    from asuransi_module import build_asuransi_context, build_asuransi_filters
+    from dana_pensiun_module import build_dana_pensiun_context, build_dana_pensiun_filters
+    from komoditas_module import (
+        build_komoditas_context,
+        build_komoditas_filters,
+        build_kredit_lokasi_context,
+        build_kredit_lokasi_filters,
+        empty_komoditas_context,
+    )
+    from perbankan_module import build_dashboard_context, build_dashboard_filters
+
+    req = SimpleNamespace(args={})
+    try:
+        kom_ctx = build_komoditas_context(req)
+        kom_filters = build_komoditas_filters(req)
+    except Exception as e:
+        kom_ctx = kom_filters = empty_komoditas_context(str(e))
+    kom_ctx.update(build_kredit_lokasi_context(req))
+    kom_filters = {**kom_filters, **build_kredit_lokasi_filters(req)}
+
+    contexts = {
+        "dashboard.html": (build_dashboard_filters(req), build_dashboard_context(req)),
+        "dashboard_dana_pensiun.html": (build_dana_pensiun_filters(req), build_dana_pensiun_context(req)),
+        "dashboard_asuransi.html": (build_asuransi_filters(req), build_asuransi_context(req)),
+        "dashboard_komoditas.html": (kom_filters, kom_ctx),
+    }
+    return {
+        name: (
+            # Sama dengan render_dashboard / panel_data di app.py
+            dict(shell, chart_data_url="/api/charts/bench", panels_url="/api/panels/bench", panels=False),
+            dict(full, panels=True),
+        )
+        for name, (shell, full) in contexts.items()
+    }
+
+
+def make_app(mode: str, cache_dir: str):
+    """Flask app minimal dengan template & endpoint yang sama seperti app.py."""
+    from flask import Flask
+
+    from assets import init_assets
+    from templating import init_template_cache, precompile_templates, register_macros
+
+    app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder="static")
+    if mode != "lazy":
+        init_template_cache(app, cache_dir)
+    init_assets(app)
+    register_macros(app)
+
+    # Daftarkan endpoint yang dirujuk url_for di template (termasuk subfolder)
+    endpoints = set()
+    for root, _, files in os.walk(TEMPLATE_DIR):
+        for name in files:
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                endpoints.update(re.findall(r"url_for\('(\w+)'", f.read()))
+    endpoints.discard("static")
+    for ep in sorted(endpoints):
+        app.add_url_rule(f"/{ep}", endpoint=ep, view_func=lambda: "")
+
+    boot_ms = 0.0
+    if mode == "precompiled":
+        start = time.perf_counter()
+        precompile_templates(app)
+        boot_ms = (time.perf_counter() - start) * 1000
+    return app, boot_ms
+
+
+def run_child(mode: str, ctx_file: str, cache_dir: str):
+    import logging
+
+    logging.disable(logging.CRITICAL)
+    from flask import render_template
+
+    from templating import render_blocks
+
+    with open(ctx_file, "rb") as f:
+        contexts = pickle.load(f)
+
+    app, boot_ms = make_app(mode, cache_dir)
+    result = {"boot_ms": boot_ms}
+    with app.test_request_context("/"):
+        for name in DASHBOARDS:
+            shell_ctx, panel_ctx = contexts[name]
+            start = time.perf_counter()
+            render_template(name, **shell_ctx)
+            result[name] = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            render_blocks(app, name, "panel_", panel_ctx)
+            result[f"{name} panel"] = (time.perf_counter() - start) * 1000
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CTX_FILE", "CACHE_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    import logging
+
+    logging.disable(logging.CRITICAL)
+    print("⏳ Membangun context dashboard...")
+    contexts = build_contexts()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx_file = os.path.join(tmp, "contexts.pkl")
+        cache_dir = os.path.join(tmp, "jinja")
+        with open(ctx_file, "wb") as f:
+            pickle.dump(contexts, f)
+
+        def child(mode):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, ctx_file, cache_dir],
+                capture_output=True, text=True, check=True,
+            )
+            return json.loads(out.stdout.strip().splitlines()[-1])
+
+        # Hangatkan bytecode cache sekali (seperti worker pertama setelah deploy)
+        child("precompiled")
+
+        results = {mode: [child(mode) for _ in range(args.runs)] for mode in MODES}
+
+    median = lambda mode, key: statistics.median(r[key] for r in results[mode])
+    print(f"\nRender pertama per proses (median {args.runs} run, ms)\n")
+    print(f"{'template':36}" + "".join(f"{m:>14}" for m in MODES))
+    for name in DASHBOARDS:
+        for key in (name, f"{name} panel"):
+            print(f"{key:36}" + "".join(f"{median(m, key):14.1f}" for m in MODES))
+    print(f"{'(precompile saat boot)':36}" + "".join(f"{median(m, 'boot_ms'):14.1f}" for m in MODES))
+
+
+if __name__ == "__main__":
+    main()
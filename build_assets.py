@@ -0,0 +1,126 @@
+# build_assets.py
+"""
+Build aset statis static/kwd → static/dist:
+
+- nama file diberi hash isi (main.css → main.3f2a9c1b.css)
+- file teks (css/js/svg) ditulis juga versi .gz dan .br di sebelahnya
+- static/dist/manifest.json: path asli → path ber-hash (relatif ke static/)
+
+Template memakai asset_url_for('static', filename='kwd/css/main.css') (lihat
+assets.py) sehingga otomatis menunjuk file ber-hash yang boleh di-cache
+browser selama satu tahun (immutable).
+
+Jalankan setiap kali isi static/kwd berubah (mis. saat deploy):
+    python build_assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "static"
+SOURCE_DIRS = ["kwd"]
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LEN = 8
+
+PRECOMPRESS_EXT = {".css", ".js", ".svg", ".json", ".html", ".txt", ".map"}
+
+# url(...) relatif di CSS (data:, http:, dan path absolut dilewati)
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)(?!data:|https?:|//|/)([^'")?#]+)([^'")]*)\1\s*\)""")
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+
+def hashed_name(rel_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest}{ext}"
+
+
+def rewrite_css_urls(css: str, rel_path: str, manifest: dict) -> str:
+    """Ganti referensi url() relatif di CSS dengan nama ber-hash dari manifest."""
+    base = os.path.dirname(rel_path)
+
+    def repl(m):
+        quote, target, suffix = m.groups()
+        resolved = os.path.normpath(os.path.join(base, target)).replace(os.sep, "/")
+        hashed = manifest.get(resolved)
+        if not hashed:
+            return m.group(0)
+        new_target = os.path.relpath(
+            os.path.join(STATIC_DIR, hashed), os.path.join(STATIC_DIR, DIST_DIR, base)
+        ).replace(os.sep, "/")
+        return f"url({quote}{new_target}{suffix}{quote})"
+
+    return CSS_URL_RE.sub(repl, css)
+
+
+def write_output(rel_hashed: str, data: bytes) -> int:
+    """Tulis file ber-hash + versi .gz/.br; return jumlah file yang ditulis."""
+    out_path = os.path.join(STATIC_DIR, rel_hashed)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "wb") as f:
+        f.write(data)
+    written = 1
+
+    if os.path.splitext(out_path)[1].lower() in PRECOMPRESS_EXT:
+        with open(out_path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        written += 1
+        if brotli is not None:
+            with open(out_path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+            written += 1
+    return written
+
+
+def collect_sources():
+    for src in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(STATIC_DIR, src)):
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                yield os.path.relpath(full, STATIC_DIR).replace(os.sep, "/")
+
+
+def build():
+    dist_path = os.path.join(STATIC_DIR, DIST_DIR)
+    if os.path.isdir(dist_path):
+        shutil.rmtree(dist_path)
+
+    sources = sorted(collect_sources())
+    # CSS diproses terakhir supaya url() di dalamnya bisa merujuk aset yang sudah ber-hash
+    sources.sort(key=lambda p: p.endswith(".css"))
+
+    manifest = {}
+    total_files = 0
+    for rel_path in sources:
+        with open(os.path.join(STATIC_DIR, rel_path), "rb") as f:
+            data = f.read()
+        if rel_path.endswith(".css"):
+            data = rewrite_css_urls(data.decode("utf-8"), rel_path, manifest).encode("utf-8")
+
+        rel_hashed = f"{DIST_DIR}/" + hashed_name(rel_path, file_hash(data))
+        total_files += write_output(rel_hashed, data)
+        manifest[rel_path] = rel_hashed
+        print(f"✅ {rel_path} → {rel_hashed}")
+
+    with open(os.path.join(dist_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if brotli is None:
+        print("⚠️  Modul brotli tidak terpasang: hanya versi .gz yang dibuat")
+    print(f"\n✅ {len(manifest)} aset, {total_files} file ditulis ke {dist_path}")
+    return manifest
+
+
+if __name__ == "__main__":
+    build()
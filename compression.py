@@ -0,0 +1,151 @@
+# compression.py
+"""
+Kompresi respons (brotli / gzip) sesuai header Accept-Encoding.
+
+- Hanya respons teks (HTML, JSON, CSS, JS, SVG) >= COMPRESS_MIN_SIZE byte.
+- Hasil kompresi disimpan di cache LRU (kunci: ETag atau hash isi respons
+  + encoding), jadi halaman yang sama cukup dikompres sekali per worker;
+  request berikutnya langsung memakai byte yang sudah jadi.
+- Respons streaming (SSE, send_file) tidak disentuh.
+
+Pakai: init_compression(app) setelah membuat Flask app.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli opsional; tanpa modul ini hanya gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BR_QUALITY = int(os.environ.get("COMPRESS_BR_QUALITY", "5"))
+# Batas total byte terkompresi yang disimpan per worker
+COMPRESS_CACHE_BYTES = int(os.environ.get("COMPRESS_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+_cache = OrderedDict()  # (kunci, encoding) → bytes
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def supported_encodings() -> list[str]:
+    """Encoding yang bisa dihasilkan server ini, urut preferensi."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Pilih encoding terbaik dari header Accept-Encoding (menghormati q=0)."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for enc in supported_encodings():
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > 0:
+            return enc
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BR_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compress_cached(key: str, data: bytes, encoding: str) -> bytes:
+    """Ambil hasil kompresi dari cache, atau kompres sekali lalu simpan."""
+    global _cache_bytes
+    ck = (key, encoding)
+    with _cache_lock:
+        body = _cache.get(ck)
+        if body is not None:
+            _cache.move_to_end(ck)
+            _stats["hits"] += 1
+            return body
+        _stats["misses"] += 1
+
+    body = compress(data, encoding)
+
+    with _cache_lock:
+        if ck not in _cache and len(body) <= COMPRESS_CACHE_BYTES:
+            _cache[ck] = body
+            _cache_bytes += len(body)
+            while _cache_bytes > COMPRESS_CACHE_BYTES:
+                _, old = _cache.popitem(last=False)
+                _cache_bytes -= len(old)
+    return body
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        return {**_stats, "entries": len(_cache), "bytes": _cache_bytes}
+
+
+def _compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+
+    from flask import request
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    key = etag or hashlib.blake2b(data, digest_size=16).hexdigest()
+    body = compress_cached(key, data, encoding)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(body))
+    if etag and not weak:
+        # Isi byte berbeda dari versi asli → ETag jadi weak (setara secara makna),
+        # supaya If-None-Match dari browser tetap cocok di make_conditional
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Pasang kompresi respons otomatis pada Flask app."""
+    app.after_request(_compress_response)
+    logger.info(f"🗜️  Kompresi respons aktif: {', '.join(supported_encodings())} (min {COMPRESS_MIN_SIZE} byte)")
+    return app
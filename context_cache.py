@@ -0,0 +1,46 @@
+# context_cache.py
+"""
+Cache context dashboard per (dashboard, filter, versi data).
+
+Halaman HTML dan endpoint data chart-nya dipanggil berurutan dengan filter
+yang sama; cache ini memastikan context cukup dibangun sekali. Kunci memuat
+versi data (data_versions) sehingga entri otomatis usang saat data berubah.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_TTL = float(os.environ.get("CONTEXT_CACHE_TTL", "300"))
+CONTEXT_CACHE_SIZE = int(os.environ.get("CONTEXT_CACHE_SIZE", "128"))
+
+_cache = OrderedDict()  # kunci → (waktu_simpan, ctx)
+_lock = threading.Lock()
+
+
+def make_key(name: str, args, version) -> tuple:
+    """Kunci cache: nama dashboard + filter (urutan tidak berpengaruh) + versi data."""
+    pairs = args.items(multi=True) if hasattr(args, "getlist") else args.items()
+    return (name, tuple(sorted(pairs)), version)
+
+
+def get_or_build(key: tuple, builder):
+    """Ambil context dari cache, atau bangun dengan builder() lalu simpan."""
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and now - hit[0] < CONTEXT_CACHE_TTL:
+            _cache.move_to_end(key)
+            return hit[1]
+
+    ctx = builder()
+
+    with _lock:
+        _cache[key] = (time.monotonic(), ctx)
+        _cache.move_to_end(key)
+        while len(_cache) > CONTEXT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return ctx
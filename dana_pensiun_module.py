@@ -1,8 +1,12 @@
 # dana_pensiun_module.py
 import os
+import time
+import numpy as np
 import pandas as pd
 import logging
+import snapshots
 from db_loaders import load_dana_pensiun_data_from_db
+from regions import add_region_ids, region_id
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +88,7 @@ def load_dp_data():
     ).fillna(0).astype(int)
 
     df["periode"] = pd.to_datetime(dict(year=df["Tahun"], month=df["Bulan"], day=1))
+    add_region_ids(df, "Provinsi")
     return df
 
 def make_agg_month_dp(df_src: pd.DataFrame) -> pd.DataFrame:
@@ -147,101 +152,322 @@ def growth_class(v):
         return "secondary"
     return "success" if v >= 0 else "danger"
 
-def build_dana_pensiun_context(request):
-    df = load_dp_data()
-
+# -------------------------------------------------
+# MATRIKS WILAYAH × PERIODE
+# -------------------------------------------------
+# Interval muat ulang matriks di background (detik); tabel DB bisa diubah di luar aplikasi
+DP_CACHE_TTL = float(os.environ.get("DP_CACHE_TTL", "300"))
+
+DP_METRICS = ("Aset", "Aset Neto", "Investasi", "Jumlah Dana Pensiun")
+
+# Kolom leaderboard: kunci → label. Urutan = sumbu terakhir matrix["table"]
+DP_LEADERBOARD_METRICS = {
+    "aset": "Aset",
+    "aset_yoy": "Aset YoY",
+    "aset_ytd": "Aset YtD",
+    "aset_neto": "Aset Neto",
+    "aset_neto_yoy": "Aset Neto YoY",
+    "aset_neto_ytd": "Aset Neto YtD",
+    "investasi": "Investasi",
+    "investasi_yoy": "Investasi YoY",
+    "investasi_ytd": "Investasi YtD",
+    "jumlah": "Jumlah Dana Pensiun",
+    "jumlah_yoy": "Jumlah Dana Pensiun YoY",
+    "jumlah_ytd": "Jumlah Dana Pensiun YtD",
+    "rasio_investasi": "Rasio Investasi/Aset",
+    "rasio_aset_neto": "Rasio Aset Neto/Aset",
+}
+DP_LEADERBOARD_INDEX = {k: i for i, k in enumerate(DP_LEADERBOARD_METRICS)}
+_DP_METRIC_KEYS = ("aset", "aset_neto", "investasi", "jumlah")
+
+
+def _safe_ratio(num, den, scale=100.0, fill=np.nan):
+    return np.divide(num * scale, den, out=np.full(np.broadcast(num, den).shape, fill), where=den != 0)
+
+
+def build_dana_pensiun_matrix(df: pd.DataFrame) -> dict:
+    """
+    Matriks dana pensiun wilayah × periode (Tahun, Bulan) untuk DP_METRICS.
+
+    Wilayah = (negara|None, prov_id|None): nasional, per negara, per provinsi
+    dan per (negara, provinsi). Selain nilai, dihitung sekali:
+    - YoY (bulan sama tahun sebelumnya) & YtD (periode pertama di tahun yang
+      sama) per sel, mengikuti periode yang ada datanya di wilayah tsb,
+    - rasio Investasi/Aset & Aset Neto/Aset,
+    - table[wilayah, periode, kolom] = semua kolom DP_LEADERBOARD_METRICS.
+    """
     negara_list = sorted(df["Negara"].dropna().unique().tolist())
     provinsi_list = sorted(df["Provinsi"].dropna().unique().tolist())
     tahun_list = sorted(df["Tahun"].dropna().unique().tolist())
     bulan_list = sorted(df["Bulan"].dropna().unique().tolist())
 
-    negara = request.args.get("negara") or ""
-    provinsi = request.args.get("provinsi") or ""
-    tahun = request.args.get("tahun") or ""
-    bulan = request.args.get("bulan") or ""
-    interval = request.args.get("interval") or "bulanan"
+    # Periode (Tahun, Bulan) urut waktu
+    period_key = df["Tahun"].to_numpy(np.int64) * 100 + df["Bulan"].to_numpy(np.int64)
+    periods, p_code = np.unique(period_key, return_inverse=True)
+    period_tahun = periods // 100
+    period_bulan = periods % 100
+    period_labels = pd.to_datetime(
+        dict(year=period_tahun, month=period_bulan, day=1)
+    ).dt.strftime("%b '%y").tolist()
+
+    # Kunci wilayah per level rollup
+    negara_codes, negara_ids = pd.factorize(df["Negara"])
+    prov_codes, prov_ids = pd.factorize(df["prov_id"])
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([df["Negara"], df["prov_id"]]))
+
+    region_keys = [(None, None)]
+    region_keys += [(n, None) for n in negara_ids]
+    region_keys += [(None, int(pid)) for pid in prov_ids]
+    region_keys += [(n, int(pid)) for n, pid in pairs]
+    region_index = {key: i for i, key in enumerate(region_keys)}
+    offsets = (0, 1, 1 + len(negara_ids), 1 + len(negara_ids) + len(prov_ids))
+    level_codes = (np.zeros(len(df), dtype=np.int64), negara_codes, prov_codes, pair_codes)
+
+    measures = df[list(DP_METRICS)].to_numpy(np.float64)
+    values = np.zeros((len(region_keys), len(periods), len(DP_METRICS)))
+    rows = np.zeros((len(region_keys), len(periods)))
+    for offset, codes in zip(offsets, level_codes):
+        ok = codes >= 0
+        np.add.at(values, (codes[ok] + offset, p_code[ok]), measures[ok])
+        np.add.at(rows, (codes[ok] + offset, p_code[ok]), 1)
+    present = rows > 0
+
+    # YoY: periode (Tahun-1, Bulan) yang ada datanya di wilayah yang sama
+    pos = {int(k): i for i, k in enumerate(periods)}
+    yoy_idx = np.array([pos.get(int(k) - 100, -1) for k in periods], dtype=np.int64)
+    prev = values[:, yoy_idx]
+    prev_ok = (yoy_idx >= 0)[None, :] & present[:, yoy_idx]
+    yoy = _safe_ratio(values - prev, np.where(prev_ok[..., None], prev, 0.0))
+
+    # YtD: periode pertama yang ada datanya di tahun yang sama
+    base_idx = np.zeros(present.shape, dtype=np.int64)
+    for y in np.unique(period_tahun):
+        cols = np.flatnonzero(period_tahun == y)
+        base_idx[:, cols] = cols[np.argmax(present[:, cols], axis=1)][:, None]
+    base = np.take_along_axis(values, base_idx[..., None], axis=1)
+    ytd = _safe_ratio(values - base, base)
+
+    aset = values[..., DP_METRICS.index("Aset")]
+    ratio_invest = _safe_ratio(values[..., DP_METRICS.index("Investasi")], aset, fill=0.0)
+    ratio_asetnet = _safe_ratio(values[..., DP_METRICS.index("Aset Neto")], aset, fill=0.0)
+
+    table = np.empty(values.shape[:2] + (len(DP_LEADERBOARD_METRICS),))
+    for m, key in enumerate(_DP_METRIC_KEYS):
+        table[..., DP_LEADERBOARD_INDEX[key]] = values[..., m]
+        table[..., DP_LEADERBOARD_INDEX[f"{key}_yoy"]] = yoy[..., m]
+        table[..., DP_LEADERBOARD_INDEX[f"{key}_ytd"]] = ytd[..., m]
+    table[..., DP_LEADERBOARD_INDEX["rasio_investasi"]] = ratio_invest
+    table[..., DP_LEADERBOARD_INDEX["rasio_aset_neto"]] = ratio_asetnet
+
+    # Nama provinsi per prov_id (nama pertama di data) & baris leaderboard per negara
+    prov_name = dict(zip(df["prov_id"].astype(int), df["Provinsi"]))
+    by_name = sorted(prov_ids, key=lambda pid: str(prov_name[int(pid)]))
+    leaderboard_rows = {
+        n: np.array([region_index[(n, int(pid))] for pid in by_name if (n, int(pid)) in region_index], dtype=np.int64)
+        for n in [None] + list(negara_ids)
+    }
+
+    return dict(
+        negara_list=negara_list,
+        provinsi_list=provinsi_list,
+        tahun_list=tahun_list,
+        bulan_list=bulan_list,
+        period_tahun=period_tahun,
+        period_bulan=period_bulan,
+        period_labels=period_labels,
+        region_keys=region_keys,
+        region_index=region_index,
+        prov_name=prov_name,
+        leaderboard_rows=leaderboard_rows,
+        values=values,
+        present=present,
+        yoy=yoy,
+        ytd=ytd,
+        ratio_invest=ratio_invest,
+        ratio_asetnet=ratio_asetnet,
+        table=table,
+    )
 
-    selected_year = int(tahun) if tahun else None
-    selected_month = int(bulan) if bulan else None
 
-    df_region = df.copy()
-    if negara:
-        df_region = df_region[df_region["Negara"] == negara]
-    if provinsi:
-        df_region = df_region[df_region["Provinsi"] == provinsi]
-    if df_region.empty:
-        df_region = df.copy()
+def _build_dana_pensiun_snapshot(df: pd.DataFrame) -> dict:
+    start = time.perf_counter()
+    matrix = build_dana_pensiun_matrix(df)
+    logger.info(
+        f"🧊 [DANA PENSIUN] Matriks dibangun: {len(matrix['region_keys'])} wilayah × "
+        f"{len(matrix['period_labels'])} periode ({(time.perf_counter() - start) * 1000:.0f} ms)"
+    )
+    return matrix
 
-    agg_month = make_agg_month_dp(df_region)
 
-    dp_aset_val, dp_aset_yoy, dp_aset_ytd = compute_growth(
-        agg_month, "Aset", selected_year, selected_month
-    )
-    dp_asetnet_val, dp_asetnet_yoy, dp_asetnet_ytd = compute_growth(
-        agg_month, "Aset Neto", selected_year, selected_month
-    )
-    dp_invest_val, dp_invest_yoy, dp_invest_ytd = compute_growth(
-        agg_month, "Investasi", selected_year, selected_month
-    )
-    dp_jumlah_val, dp_jumlah_yoy, dp_jumlah_ytd = compute_growth(
-        agg_month, "Jumlah Dana Pensiun", selected_year, selected_month
+# Frame bersih dimuat sekali per versi; matriks (dashboard) dan frame query /
+# ekspor (query_engine) sama-sama memakai snapshot ini
+snapshots.register("dana_pensiun_frame", load_dp_data, dataset="dana_pensiun", interval=DP_CACHE_TTL)
+snapshots.register("dana_pensiun", _build_dana_pensiun_snapshot, source="dana_pensiun_frame")
+
+
+def get_dana_pensiun_matrix() -> dict:
+    """
+    Snapshot matriks dana pensiun terakhir. Dibangun sekali, dipakai bersama
+    semua request; dimuat ulang di background saat versi data "dana_pensiun"
+    berubah atau setelah DP_CACHE_TTL detik.
+    """
+    return snapshots.get("dana_pensiun")
+
+
+def current_period(matrix: dict, r: int, selected_year, selected_month) -> int:
+    """
+    Indeks periode "saat ini" untuk wilayah r, aturan sama dengan
+    compute_growth: bulan terpilih → bulan terakhir <= bulan terpilih di
+    tahun itu → periode terakhir tahun itu → periode terakhir.
+    """
+    idx = np.flatnonzero(matrix["present"][r])
+    if selected_year is not None:
+        in_year = idx[matrix["period_tahun"][idx] == selected_year]
+        if selected_month is not None:
+            months = matrix["period_bulan"][in_year]
+            le = in_year[months <= selected_month]
+            if (months == selected_month).any():
+                return int(in_year[months == selected_month][-1])
+            if le.size:
+                return int(le[-1])
+        elif in_year.size:
+            return int(in_year[-1])
+    return int(idx[-1])
+
+
+def dana_pensiun_leaderboard(
+    matrix: dict,
+    metric: str = "aset",
+    selected_year=None,
+    selected_month=None,
+    negara: str = "",
+    descending: bool = True,
+    limit: int | None = None,
+) -> dict:
+    """
+    Peringkat provinsi menurut satu kolom DP_LEADERBOARD_METRICS pada satu
+    periode. Nilai kosong (mis. YoY tanpa pembanding) selalu di bawah.
+    """
+    negara_key = negara or None
+    rows = matrix["leaderboard_rows"].get(negara_key, np.empty(0, dtype=np.int64))
+    r_level = matrix["region_index"].get((negara_key, None))
+    if r_level is None or not rows.size:
+        return dict(metric=metric, periode=None, tahun=None, bulan=None, columns=list(DP_LEADERBOARD_METRICS), rows=[])
+
+    p = current_period(matrix, r_level, selected_year, selected_month)
+    rows = rows[matrix["present"][rows, p]]
+    cells = matrix["table"][rows, p]
+    col = cells[:, DP_LEADERBOARD_INDEX[metric]]
+    missing = np.isnan(col)
+    key = np.where(missing, 0.0, -col if descending else col)
+    order = np.lexsort((key, missing))[:limit]
+
+    return dict(
+        metric=metric,
+        periode=matrix["period_labels"][p],
+        tahun=int(matrix["period_tahun"][p]),
+        bulan=int(matrix["period_bulan"][p]),
+        columns=list(DP_LEADERBOARD_METRICS),
+        rows=[
+            dict(
+                rank=rank,
+                provinsi=matrix["prov_name"][matrix["region_keys"][rows[i]][1]],
+                **{k: (None if np.isnan(v) else float(v)) for k, v in zip(DP_LEADERBOARD_METRICS, cells[i])},
+            )
+            for rank, i in enumerate(order, start=1)
+        ],
     )
 
-    agg_year = (
-        agg_month.groupby(["Tahun"], as_index=False)
-        .agg(
-            {
-                "Aset": "sum",
-                "Aset Neto": "sum",
-                "Investasi": "sum",
-                "Jumlah Dana Pensiun": "sum",
-            }
-        )
-        .sort_values("Tahun")
+
+def build_dana_pensiun_filters(request) -> dict:
+    """Dropdown dan filter terpilih dashboard dana pensiun (cukup untuk shell HTML)."""
+    matrix = get_dana_pensiun_matrix()
+    lb_metric = request.args.get("lb_metric") or "aset"
+    if lb_metric not in DP_LEADERBOARD_METRICS:
+        lb_metric = "aset"
+    return dict(
+        negara_list=matrix["negara_list"],
+        provinsi_list=matrix["provinsi_list"],
+        tahun_list=matrix["tahun_list"],
+        bulan_list=matrix["bulan_list"],
+        negara_selected=request.args.get("negara") or "",
+        provinsi_selected=request.args.get("provinsi") or "",
+        tahun_selected=request.args.get("tahun") or "",
+        bulan_selected=request.args.get("bulan") or "",
+        interval_selected=request.args.get("interval") or "bulanan",
+        dp_lb_metric_list=list(DP_LEADERBOARD_METRICS.items()),
+        dp_lb_metric_selected=lb_metric,
     )
-    dp_year_labels  = agg_year["Tahun"].astype(str).tolist()
-    dp_year_aset    = agg_year["Aset"].tolist()
-    dp_year_asetnet = agg_year["Aset Neto"].tolist()
-    dp_year_invest  = agg_year["Investasi"].tolist()
-    dp_year_jumlah  = agg_year["Jumlah Dana Pensiun"].tolist()
+
+
+def build_dana_pensiun_context(request):
+    matrix = get_dana_pensiun_matrix()
+
+    filters = build_dana_pensiun_filters(request)
+    negara = filters["negara_selected"]
+    provinsi = filters["provinsi_selected"]
+    tahun = filters["tahun_selected"]
+    bulan = filters["bulan_selected"]
+    lb_metric = filters["dp_lb_metric_selected"]
+
+    selected_year = int(tahun) if tahun else None
+    selected_month = int(bulan) if bulan else None
+
+    # Filter wilayah; kombinasi tanpa data → semua data
+    prov_key = region_id(provinsi) if provinsi else None
+    r = None
+    if not (provinsi and prov_key is None):
+        r = matrix["region_index"].get((negara or None, prov_key))
+    if r is None:
+        r = matrix["region_index"][(None, None)]
+
+    present = np.flatnonzero(matrix["present"][r])
+    values = matrix["values"][r]
+    cur = current_period(matrix, r, selected_year, selected_month)
+
+    def growth(m):
+        i = DP_METRICS.index(m)
+        val = float(values[cur, i])
+        yoy = matrix["yoy"][r, cur, i]
+        ytd = matrix["ytd"][r, cur, i]
+        return val, (None if np.isnan(yoy) else float(yoy)), (None if np.isnan(ytd) else float(ytd))
+
+    dp_aset_val, dp_aset_yoy, dp_aset_ytd = growth("Aset")
+    dp_asetnet_val, dp_asetnet_yoy, dp_asetnet_ytd = growth("Aset Neto")
+    dp_invest_val, dp_invest_yoy, dp_invest_ytd = growth("Investasi")
+    dp_jumlah_val, dp_jumlah_yoy, dp_jumlah_ytd = growth("Jumlah Dana Pensiun")
+
+    # Jumlah per tahun dari periode bulanan yang ada datanya
+    years, y_code = np.unique(matrix["period_tahun"][present], return_inverse=True)
+    agg_year = np.zeros((len(years), len(DP_METRICS)))
+    np.add.at(agg_year, y_code, values[present])
+    dp_year_labels  = [str(y) for y in years.tolist()]
+    dp_year_aset    = agg_year[:, 0].tolist()
+    dp_year_asetnet = agg_year[:, 1].tolist()
+    dp_year_invest  = agg_year[:, 2].tolist()
+    dp_year_jumlah  = agg_year[:, 3].tolist()
 
     # mini 3 periode (boleh simple aja: pakai bulanan)
-    base_labels = agg_month["periode"].dt.strftime("%b '%y").tolist()
-    base_aset   = agg_month["Aset"].tolist()
-    base_invest = agg_month["Investasi"].tolist()
-    base_jumlah = agg_month["Jumlah Dana Pensiun"].tolist()
-
-    if len(base_labels) >= 3:
-        dp_mini_labels = base_labels[-3:]
-        dp_mini_aset   = base_aset[-3:]
-        dp_mini_invest = base_invest[-3:]
-        dp_mini_jumlah = base_jumlah[-3:]
-    else:
-        dp_mini_labels = base_labels
-        dp_mini_aset   = base_aset
-        dp_mini_invest = base_invest
-        dp_mini_jumlah = base_jumlah
-
-    # rasio Desember (optional, bisa dikosongkan kalau belum mau dipakai)
-    dec_all = agg_month[agg_month["Bulan"] == 12].sort_values("Tahun")
-    dp_ratio_labels = [f"Des'{str(y)[-2:]}" for y in dec_all["Tahun"]]
-    aset = dec_all["Aset"].replace(0, pd.NA)
-    invest = dec_all["Investasi"]
-    asetnet = dec_all["Aset Neto"]
-
-    dp_ratio_invest = ((invest / aset) * 100).fillna(0).tolist()
-    dp_ratio_asetnet = ((asetnet / aset) * 100).fillna(0).tolist()
+    mini = present[-3:]
+    dp_mini_labels = [matrix["period_labels"][i] for i in mini]
+    dp_mini_aset   = values[mini, 0].tolist()
+    dp_mini_invest = values[mini, 2].tolist()
+    dp_mini_jumlah = values[mini, 3].tolist()
+
+    # rasio Desember
+    dec = present[matrix["period_bulan"][present] == 12]
+    dp_ratio_labels = [f"Des'{str(y)[-2:]}" for y in matrix["period_tahun"][dec].tolist()]
+    dp_ratio_invest = matrix["ratio_invest"][r, dec].tolist()
+    dp_ratio_asetnet = matrix["ratio_asetnet"][r, dec].tolist()
+
+    # Leaderboard provinsi pada periode terpilih
+    leaderboard = dana_pensiun_leaderboard(
+        matrix, lb_metric, selected_year, selected_month,
+        negara=negara if (negara or None, None) in matrix["region_index"] else "",
+    )
 
     ctx = dict(
-        negara_list=negara_list,
-        provinsi_list=provinsi_list,
-        tahun_list=tahun_list,
-        bulan_list=bulan_list,
-        negara_selected=negara,
-        provinsi_selected=provinsi,
-        tahun_selected=tahun,
-        bulan_selected=bulan,
-        interval_selected=interval,
+        **filters,
         dp_aset_val=dp_aset_val,
         dp_aset_yoy=dp_aset_yoy,
         dp_aset_ytd=dp_aset_ytd,
@@ -274,5 +500,9 @@ def build_dana_pensiun_context(request):
         dp_ratio_labels=dp_ratio_labels,
         dp_ratio_invest=dp_ratio_invest,
         dp_ratio_asetnet=dp_ratio_asetnet,
+
+        # Leaderboard provinsi
+        dp_lb_periode=leaderboard["periode"],
+        dp_lb_rows=leaderboard["rows"],
     )
     return ctx
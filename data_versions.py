@@ -0,0 +1,224 @@
+# data_versions.py
+"""
+Versi data per dataset + kanal event perubahan.
+
+Versi = timestamp nanodetik perubahan terakhir (mtime file sumber di data/,
+atau waktu commit dari route submit-data/*). Nilainya hanya naik, jadi bisa
+dipakai sebagai kunci cache dan dibandingkan antar worker.
+
+- Watcher thread memantau file di data/ (polling mtime).
+- bump() dipanggil setelah submit-data commit; perubahan disebar ke worker
+  lain lewat PostgreSQL NOTIFY/LISTEN (kalau DB tersedia).
+- wait_events() dipakai endpoint SSE untuk menunggu event baru.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "data"
+
+# File sumber → dataset yang dibangun dari file tersebut
+DATASET_FILES = {
+    "KINERJA PERBANKAN.xlsx": ("perbankan", "umkm", "konv_syariah"),
+    "KINERJA NONBANK.xlsx": ("asuransi", "dana_pensiun"),
+    "Komoditas.xlsx": ("komoditas",),
+    "Data Komoditi (1).xlsx": ("komoditas_kabkota",),
+    "Kredit Lok Bank - Sub Sektor.xlsx": ("kredit_lokasi",),
+}
+
+DATASETS = (
+    "perbankan",
+    "umkm",
+    "konv_syariah",
+    "asuransi",
+    "dana_pensiun",
+    "kredit_lokasi",
+    "komoditas",
+    "komoditas_kabkota",
+    "jumlah_petani",
+)
+
+# Interval polling folder data/ (detik)
+DATA_WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", "2"))
+
+# Kanal NOTIFY PostgreSQL untuk menyebarkan bump() ke worker lain
+NOTIFY_CHANNEL = "data_versions"
+LISTEN_RETRY = float(os.environ.get("DATA_VERSIONS_LISTEN_RETRY", "30"))
+
+_versions = {name: 0 for name in DATASETS}
+_events = deque(maxlen=256)  # (seq, dataset, version)
+_seq = 0
+_cond = threading.Condition()
+_file_mtimes = {}
+_started = False
+_start_lock = threading.Lock()
+
+
+def _apply(dataset: str, version: int, source: str) -> bool:
+    """Set versi dataset kalau lebih baru; catat event & bangunkan pendengar."""
+    global _seq
+    with _cond:
+        if version <= _versions.get(dataset, 0):
+            return False
+        _versions[dataset] = version
+        _seq += 1
+        _events.append((_seq, dataset, version))
+        _cond.notify_all()
+    logger.info(f"🔄 [DATA VERSION] {dataset} → {version} ({source})")
+    return True
+
+
+# -------------------------------------------------
+# API PUBLIK
+# -------------------------------------------------
+def get_version(dataset: str) -> int:
+    """Versi terkini dataset (0 kalau belum pernah berubah sejak proses mulai)."""
+    ensure_started()
+    return _versions.get(dataset, 0)
+
+
+def snapshot() -> dict:
+    """Salinan versi semua dataset: nama → versi."""
+    ensure_started()
+    with _cond:
+        return dict(_versions)
+
+
+def current_seq() -> int:
+    with _cond:
+        return _seq
+
+
+def bump(dataset: str) -> int:
+    """
+    Tandai dataset berubah (mis. setelah submit-data commit).
+    Return versi baru; worker lain diberi tahu lewat NOTIFY.
+    """
+    ensure_started()
+    with _cond:
+        version = max(time.time_ns(), _versions.get(dataset, 0) + 1)
+    _apply(dataset, version, "submit")
+    _notify_db(dataset, version)
+    return version
+
+
+def wait_events(after_seq: int, timeout: float):
+    """
+    Tunggu sampai ada event dengan seq > after_seq (maks `timeout` detik).
+    Return: (seq_terakhir, [ (seq, dataset, version), ... ]).
+    """
+    with _cond:
+        _cond.wait_for(lambda: _seq > after_seq, timeout=timeout)
+        return _seq, [e for e in _events if e[0] > after_seq]
+
+
+# -------------------------------------------------
+# WATCHER FILE data/
+# -------------------------------------------------
+def _scan_files(initial: bool = False):
+    try:
+        entries = list(os.scandir(DATA_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        datasets = DATASET_FILES.get(entry.name)
+        if not datasets or not entry.is_file():
+            continue
+        mtime = entry.stat().st_mtime_ns
+        if _file_mtimes.get(entry.name) == mtime:
+            continue
+        _file_mtimes[entry.name] = mtime
+        for dataset in datasets:
+            with _cond:
+                # mtime bisa mundur (file disalin dengan timestamp lama), versi tetap naik
+                version = mtime if initial else max(mtime, _versions.get(dataset, 0) + 1)
+            _apply(dataset, version, "file awal" if initial else f"file {entry.name}")
+
+
+def _watch_loop():
+    while True:
+        time.sleep(DATA_WATCH_INTERVAL)
+        try:
+            _scan_files()
+        except Exception as e:
+            logger.error(f"❌ [DATA VERSION] Gagal memindai folder data: {e}")
+
+
+# -------------------------------------------------
+# NOTIFY / LISTEN POSTGRESQL (antar worker)
+# -------------------------------------------------
+def _notify_db(dataset: str, version: int):
+    try:
+        from sqlalchemy import text
+        from database import get_db_engine
+
+        payload = json.dumps({"dataset": dataset, "version": version})
+        with get_db_engine().begin() as conn:
+            conn.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": NOTIFY_CHANNEL, "payload": payload})
+    except Exception as e:
+        logger.warning(f"⚠️  [DATA VERSION] NOTIFY gagal, hanya worker ini yang tahu: {e}")
+
+
+def _listen_loop():
+    import psycopg2
+    from database import DATABASE_URL
+
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+            logger.info(f"📡 [DATA VERSION] LISTEN {NOTIFY_CHANNEL} aktif")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        msg = json.loads(note.payload)
+                        _apply(msg["dataset"], int(msg["version"]), "notify")
+                    except Exception as e:
+                        logger.warning(f"⚠️  [DATA VERSION] Payload NOTIFY tidak valid: {e}")
+        except Exception as e:
+            logger.warning(f"⚠️  [DATA VERSION] LISTEN terputus, coba lagi {LISTEN_RETRY:.0f} detik: {e}")
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(LISTEN_RETRY)
+
+
+def ensure_started():
+    """Mulai watcher & listener sekali per proses (lazy, aman setelah fork)."""
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _scan_files(initial=True)
+        threading.Thread(target=_watch_loop, name="data-watch", daemon=True).start()
+        threading.Thread(target=_listen_loop, name="data-listen", daemon=True).start()
+        _started = True
+
+
+def _reset_after_fork():
+    # Thread tidak ikut ter-fork; worker baru memulai watcher-nya sendiri
+    global _started, _cond, _start_lock
+    _started = False
+    _cond = threading.Condition()
+    _start_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
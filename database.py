@@ -7,6 +7,7 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import os
 import logging
+import threading
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -41,22 +42,51 @@ def init_db(app: Flask):
         raise
 
 
+# Ukuran pool koneksi untuk query langsung (loader dashboard berjalan paralel,
+# masing-masing meminjam koneksinya sendiri dari pool ini)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "5"))
+
+_engine = None
+_Session = None
+_engine_lock = threading.Lock()
+
+
 def get_db_engine():
-    """Get SQLAlchemy engine for direct queries"""
-    try:
-        engine = create_engine(DATABASE_URL)
-        logger.debug("Engine database berhasil dibuat")
-        return engine
-    except Exception as e:
-        logger.error(f"❌ Gagal membuat engine database: {str(e)}")
-        raise
+    """Get SQLAlchemy engine for direct queries (satu engine + pool per proses)"""
+    global _engine, _Session
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            try:
+                _engine = create_engine(
+                    DATABASE_URL,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=True,
+                )
+                _Session = sessionmaker(bind=_engine)
+                logger.debug("Engine database berhasil dibuat")
+            except Exception as e:
+                logger.error(f"❌ Gagal membuat engine database: {str(e)}")
+                raise
+    return _engine
+
+
+def _reset_engine_after_fork():
+    """Worker hasil fork (gunicorn) tidak boleh memakai koneksi pool milik parent."""
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_engine_after_fork)
 
 
 def get_db_session():
     """Get database session for direct queries"""
-    engine = get_db_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    get_db_engine()
+    return _Session()
 
 
 def test_db_connection():
@@ -0,0 +1,179 @@
+# db_breaker.py
+"""
+Circuit breaker untuk query PostgreSQL dari loader dashboard.
+
+Setelah DB_BREAKER_THRESHOLD kegagalan koneksi berturut-turut breaker
+"terbuka": query berikutnya langsung gagal dengan DatabaseUnavailable
+(tanpa connect & menunggu timeout), sehingga loader langsung memakai
+fallback Excel dan refresher snapshot mempertahankan snapshot terakhir.
+
+Selama terbuka, satu thread probe per proses mencoba `SELECT 1` setiap
+DB_BREAKER_PROBE_INTERVAL detik; begitu berhasil breaker ditutup dan
+listener (mis. snapshots) diberi tahu supaya data dimuat ulang dari DB.
+
+Hanya error yang menandakan DB tidak bisa dihubungi yang dihitung (koneksi
+ditolak / putus, timeout pool); error SQL biasa tidak membuka breaker.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import exc as sa_exc
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+DB_BREAKER_THRESHOLD = int(os.environ.get("DB_BREAKER_THRESHOLD", "3"))
+DB_BREAKER_PROBE_INTERVAL = float(os.environ.get("DB_BREAKER_PROBE_INTERVAL", "10"))
+
+CLOSED = "closed"
+OPEN = "open"
+
+_state = dict(state=CLOSED, failures=0, opened_at=None, last_error=None, last_probe=None, probing=False)
+_lock = threading.Lock()
+_listeners = []
+
+
+class DatabaseUnavailable(RuntimeError):
+    """Query tidak dijalankan karena circuit breaker DB sedang terbuka."""
+
+
+def is_outage(error: BaseException) -> bool:
+    """True kalau error menandakan DB tidak bisa dihubungi (bukan error SQL biasa)."""
+    if isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError, sa_exc.DisconnectionError)):
+        return True
+    if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, OSError)
+
+
+def _describe(error: BaseException) -> str:
+    lines = str(error).splitlines()
+    return f"{error.__class__.__name__}: {lines[0] if lines else ''}"
+
+
+def add_listener(callback):
+    """Daftarkan callback() yang dipanggil setiap kali breaker tertutup kembali."""
+    _listeners.append(callback)
+
+
+# -------------------------------------------------
+# API PUBLIK
+# -------------------------------------------------
+def is_open() -> bool:
+    return _state["state"] == OPEN
+
+
+def check():
+    """Lempar DatabaseUnavailable kalau breaker terbuka (dan pastikan probe jalan)."""
+    if _state["state"] == OPEN:
+        _ensure_probe()
+        raise DatabaseUnavailable("database tidak tersedia (circuit breaker terbuka)")
+
+
+def record_success():
+    if _state["failures"] or _state["state"] == OPEN:
+        _close("query berhasil")
+
+
+def record_failure(error: BaseException):
+    with _lock:
+        _state["failures"] += 1
+        _state["last_error"] = _describe(error)
+        opened = _state["state"] == CLOSED and _state["failures"] >= DB_BREAKER_THRESHOLD
+        if opened:
+            _state["state"] = OPEN
+            _state["opened_at"] = time.time()
+    if opened:
+        logger.error(
+            f"🔌 [DB BREAKER] Terbuka setelah {_state['failures']} kegagalan berturut-turut; "
+            f"loader memakai snapshot terakhir / Excel, probe tiap {DB_BREAKER_PROBE_INTERVAL:.0f} detik"
+        )
+        _ensure_probe()
+
+
+@contextmanager
+def guard():
+    """
+    Bungkus akses DB: langsung gagal kalau breaker terbuka, catat hasilnya.
+    Error lain (mis. SQL salah) diteruskan tanpa memengaruhi breaker.
+    """
+    check()
+    try:
+        yield
+    except BaseException as e:
+        if is_outage(e):
+            record_failure(e)
+        raise
+    record_success()
+
+
+def status() -> dict:
+    """Kondisi breaker untuk monitoring."""
+    st = dict(_state)
+    return dict(
+        state=st["state"],
+        consecutive_failures=st["failures"],
+        threshold=DB_BREAKER_THRESHOLD,
+        open_seconds=round(time.time() - st["opened_at"], 1) if st["state"] == OPEN else None,
+        last_error=st["last_error"],
+        last_probe=st["last_probe"],
+        probe_interval=DB_BREAKER_PROBE_INTERVAL,
+    )
+
+
+# -------------------------------------------------
+# PROBE (thread background selama terbuka)
+# -------------------------------------------------
+def _close(reason: str):
+    with _lock:
+        was_open = _state["state"] == OPEN
+        _state.update(state=CLOSED, failures=0, opened_at=None)
+    if not was_open:
+        return
+    logger.info(f"✅ [DB BREAKER] Tertutup kembali ({reason})")
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"❌ [DB BREAKER] Listener gagal: {e}")
+
+
+def _probe_loop():
+    from database import get_db_engine
+
+    try:
+        while _state["state"] == OPEN:
+            time.sleep(DB_BREAKER_PROBE_INTERVAL)
+            _state["last_probe"] = time.time()
+            try:
+                with get_db_engine().connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception as e:
+                _state["last_error"] = _describe(e)
+                logger.warning(f"⚠️  [DB BREAKER] Probe gagal, database masih belum tersedia ({e.__class__.__name__})")
+                continue
+            _close("probe berhasil")
+    finally:
+        with _lock:
+            _state["probing"] = False
+
+
+def _ensure_probe():
+    with _lock:
+        if _state["probing"]:
+            return
+        _state["probing"] = True
+    threading.Thread(target=_probe_loop, name="db-breaker-probe", daemon=True).start()
+
+
+def _reset_after_fork():
+    # Thread probe tidak ikut ter-fork; check() memulainya lagi kalau masih terbuka
+    global _lock
+    _lock = threading.Lock()
+    _state["probing"] = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,7 +1,12 @@
 """
 Database loaders - functions to load data from PostgreSQL database
 """
+import contextvars
+import re
+from contextlib import contextmanager
+
 import pandas as pd
+import db_breaker
 from database import get_db_session
 from sqlalchemy import text
 from functools import lru_cache
@@ -61,34 +66,243 @@ def bulan_nama(num: int) -> str:
     return str(num)
 
 
+# -------------------------------------------------
+# QUERY SUMBER PER DATASET
+# -------------------------------------------------
+# SQL disimpan sebagai konstanta agar bisa dipakai ulang oleh driver lain
+# (mis. asyncpg di api_async.py) tanpa menduplikasi query.
+PERBANKAN_SQL = """
+    SELECT 
+        "Negara",
+        "Provinsi",
+        "Tahun",
+        "Bulan",
+        "Total Aset" AS "Total Aset",
+        "Giro",
+        "Tabungan",
+        "Deposito",
+        "Total DPK " AS "Total DPK",
+        "Modal Kerja",
+        "Investasi",
+        "Konsumsi",
+        "Total Kredit",
+        "Nominal NPL Gross",
+        "Rasio NPL Gross",
+        "Nominal NPL Net",
+        "Rasio NPL Net",
+        "Loan to Deposit Rastio (LDR)"
+    FROM kinerja_perbankan_summary
+    ORDER BY "Tahun", "Bulan", "Provinsi"
+"""
+
+# Kolom "Bulan" di database adalah string, jadi filter Desember dilakukan di Python
+# Hanya baris Sumatera Selatan yang ditarik; pola LIKE sengaja longgar (mencakup
+# "SUMSEL", "Sumatra Selatan", dst) dan hasilnya dipastikan lagi lewat prov_id
+NPL_LDR_SQL = """
+    SELECT 
+        "Tahun",
+        "Bulan",
+        "Provinsi",
+        "Rasio NPL Gross",
+        "Loan to Deposit Rastio (LDR)"
+    FROM kinerja_perbankan_summary
+    WHERE UPPER("Provinsi") LIKE '%SUM%SEL%'
+    ORDER BY "Tahun", "Bulan"
+"""
+
+UMKM_SQL = """
+    SELECT 
+        "Provinsi",
+        "Tahun",
+        "Bulan",
+        "Jenis Kredit/Pembiayaan",
+        "Nominal Kredit \n(Rp Miliar)",
+        "Nominal NPL \n(Rp Miliar)",
+        "Nominal NPL Net (Rp Miliar)",
+        "Jumlah Rekening UMKM"
+    FROM perbankan
+    ORDER BY "Tahun", "Bulan", "Provinsi"
+"""
+
+KONV_SYARIAH_SQL = """
+    SELECT 
+        "Provinsi",
+        "Kab/Kota",
+        "Tahun",
+        "Bulan",
+        "Jenis Bank",
+        "Skema",
+        "Aset",
+        "Kredit ",
+        "DPK",
+        "NPL"
+    FROM daerah_perbankan
+    WHERE LOWER("Kab/Kota") LIKE '%all%'
+        AND UPPER("Jenis Bank") LIKE '%BANK UMUM%'
+    ORDER BY "Tahun", "Bulan", "Provinsi"
+"""
+
+ASURANSI_SQL = """
+    SELECT 
+        "Provinsi",
+        "Kabupaten",
+        "Periode",
+        "Tahun",
+        "Jenis",
+        "Premi (Rp Juta)",
+        "Klaim (Rp Juta)",
+        "Jumlah Peserta Premi",
+        "Jumlah Peserta Klaim ",
+        "Jumlah Polis Premi",
+        "Jumlah Polis Klaim "
+    FROM asuransi
+    ORDER BY "Tahun", "Periode", "Provinsi"
+"""
+
+DANA_PENSIUN_SQL = """
+    SELECT 
+        "Negara",
+        "Provinsi",
+        "Tahun",
+        "Bulan",
+        "Aset (Rp Miliar)",
+        "Aset Neto (Rp Miliar)",
+        "Investasi (Rp Miliar)",
+        "Jumlah Dana Pensiun"
+    FROM dana_pensiun
+    ORDER BY "Tahun", "Bulan", "Provinsi"
+"""
+
+KREDIT_LOKASI_SQL = """
+    SELECT 
+        "Sektor",
+        "Lokasi",
+        "Kredit"
+    FROM kredit_lok_bank
+    ORDER BY "Sektor", "Lokasi"
+"""
+
+JUMLAH_PETANI_SQL = """
+    SELECT 
+        "Komoditi",
+        "Provinsi",
+        "Kabupaten/Kota" AS "KabKota",
+        "Jumlah Petani" AS "JumlahPetani"
+    FROM jumlah_petani_kelapa_sumatera_selatan
+    ORDER BY "Jumlah Petani" DESC
+"""
+
+# Seluruh isi tabel daerah_perbankan (semua kab/kota & jenis bank), untuk ekspor
+DAERAH_PERBANKAN_SQL = """
+    SELECT *
+    FROM daerah_perbankan
+    ORDER BY "Tahun", "Bulan", "Provinsi"
+"""
+
+QUERIES = {
+    "perbankan": PERBANKAN_SQL,
+    "npl_ldr": NPL_LDR_SQL,
+    "umkm": UMKM_SQL,
+    "konv_syariah": KONV_SYARIAH_SQL,
+    "asuransi": ASURANSI_SQL,
+    "dana_pensiun": DANA_PENSIUN_SQL,
+    "kredit_lokasi": KREDIT_LOKASI_SQL,
+    "jumlah_petani": JUMLAH_PETANI_SQL,
+    "daerah_perbankan": DAERAH_PERBANKAN_SQL,
+}
+
+# Frame mentah yang sudah diambil lebih dulu oleh pemanggil (mis. lewat driver
+# async). Kalau dataset ada di sini, read_query memakainya tanpa query ulang;
+# kalau isinya exception, error itu dilempar supaya loader langsung fallback.
+_prefetched = contextvars.ContextVar("prefetched_frames", default=None)
+
+
+@contextmanager
+def use_prefetched(frames: dict):
+    """Pakai frame hasil prefetch (nama dataset → DataFrame/exception) di blok ini."""
+    token = _prefetched.set(frames)
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
+
+
+_SELECT_RE = re.compile(r"^\s*SELECT(.*?)\bFROM\b", re.S)
+_SELECT_COL_RE = re.compile(r'(\bAS\s+)?"([^"]*)"')
+
+
+@lru_cache(maxsize=None)
+def query_columns(name: str) -> tuple:
+    """
+    Nama kolom hasil query dataset `name` (urut seperti di SELECT, sesudah
+    alias AS), tanpa menjalankan query. Kosong untuk `SELECT *`.
+    """
+    columns = []
+    for alias, col in _SELECT_COL_RE.findall(_SELECT_RE.match(QUERIES[name]).group(1)):
+        if alias:
+            columns[-1] = col
+        else:
+            columns.append(col)
+    return tuple(columns)
+
+
+def _normalize_filter(value) -> str:
+    return str(value).strip().lower()
+
+
+def filtered_sql(name: str, filters: dict) -> tuple[str, dict]:
+    """
+    Bungkus query dataset `name` dengan WHERE per kolom hasil (filters:
+    kolom → nilai, atau list/tuple nilai = salah satu). Pencocokan tanpa beda
+    huruf besar/kecil & spasi di tepi.
+    """
+    clauses, params = [], {}
+    for i, (col, value) in enumerate(filters.items()):
+        if '"' in col:
+            raise ValueError(f"Nama kolom filter tidak valid: {col!r}")
+        column = f'lower(btrim(CAST(q."{col}" AS TEXT)))'
+        if isinstance(value, (list, tuple)):
+            names = [f"f{i}_{j}" for j in range(len(value))]
+            clauses.append(f"{column} IN (" + ", ".join(f":{n}" for n in names) + ")")
+            params.update({n: _normalize_filter(v) for n, v in zip(names, value)})
+        else:
+            clauses.append(f"{column} = :f{i}")
+            params[f"f{i}"] = _normalize_filter(value)
+    return f"SELECT * FROM ({QUERIES[name]}) AS q WHERE " + " AND ".join(clauses), params
+
+
+def read_query(name: str, filters: dict | None = None) -> pd.DataFrame:
+    """
+    Jalankan query dataset `name` (lihat QUERIES) dan kembalikan DataFrame mentah.
+    `filters` (opsional, kolom → nilai) dijalankan di database sebagai WHERE,
+    atau di pandas kalau frame dataset sudah di-prefetch.
+    """
+    filters = {col: value for col, value in (filters or {}).items() if value}
+
+    frames = _prefetched.get()
+    if frames is not None and name in frames:
+        result = frames[name]
+        if isinstance(result, BaseException):
+            raise result
+        df = result
+        for col, value in filters.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            df = df[df[col].astype(str).str.strip().str.lower().isin([_normalize_filter(v) for v in values])]
+        return df.copy()
+
+    sql, params = filtered_sql(name, filters) if filters else (QUERIES[name], {})
+    with db_breaker.guard():
+        session = get_db_session()
+        try:
+            return pd.read_sql(text(sql), session.bind, params=params)
+        finally:
+            session.close()
+
+
 def load_perbankan_data_from_db():
     """Load perbankan summary data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-SELECT 
-    "Negara",
-    "Provinsi",
-    "Tahun",
-    "Bulan",
-    "Total Aset" AS "Total Aset",
-    "Giro",
-    "Tabungan",
-    "Deposito",
-    "Total DPK " AS "Total DPK",
-    "Modal Kerja",
-    "Investasi",
-    "Konsumsi",
-    "Total Kredit",
-    "Nominal NPL Gross",
-    "Rasio NPL Gross",
-    "Nominal NPL Net",
-    "Rasio NPL Net",
-    "Loan to Deposit Rastio (LDR)"
-FROM kinerja_perbankan_summary
-            ORDER BY "Tahun", "Bulan", "Provinsi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("perbankan")
         
         # Add periode column for sorting
         if not df.empty:
@@ -110,28 +324,12 @@ FROM kinerja_perbankan_summary
     except Exception as e:
         logger.error(f"❌ [PERBANKAN] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
 def load_umkm_data_from_db():
     """Load UMKM data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-            SELECT 
-                "Provinsi",
-                "Tahun",
-                "Bulan",
-                "Jenis Kredit/Pembiayaan",
-                "Nominal Kredit \n(Rp Miliar)",
-                "Nominal NPL \n(Rp Miliar)",
-                "Nominal NPL Net (Rp Miliar)",
-                "Jumlah Rekening UMKM"
-            FROM perbankan
-            ORDER BY "Tahun", "Bulan", "Provinsi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("umkm")
         
         # Add periode column
         if not df.empty:
@@ -152,32 +350,12 @@ def load_umkm_data_from_db():
     except Exception as e:
         logger.error(f"❌ [UMKM] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
 def load_konv_syariah_data_from_db():
     """Load konvensional/syariah data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-            SELECT 
-                "Provinsi",
-                "Kab/Kota",
-                "Tahun",
-                "Bulan",
-                "Jenis Bank",
-                "Skema",
-                "Aset",
-                "Kredit ",
-                "DPK",
-                "NPL"
-            FROM daerah_perbankan
-            WHERE LOWER("Kab/Kota") LIKE '%all%'
-                AND UPPER("Jenis Bank") LIKE '%BANK UMUM%'
-            ORDER BY "Tahun", "Bulan", "Provinsi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("konv_syariah")
         
         # Add periode column
         if not df.empty:
@@ -198,31 +376,12 @@ def load_konv_syariah_data_from_db():
     except Exception as e:
         logger.error(f"❌ [KONV-SYARIAH] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
 def load_asuransi_data_from_db():
     """Load asuransi data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-            SELECT 
-                "Provinsi",
-                "Kabupaten",
-                "Periode",
-                "Tahun",
-                "Jenis",
-                "Premi (Rp Juta)",
-                "Klaim (Rp Juta)",
-                "Jumlah Peserta Premi",
-                "Jumlah Peserta Klaim ",
-                "Jumlah Polis Premi",
-                "Jumlah Polis Klaim "
-            FROM asuransi
-            ORDER BY "Tahun", "Periode", "Provinsi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("asuransi")
         
         # Parse quarter from periode
         if not df.empty:
@@ -250,28 +409,12 @@ def load_asuransi_data_from_db():
     except Exception as e:
         logger.error(f"❌ [ASURANSI] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
 def load_dana_pensiun_data_from_db():
     """Load dana pensiun data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-            SELECT 
-                "Negara",
-                "Provinsi",
-                "Tahun",
-                "Bulan",
-                "Aset (Rp Miliar)",
-                "Aset Neto (Rp Miliar)",
-                "Investasi (Rp Miliar)",
-                "Jumlah Dana Pensiun"
-            FROM dana_pensiun
-            ORDER BY "Tahun", "Bulan", "Provinsi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("dana_pensiun")
         
         # Add periode column
         if not df.empty:
@@ -293,24 +436,12 @@ def load_dana_pensiun_data_from_db():
     except Exception as e:
         logger.error(f"❌ [DANA PENSIUN] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
 def load_kredit_lokasi_data_from_db():
     """Load kredit lokasi data from database"""
-    session = get_db_session()
     try:
-        query = text("""
-            SELECT 
-                "Sektor",
-                "Lokasi",
-                "Kredit"
-            FROM kredit_lok_bank
-            WHERE LOWER("Sektor") LIKE '%perkebunan%'
-            ORDER BY "Sektor", "Lokasi"
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("kredit_lokasi")
 
         if not df.empty:
             logger.info(f"✅ [KREDIT LOKASI] Data dimuat dari database: {len(df)} baris")
@@ -322,24 +453,16 @@ def load_kredit_lokasi_data_from_db():
     except Exception as e:
         logger.error(f"❌ [KREDIT LOKASI] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
 
 
-def load_jumlah_petani_data_from_db():
-    """Load jumlah petani data from database"""
-    session = get_db_session()
+def load_jumlah_petani_data_from_db(provinsi: str | list | None = None, kabkota: str | list | None = None):
+    """
+    Load jumlah petani data from database.
+    Filter provinsi / kabupaten-kota (opsional, satu nama atau daftar ejaan)
+    dijalankan di SQL.
+    """
     try:
-        query = text("""
-            SELECT 
-                "Komoditi",
-                "Provinsi",
-                "Kabupaten/Kota" AS "KabKota",
-                "Jumlah Petani" AS "JumlahPetani"
-            FROM jumlah_petani_kelapa_sumatera_selatan
-            ORDER BY "Jumlah Petani" DESC
-        """)
-        df = pd.read_sql(query, session.bind)
+        df = read_query("jumlah_petani", {"Provinsi": provinsi, "KabKota": kabkota})
 
         if not df.empty:
             logger.info(f"✅ [JUMLAH PETANI] Data dimuat dari database: {len(df)} baris")
@@ -350,5 +473,18 @@ def load_jumlah_petani_data_from_db():
     except Exception as e:
         logger.error(f"❌ [JUMLAH PETANI] Error memuat dari database: {str(e)}")
         raise
-    finally:
-        session.close()
+
+
+def load_jumlah_petani_options_from_db():
+    """Daftar pasangan Provinsi / KabKota unik (untuk dropdown) tanpa menarik seluruh tabel."""
+    frames = _prefetched.get()
+    if frames is not None and "jumlah_petani" in frames:
+        return read_query("jumlah_petani")[["Provinsi", "KabKota"]].drop_duplicates()
+
+    with db_breaker.guard():
+        session = get_db_session()
+        try:
+            sql = f'SELECT DISTINCT q."Provinsi", q."KabKota" FROM ({JUMLAH_PETANI_SQL}) AS q'
+            return pd.read_sql(text(sql), session.bind)
+        finally:
+            session.close()
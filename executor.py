@@ -0,0 +1,143 @@
+# executor.py
+"""
+Thread pool bersama untuk pekerjaan I/O-bound (query PostgreSQL, baca Excel).
+
+Dipakai untuk menjalankan loader dataset yang saling independen secara paralel
+di dalam satu request. Pool dibuat lazy per proses sehingga aman dipakai di
+bawah gunicorn (pool tidak ikut ter-fork dari master).
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Batas thread loader per proses; jaga agar <= DB_POOL_SIZE + DB_MAX_OVERFLOW
+LOADER_MAX_WORKERS = int(os.environ.get("LOADER_MAX_WORKERS", "4"))
+
+# Section dashboard berjalan di pool terpisah: builder section boleh memakai
+# pool loader di dalamnya tanpa risiko deadlock (menunggu pool yang sama).
+SECTION_MAX_WORKERS = int(os.environ.get("SECTION_MAX_WORKERS", "4"))
+# Batas section yang antre + berjalan per proses. Kalau penuh, section baru
+# langsung jadi placeholder alih-alih antre di belakang builder yang lambat.
+SECTION_MAX_PENDING = int(os.environ.get("SECTION_MAX_PENDING", str(SECTION_MAX_WORKERS * 2)))
+
+_executors = {}
+_lock = threading.Lock()
+_section_slots = threading.BoundedSemaphore(SECTION_MAX_PENDING)
+
+
+def get_executor(name: str = "loader") -> ThreadPoolExecutor:
+    """Ambil (atau buat) thread pool bernama untuk proses ini."""
+    pool = _executors.get(name)
+    if pool is not None:
+        return pool
+    with _lock:
+        pool = _executors.get(name)
+        if pool is None:
+            workers = SECTION_MAX_WORKERS if name == "section" else LOADER_MAX_WORKERS
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            _executors[name] = pool
+            logger.info(f"🧵 Thread pool '{name}' dibuat: {workers} worker")
+    return pool
+
+
+def submit(fn, *args, **kwargs):
+    """Jadwalkan fn(*args, **kwargs) di thread pool loader, kembalikan Future."""
+    return submit_to("loader", fn, *args, **kwargs)
+
+
+def submit_to(name: str, fn, *args, **kwargs):
+    """
+    Jadwalkan fn di thread pool `name`. Context (contextvars) pemanggil ikut
+    dibawa ke thread worker, mis. frame prefetch dari db_loaders.use_prefetched.
+    """
+    ctx = contextvars.copy_context()
+    return get_executor(name).submit(ctx.run, fn, *args, **kwargs)
+
+
+def _reset_after_fork():
+    global _section_slots
+    _executors.clear()
+    _section_slots = threading.BoundedSemaphore(SECTION_MAX_PENDING)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def run_sections(sections: dict, timeout: float):
+    """
+    Jalankan beberapa builder context (nama → callable tanpa argumen) secara
+    bersamaan. Setiap section punya batas waktu `timeout` detik sejak dijadwalkan.
+
+    Return: dict nama → (ctx, error). Kalau builder gagal / lewat batas waktu,
+    ctx = None dan error berisi pesan singkat. Section yang belum mulai saat
+    batas waktu dibatalkan; yang sudah berjalan dibiarkan selesai sendiri di
+    background (hasilnya dibuang). Kalau pool section penuh (SECTION_MAX_PENDING),
+    section tidak dijadwalkan sama sekali.
+    """
+    deadline = time.monotonic() + timeout
+    futures, results = _schedule_sections(sections)
+
+    for name, fut in futures.items():
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            results[name] = (fut.result(timeout=remaining), None)
+        except FutureTimeoutError:
+            results[name] = _section_timed_out(name, fut, timeout)
+        except Exception as e:
+            results[name] = _section_failed(name, e)
+    return {name: results[name] for name in sections}
+
+
+async def run_sections_async(sections: dict, timeout: float):
+    """
+    Versi asyncio dari `run_sections` (batas SECTION_MAX_PENDING, batas waktu
+    dan pembatalan yang sama) untuk endpoint async: event loop menunggu
+    tanpa menahan thread.
+    """
+    futures, results = _schedule_sections(sections)
+    waiting = {name: asyncio.wrap_future(fut) for name, fut in futures.items()}
+    if waiting:
+        await asyncio.wait(waiting.values(), timeout=timeout)
+
+    for name, fut in futures.items():
+        if not waiting[name].done():
+            results[name] = _section_timed_out(name, fut, timeout)
+        elif waiting[name].exception() is not None:
+            results[name] = _section_failed(name, waiting[name].exception())
+        else:
+            results[name] = (waiting[name].result(), None)
+    return {name: results[name] for name in sections}
+
+
+def _schedule_sections(sections: dict):
+    """Jadwalkan section ke pool section selama slot SECTION_MAX_PENDING masih ada."""
+    slots = _section_slots
+    futures = {}
+    results = {}
+    for name, fn in sections.items():
+        if not slots.acquire(blocking=False):
+            logger.warning(f"⚠️  Section '{name}' dilewati: pool section penuh ({SECTION_MAX_PENDING} antre)")
+            results[name] = (None, "server sedang sibuk")
+            continue
+        fut = submit_to("section", fn)
+        fut.add_done_callback(lambda _, slots=slots: slots.release())
+        futures[name] = fut
+    return futures, results
+
+
+def _section_timed_out(name: str, fut, timeout: float):
+    fut.cancel()
+    logger.warning(f"⏱️  Section '{name}' melewati batas waktu {timeout:.0f} detik")
+    return None, "waktu muat habis"
+
+
+def _section_failed(name: str, e: Exception):
+    logger.error(f"❌ Section '{name}' gagal dibangun: {e}")
+    return None, "gagal memuat data"
@@ -0,0 +1,529 @@
+# exporter.py
+"""
+Ekspor baris data di balik dashboard (/export/<dataset>.csv dan .xlsx).
+
+Filter memakai argumen query string yang sama dengan dashboard (provinsi,
+tahun, bulan, ...). Sumber data:
+
+- dataset yang ada di database dibaca lewat server-side cursor
+  (stream_results) per EXPORT_CHUNK_ROWS baris, jadi memori tetap kecil
+  walau tabelnya besar dan byte pertama langsung terkirim,
+- kalau database tidak bisa dipakai (atau dataset hanya ada di Excel),
+  baris diambil bertahap dari frame bersih yang sudah ada di memori
+  (query_engine.get_frame).
+
+Cursor ekspor memegang koneksi pool selama unduhan berjalan, jadi jumlahnya
+dibatasi EXPORT_MAX_DB_STREAMS per proses; kalau penuh, ekspor memakai frame
+di memori (atau ExportBusy kalau dataset hanya ada di database). Cursor
+dilepas lewat close() dari open_export, yang dipanggil saat respons ditutup
+(termasuk HEAD / klien putus sebelum byte pertama).
+
+XLSX ditulis dengan openpyxl write-only (baris langsung ke file, workbook
+tidak dibangun di memori) di thread pool "export" ke file sementara di
+EXPORT_DIR. Ekspor yang selesai dalam EXPORT_SYNC_WAIT detik langsung
+dikirim; yang lebih lama menjadi job dengan link status & unduhan. Status
+job disimpan sebagai file JSON di samping hasilnya, jadi bisa dibaca dari
+worker gunicorn mana pun.
+"""
+import csv
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from sqlalchemy import text
+
+from asuransi_module import AS_DERIVED, AS_MEASURE_INDEX, AS_MEASURES, _asuransi_slice, get_asuransi_cube
+from dana_pensiun_module import make_agg_month_dp
+import db_breaker
+from database import get_db_engine
+from db_loaders import QUERIES, bulan_nama, filtered_sql, query_columns
+from executor import submit_to
+from perbankan_module import make_agg_month
+from query_engine import get_frame
+from regions import region_id
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "5000"))
+# Maksimum cursor ekspor bersamaan per proses (sisa pool untuk dashboard)
+EXPORT_MAX_DB_STREAMS = int(os.environ.get("EXPORT_MAX_DB_STREAMS", "2"))
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_DB_STREAMS)
+
+# Ekspor XLSX: folder hasil, lama menunggu sebelum jadi job, umur file hasil
+EXPORT_DIR = os.environ.get("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "dashboard-export")
+EXPORT_SYNC_WAIT = float(os.environ.get("EXPORT_SYNC_WAIT", "5"))
+EXPORT_JOB_TTL = int(os.environ.get("EXPORT_JOB_TTL", "3600"))
+
+# Batas baris per sheet Excel (1.048.576 dikurangi header)
+XLSX_MAX_ROWS = 1_048_575
+
+# Kolom internal frame yang tidak ikut diekspor
+INTERNAL_COLUMNS = {"prov_id", "kab_id"}
+
+# Dataset ekspor:
+# - query  : nama query di db_loaders.QUERIES (None = hanya dari Excel/memori)
+# - frame  : nama dataset query_engine untuk fallback (None = hanya database)
+# - filters: argumen dashboard → kolom hasil query
+# - frame_columns: kolom query → kolom frame kalau namanya berbeda. Ekspor dari
+#   memori memakai header & urutan kolom query, jadi CSV/XLSX sama persis
+#   dari sumber mana pun (kolom tambahan frame tidak ikut)
+EXPORT_DATASETS = {
+    "perbankan": dict(
+        query="perbankan", frame="perbankan",
+        filters={"negara": "Negara", "provinsi": "Provinsi", "tahun": "Tahun", "bulan": "Bulan"},
+    ),
+    "umkm": dict(
+        query="umkm", frame="umkm",
+        filters={"provinsi": "Provinsi", "tahun": "Tahun", "bulan": "Bulan", "jenis": "Jenis Kredit/Pembiayaan"},
+        frame_columns={
+            "Jenis Kredit/Pembiayaan": "Jenis",
+            "Nominal Kredit \n(Rp Miliar)": "Nominal Kredit",
+            "Nominal NPL \n(Rp Miliar)": "Nominal NPL",
+            "Nominal NPL Net (Rp Miliar)": "Nominal NPL Net",
+        },
+    ),
+    "konv_syariah": dict(
+        query="konv_syariah", frame="konv_syariah",
+        filters={"provinsi": "Provinsi", "kabupaten": "Kab/Kota", "tahun": "Tahun", "bulan": "Bulan", "skema": "Skema"},
+        frame_columns={"Kredit ": "Kredit"},
+    ),
+    "daerah_perbankan": dict(
+        query="daerah_perbankan", frame=None,
+        filters={
+            "provinsi": "Provinsi", "kabupaten": "Kab/Kota", "tahun": "Tahun", "bulan": "Bulan",
+            "jenis_bank": "Jenis Bank", "skema": "Skema",
+        },
+    ),
+    "asuransi": dict(
+        query="asuransi", frame="asuransi",
+        filters={"provinsi": "Provinsi", "kabupaten": "Kabupaten", "jenis": "Jenis", "tahun": "Tahun", "periode": "Periode"},
+        frame_columns={
+            "Premi (Rp Juta)": "Premi",
+            "Klaim (Rp Juta)": "Klaim",
+            "Jumlah Peserta Premi": "Peserta Premi",
+            "Jumlah Peserta Klaim ": "Peserta Klaim",
+            "Jumlah Polis Premi": "Polis Premi",
+            "Jumlah Polis Klaim ": "Polis Klaim",
+        },
+    ),
+    "dana_pensiun": dict(
+        query="dana_pensiun", frame="dana_pensiun",
+        filters={"negara": "Negara", "provinsi": "Provinsi", "tahun": "Tahun", "bulan": "Bulan"},
+        frame_columns={
+            "Aset (Rp Miliar)": "Aset",
+            "Aset Neto (Rp Miliar)": "Aset Neto",
+            "Investasi (Rp Miliar)": "Investasi",
+        },
+    ),
+    "kredit_lokasi": dict(
+        query="kredit_lokasi", frame="kredit_lokasi",
+        filters={"krl_sektor": "Sektor", "krl_lokasi": "Lokasi"},
+    ),
+    "jumlah_petani": dict(
+        query="jumlah_petani", frame="jumlah_petani",
+        filters={"petani_provinsi": "Provinsi", "petani_kabkota": "KabKota"},
+    ),
+    "komoditas": dict(
+        query=None, frame="komoditas",
+        filters={"provinsi": "Provinsi", "tahun": "Tahun", "klasifikasi": "Klasifikasi", "komoditas": "Komoditas"},
+    ),
+    "komoditas_kabkota": dict(
+        query=None, frame="komoditas_kabkota",
+        filters={"provinsi": "Provinsi", "komoditas": "Komoditas"},
+    ),
+}
+
+
+class ExportBusy(RuntimeError):
+    """Semua slot cursor ekspor terpakai dan dataset tidak punya fallback memori."""
+
+
+def export_filters(name: str, args) -> dict:
+    """
+    Filter ekspor (kolom → nilai) dari argumen dashboard. Bulan dicocokkan
+    sebagai angka maupun nama bulan, karena kolom Bulan di DB berupa teks.
+    """
+    filters = {}
+    for arg, col in EXPORT_DATASETS[name]["filters"].items():
+        value = (args.get(arg) or "").strip()
+        if not value:
+            continue
+        if arg == "bulan" and value.isdigit():
+            filters[col] = (str(int(value)), bulan_nama(int(value)))
+        else:
+            filters[col] = value
+    return filters
+
+
+def sql_chunks(query: str, filters: dict, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Jalankan query lewat server-side cursor. Query dieksekusi sekarang (error
+    koneksi langsung terlihat); baris dibaca per chunk oleh generator.
+    Return (columns, chunks, close): close() menutup cursor, koneksi & slot
+    ekspor, aman dipanggil berulang (generator juga memanggilnya setelah selesai).
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusy(f"maksimum {EXPORT_MAX_DB_STREAMS} ekspor database bersamaan")
+    sql, params = filtered_sql(query, filters) if filters else (QUERIES[query], {})
+    try:
+        with db_breaker.guard():
+            conn = get_db_engine().connect()
+            try:
+                result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(text(sql), params)
+                columns = list(result.keys())
+            except Exception:
+                conn.close()
+                raise
+    except BaseException:
+        _export_slots.release()
+        raise
+
+    once = threading.Lock()
+
+    def close():
+        if not once.acquire(blocking=False):
+            return
+        try:
+            result.close()
+            conn.close()
+        finally:
+            _export_slots.release()
+
+    def chunks():
+        try:
+            for rows in result.partitions(chunk_rows):
+                yield rows
+        finally:
+            close()
+
+    return columns, chunks(), close
+
+
+def frame_chunks(frame: str, filters: dict, chunk_rows: int = EXPORT_CHUNK_ROWS, columns: list | None = None):
+    """
+    Baris frame bersih di memori yang lolos filter, per chunk (list of list).
+    `columns`: kolom frame yang diekspor, urut (default semua kecuali kolom
+    internal); kolom yang tidak ada di frame diisi kosong.
+    """
+    df, _ = get_frame(frame)
+    mask = np.ones(len(df), dtype=bool)
+    for col, value in filters.items():
+        if col not in df.columns:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        mask &= df[col].astype(str).str.strip().str.lower().isin([str(v).strip().lower() for v in values]).to_numpy()
+    positions = np.flatnonzero(mask)
+    if columns is None:
+        columns = [c for c in df.columns if c not in INTERNAL_COLUMNS]
+    present = [c in df.columns for c in columns]
+    col_idx = [df.columns.get_loc(c) for c, ok in zip(columns, present) if ok]
+
+    def pad(row):
+        values = iter(row)
+        return [next(values) if ok else None for ok in present]
+
+    def chunks():
+        for start in range(0, len(positions), chunk_rows):
+            block = df.iloc[positions[start:start + chunk_rows], col_idx].to_numpy(dtype=object).tolist()
+            if not all(present):
+                block = [pad(row) for row in block]
+            yield [
+                [None if isinstance(v, float) and math.isnan(v) else v for v in row]
+                for row in block
+            ]
+
+    return columns, chunks()
+
+
+def _no_close():
+    pass
+
+
+def open_export(name: str, args, chunk_rows: int = EXPORT_CHUNK_ROWS) -> dict:
+    """
+    Siapkan ekspor dataset `name`: dict(columns, chunks, source, close). Database
+    dicoba lebih dulu; kalau gagal / slot penuh dan ada frame fallback, pakai
+    memori. Pemanggil wajib memanggil close() setelah selesai (atau batal).
+    """
+    spec = EXPORT_DATASETS[name]
+    filters = export_filters(name, args)
+
+    if spec["query"]:
+        try:
+            columns, chunks, close = sql_chunks(spec["query"], filters, chunk_rows)
+            return dict(columns=columns, chunks=chunks, source="database", close=close)
+        except Exception as e:
+            if not spec["frame"]:
+                raise
+            logger.warning(f"⚠️  [EXPORT] {name}: database tidak bisa dipakai, ekspor dari memori ({e.__class__.__name__})")
+
+    renames = spec.get("frame_columns", {})
+    frame_filters = {renames.get(col, col): value for col, value in filters.items()}
+    header = list(query_columns(spec["query"])) if spec["query"] else None
+    frame_cols = [renames.get(col, col) for col in header] if header else None
+    columns, chunks = frame_chunks(spec["frame"], frame_filters, chunk_rows, columns=frame_cols)
+    return dict(columns=header or columns, chunks=chunks, source="memori", close=_no_close)
+
+
+def csv_stream(columns: list, chunks):
+    """Generator byte CSV (UTF-8 + BOM agar terbaca Excel): header dulu, lalu per chunk."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    try:
+        buf.write("\ufeff")
+        writer.writerow(columns)
+        yield buf.getvalue().encode("utf-8")
+
+        for rows in chunks:
+            buf.seek(0)
+            buf.truncate(0)
+            writer.writerows(rows)
+            yield buf.getvalue().encode("utf-8")
+    finally:
+        # Klien putus di tengah jalan → tutup cursor & koneksi sekarang juga
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+# -------------------------------------------------
+# EKSPOR XLSX (openpyxl write-only)
+# -------------------------------------------------
+def _region_frame(df: pd.DataFrame, args) -> pd.DataFrame:
+    """Filter wilayah seperti dashboard (negara / provinsi); kosong → semua data."""
+    negara = args.get("negara") or ""
+    provinsi = args.get("provinsi") or ""
+    mask = np.ones(len(df), dtype=bool)
+    if negara:
+        mask &= (df["Negara"] == negara).to_numpy()
+    if provinsi:
+        mask &= (df["prov_id"] == region_id(provinsi)).to_numpy()
+    return df[mask] if mask.any() else df
+
+
+def _frame_sheet(title: str, df: pd.DataFrame) -> tuple:
+    columns = [c for c in df.columns if c not in INTERNAL_COLUMNS]
+    return title, columns, iter([df[columns].to_numpy(dtype=object).tolist()])
+
+
+def _perbankan_summary(args) -> list:
+    agg = make_agg_month(_region_frame(get_frame("perbankan")[0], args))
+    if agg.empty:
+        return []
+    agg["Kredit Produktif"] = agg["Modal Kerja"] + agg["Investasi"]
+    agg["Kredit Konsumtif"] = agg["Konsumsi"]
+    return [_frame_sheet("Agregat Bulanan", agg)]
+
+
+def _dana_pensiun_summary(args) -> list:
+    df = _region_frame(get_frame("dana_pensiun")[0], args)
+    if df.empty:
+        return []
+    return [_frame_sheet("Agregat Bulanan", make_agg_month_dp(df).sort_values("periode"))]
+
+
+def _asuransi_summary(args) -> list:
+    """Tren per triwulan untuk wilayah & jenis terpilih (sama dengan chart dashboard)."""
+    cube = get_asuransi_cube()
+    picked = _asuransi_slice(cube, args.get("provinsi") or "", args.get("kabupaten") or "", args.get("jenis") or "")
+    if picked is None:
+        picked = (cube["region_index"][(None, None)], len(cube["jenis_list"]))
+    r, j = picked
+    values = cube["values"][r, j]
+    derived = cube["derived"][r, j]
+    present = values[:, AS_MEASURE_INDEX["Baris"]] > 0
+
+    measures = [m for m in AS_MEASURES if m != "Baris"]
+    columns = ["Tahun", "Triwulan", "Periode", *measures, *AS_DERIVED]
+    rows = [
+        [int(cube["period_tahun"][p]), int(cube["period_quarter"][p]), cube["period_labels"][p]]
+        + [float(values[p, AS_MEASURE_INDEX[m]]) for m in measures]
+        + derived[p].tolist()
+        for p in np.flatnonzero(present)
+    ]
+    return [("Tren Triwulan", columns, iter([rows]))]
+
+
+# Sheet agregat tambahan per dataset: fungsi(args) → list (judul, kolom, chunks)
+XLSX_SUMMARY_SHEETS = {
+    "perbankan": _perbankan_summary,
+    "dana_pensiun": _dana_pensiun_summary,
+    "asuransi": _asuransi_summary,
+}
+
+
+def _xlsx_value(value):
+    """Nilai sel yang bisa ditulis openpyxl (numpy → Python, NaN/NaT → kosong)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if value is pd.NaT:
+        return None
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(path: str, sheets) -> int:
+    """
+    Tulis sheet (judul, kolom, chunks) ke `path` dengan workbook write-only;
+    baris yang melebihi batas Excel diteruskan ke sheet lanjutan. Return
+    jumlah baris data yang ditulis.
+    """
+    wb = Workbook(write_only=True)
+    total = 0
+    for title, columns, chunks in sheets:
+        part, ws, used = 1, None, XLSX_MAX_ROWS
+        try:
+            for rows in chunks:
+                for row in rows:
+                    if used >= XLSX_MAX_ROWS:
+                        ws = wb.create_sheet(title if part == 1 else f"{title[:26]} ({part})")
+                        ws.freeze_panes = "A2"
+                        ws.append(list(columns))
+                        part, used = part + 1, 0
+                    ws.append([_xlsx_value(v) for v in row])
+                    used += 1
+                total += len(rows)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        if ws is None:
+            # Sheet tetap dibuat walau tanpa baris, supaya header terlihat
+            ws = wb.create_sheet(title)
+            ws.append(list(columns))
+    wb.save(path)
+    return total
+
+
+def xlsx_sheets(name: str, args) -> tuple:
+    """
+    Sheet ekspor dataset: baris data (chunked) lalu sheet agregat kalau ada.
+    Return (sheets, sumber baris data, close cursor).
+    """
+    export = open_export(name, args)
+    sheets = [("Data", export["columns"], export["chunks"])]
+    summary = XLSX_SUMMARY_SHEETS.get(name)
+    if summary is not None:
+        try:
+            sheets += summary(args)
+        except Exception as e:
+            logger.warning(f"⚠️  [EXPORT] {name}: sheet agregat dilewati ({e})")
+    return sheets, export["source"], export["close"]
+
+
+# -------------------------------------------------
+# JOB EKSPOR (file di EXPORT_DIR, status dalam JSON)
+# -------------------------------------------------
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _job_path(job_id: str, ext: str) -> str:
+    return os.path.join(EXPORT_DIR, f"{job_id}.{ext}")
+
+
+def _save_job(job: dict):
+    tmp = _job_path(job["id"], "json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, _job_path(job["id"], "json"))
+
+
+def get_job(job_id: str) -> dict | None:
+    """Status job ekspor (None kalau id tidak dikenal / sudah kedaluwarsa)."""
+    if not _JOB_ID_RE.match(job_id or ""):
+        return None
+    try:
+        with open(_job_path(job_id, "json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def job_file(job: dict) -> str | None:
+    """Path file hasil job yang sudah selesai."""
+    path = _job_path(job["id"], "xlsx")
+    return path if job["status"] == "selesai" and os.path.exists(path) else None
+
+
+def _cleanup_jobs():
+    """Hapus hasil & status job yang lebih tua dari EXPORT_JOB_TTL."""
+    cutoff = time.time() - EXPORT_JOB_TTL
+    try:
+        entries = list(os.scandir(EXPORT_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _run_xlsx_job(job: dict, args: dict):
+    start = time.perf_counter()
+    part = _job_path(job["id"], "xlsx.part")
+    job["status"] = "berjalan"
+    _save_job(job)
+    try:
+        sheets, job["source"], close = xlsx_sheets(job["dataset"], args)
+        try:
+            job["rows"] = write_xlsx(part, sheets)
+        finally:
+            close()
+        os.replace(part, _job_path(job["id"], "xlsx"))
+        job["status"] = "selesai"
+        logger.info(
+            f"✅ [EXPORT] {job['dataset']}.xlsx selesai: {job['rows']} baris "
+            f"({time.perf_counter() - start:.1f} detik)"
+        )
+    except Exception as e:
+        logger.error(f"❌ [EXPORT] Gagal membuat {job['dataset']}.xlsx: {e}")
+        job["status"] = "gagal"
+        job["error"] = "gagal memuat data"
+        if os.path.exists(part):
+            os.remove(part)
+    job["finished"] = time.time()
+    _save_job(job)
+    return job
+
+
+def start_xlsx_job(name: str, args):
+    """
+    Jadwalkan ekspor XLSX dataset `name` di thread pool "export".
+    Return (job, future); future selesai dengan dict job final.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_jobs()
+    job = dict(
+        id=uuid.uuid4().hex, dataset=name, status="antri", source=None,
+        rows=None, error=None, created=time.time(), finished=None,
+    )
+    _save_job(job)
+    return job, submit_to("export", _run_xlsx_job, dict(job), dict(args.items()))
+
+
+def _reset_after_fork():
+    # Cursor milik parent tidak ikut ter-fork; semua slot ekspor kosong lagi
+    global _export_slots
+    _export_slots = threading.BoundedSemaphore(EXPORT_MAX_DB_STREAMS)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
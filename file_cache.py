@@ -0,0 +1,132 @@
+# file_cache.py
+"""
+Cache loader berbasis file sumber (pengganti @lru_cache untuk loader Excel).
+
+@file_cached(path) menyimpan hasil loader selama file tidak berubah. Setiap
+pemanggilan hanya melakukan os.stat(); kalau (mtime, size) berubah:
+
+- file di-hash (blake2b) dulu; kalau isinya sama (mis. hanya di-touch /
+  disalin ulang) hasil lama tetap dipakai tanpa parse ulang,
+- kalau isinya beda, loader dijalankan ulang di thread pool loader dan
+  hasilnya ditukar secara atomik setelah selesai.
+
+Selama parse ulang berjalan, request tetap menerima data lama. Hanya
+pemanggilan pertama (belum ada data sama sekali) yang menunggu parse.
+Kalau parse ulang gagal, data lama tetap dipakai dan dicoba lagi saat file
+berubah berikutnya.
+"""
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from executor import submit
+
+logger = logging.getLogger(__name__)
+
+# Interval minimal antar os.stat() per loader (detik); 0 = cek setiap panggilan
+FILE_CACHE_CHECK_INTERVAL = float(os.environ.get("FILE_CACHE_CHECK_INTERVAL", "1"))
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_signature(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_cached(path: str):
+    """Decorator untuk loader tanpa argumen yang membaca `path`."""
+
+    def decorator(loader):
+        name = loader.__name__
+        # entry = (signature, digest, value, loaded_at); diganti utuh saat swap
+        state = {"entry": None, "pending": None, "failed": None, "checked": 0.0}
+        lock = threading.Lock()
+
+        def parse(sig):
+            digest = file_digest(path)
+            start = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - start
+            logger.info(f"📥 [FILE CACHE] {name} dimuat dari {os.path.basename(path)} ({elapsed:.1f} detik)")
+            return (sig, digest, value, time.time())
+
+        def reload(sig):
+            try:
+                current = state["entry"]
+                digest = file_digest(path)
+                if current is not None and digest == current[1]:
+                    # Isi sama, hanya metadata berubah → cukup perbarui signature
+                    state["entry"] = (sig, digest, current[2], current[3])
+                    return
+                state["entry"] = parse(sig)
+                logger.info(f"🔁 [FILE CACHE] {name} diganti dengan data baru")
+            except Exception as e:
+                state["failed"] = sig
+                logger.error(f"❌ [FILE CACHE] Gagal memuat ulang {name}, data lama tetap dipakai: {e}")
+            finally:
+                with lock:
+                    state["pending"] = None
+
+        @functools.wraps(loader)
+        def wrapper():
+            entry = state["entry"]
+            if entry is None:
+                with lock:
+                    entry = state["entry"]
+                    if entry is None:
+                        entry = parse(file_signature(path))
+                        state["entry"] = entry
+                        state["checked"] = time.monotonic()
+                return entry[2]
+
+            now = time.monotonic()
+            if now - state["checked"] < FILE_CACHE_CHECK_INTERVAL:
+                return entry[2]
+            state["checked"] = now
+
+            try:
+                sig = file_signature(path)
+            except OSError as e:
+                logger.warning(f"⚠️  [FILE CACHE] {path} tidak bisa dibaca, data lama dipakai: {e}")
+                return entry[2]
+
+            if sig != entry[0] and sig != state["failed"]:
+                with lock:
+                    if state["pending"] is None:
+                        state["pending"] = sig
+                        submit(reload, sig)
+            return entry[2]
+
+        def cache_clear():
+            with lock:
+                state["entry"] = None
+                state["failed"] = None
+
+        def cache_info() -> dict:
+            entry = state["entry"]
+            return {
+                "path": path,
+                "loaded": entry is not None,
+                "signature": entry[0] if entry else None,
+                "digest": entry[1] if entry else None,
+                "loaded_at": entry[3] if entry else None,
+                "reloading": state["pending"] is not None,
+            }
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_info = cache_info
+        return wrapper
+
+    return decorator
@@ -1,8 +1,16 @@
 # komoditas_module.py
 import os
 import re
+import numpy as np
 import pandas as pd
 import logging
+import threading
+import data_versions
+import snapshots
+from executor import submit
+from file_cache import file_cached
+from regions import add_region_ids, filter_region, kabkota_id, region_id
+from sektor import sektor_utama
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +24,63 @@ SHEET_NAME_KOM = "raw-all-komoditas"
 # ==========================================
 # KOMODITAS
 # ==========================================
+# "Padi (Ton)" → Komoditas "Padi", Satuan "Ton"
+KOMODITAS_SATUAN_RE = r"^(?P<Komoditas>.+?)\s*\((?P<Satuan>.+?)\)\s*$"
+
+
+def clean_angka_id(s: pd.Series) -> pd.Series:
+    """
+    Angka format Indonesia → float. Sel teks ("16.355", "1.234,5") dibersihkan
+    (titik ribuan dibuang, koma jadi desimal); sel yang sudah numerik dari
+    Excel dipakai apa adanya. Nilai kosong / tidak valid → 0.0.
+    """
+    if s.dtype != object:
+        return pd.to_numeric(s, errors="coerce").fillna(0.0)
+    is_text = s.map(type) == str
+    teks = (
+        s[is_text]
+        .str.strip()
+        .str.replace(" ", "", regex=False)
+        .str.replace(".", "", regex=False)   # ribuan
+        .str.replace(",", ".", regex=False)  # desimal
+    )
+    out = pd.to_numeric(s.where(~is_text), errors="coerce")
+    out[is_text] = pd.to_numeric(teks, errors="coerce")
+    return out.astype(float).fillna(0.0)
+
+
+def parse_komoditas_header(columns) -> pd.DataFrame:
+    """
+    Pecah header 3 level (Klasifikasi, Tahun, "Komoditas (Satuan)") menjadi
+    tabel per kolom: Klasifikasi | Tahun | Komoditas | Satuan.
+    Regex dijalankan sekali per kolom Excel, bukan per baris hasil melt.
+    """
+    header = pd.DataFrame(
+        [tuple(str(v).strip() for v in c) for c in columns],
+        columns=["Klasifikasi", "TahunRaw", "KomoditasRaw"],
+    )
+    header["Tahun"] = pd.to_numeric(
+        header["TahunRaw"].str.extract(r"(\d{4})", expand=False), errors="coerce"
+    )
+    parts = header["KomoditasRaw"].str.extract(KOMODITAS_SATUAN_RE)
+    header["Komoditas"] = parts["Komoditas"].str.strip().fillna(header["KomoditasRaw"])
+    header["Satuan"] = parts["Satuan"].str.strip()
+    return header[["Klasifikasi", "Tahun", "Komoditas", "Satuan"]]
+
+
+@file_cached(DATA_PATH_KOM)
 def load_komoditas_data():
     """
     Mengubah tabel komoditas lebar (multi header 3 baris:
     Klasifikasi | Tahun | Komoditas) menjadi format long:
 
         Provinsi | Tahun | Klasifikasi | Komoditas | Satuan | Nilai
+
+    Header diurai sekali per kolom lalu diulang per provinsi (numpy), jadi
+    tidak perlu melt + apply per baris. Hasil di-cache per versi file
+    (file_cached): request hanya membaca frame yang sudah jadi, parse ulang
+    berjalan di background saat Komoditas.xlsx diganti.
+    Frame hasil dipakai bersama; pemanggil jangan mengubahnya in-place.
     """
     df_raw = pd.read_excel(
         DATA_PATH_KOM,
@@ -30,76 +89,40 @@ def load_komoditas_data():
     )
 
     # Cari kolom provinsi (header level terakhir = "Komoditas")
-    prov_col = None
-    for c in df_raw.columns:
+    prov_pos = 0
+    for i, c in enumerate(df_raw.columns):
         last = c[-1] if isinstance(c, tuple) else c
         if str(last).strip().lower() == "komoditas":
-            prov_col = c
+            prov_pos = i
             break
-    if prov_col is None:
-        prov_col = df_raw.columns[0]
 
-    id_col = prov_col
-    value_cols = [c for c in df_raw.columns if c != id_col]
+    value_pos = [i for i in range(df_raw.shape[1]) if i != prov_pos]
+    header = parse_komoditas_header(df_raw.columns[value_pos])
 
-    df_long = df_raw.melt(
-        id_vars=[id_col],
-        value_vars=value_cols,
-        var_name=["Klasifikasi", "Tahun", "KomoditasRaw"],
-        value_name="NilaiRaw",
-    )
+    # Provinsi: buang baris kosong
+    provinsi = df_raw.iloc[:, prov_pos].astype(str).str.strip()
+    row_ok = (provinsi != "") & (~provinsi.str.lower().isin(["nan", "none"]))
 
-    df_long = df_long.rename(columns={id_col: "Provinsi"})
+    # Kolom tanpa tahun 4 digit tidak dipakai
+    col_ok = header["Tahun"].notna().to_numpy()
+    header = header[col_ok].reset_index(drop=True)
+    header["Tahun"] = header["Tahun"].astype(int)
+    value_pos = [p for p, ok in zip(value_pos, col_ok) if ok]
 
-    # Provinsi
-    df_long["Provinsi"] = df_long["Provinsi"].astype(str).str.strip()
+    values = df_raw.iloc[row_ok.to_numpy(), value_pos]
+    provinsi = provinsi[row_ok].to_numpy()
 
-    # Klasifikasi
-    df_long["Klasifikasi"] = df_long["Klasifikasi"].astype(str).str.strip()
+    # Matriks (provinsi × kolom) → long, urutan kolom demi kolom seperti melt
+    nilai = np.column_stack(
+        [clean_angka_id(values.iloc[:, j]).to_numpy() for j in range(values.shape[1])]
+    ) if value_pos else np.empty((len(provinsi), 0))
+    n_rows, n_cols = nilai.shape
 
-    # Tahun → 4 digit → int
-    df_long["Tahun"] = (
-        df_long["Tahun"]
-        .astype(str)
-        .str.extract(r"(\d{4})", expand=False)
-    )
-    df_long["Tahun"] = pd.to_numeric(df_long["Tahun"], errors="coerce")
-
-    # Komoditas + satuan: "Padi (Ton)" → ("Padi", "Ton")
-    def split_komoditas(s):
-        s = str(s).strip()
-        m = re.match(r"(.+?)\s*\((.+?)\)\s*$", s)
-        if m:
-            return m.group(1).strip(), m.group(2).strip()
-        else:
-            return s, None
+    df_long = header.iloc[np.repeat(np.arange(n_cols), n_rows)].reset_index(drop=True)
+    df_long.insert(0, "Provinsi", np.tile(provinsi, n_cols))
+    df_long["Nilai"] = nilai.T.ravel()
 
-    kom_satuan = df_long["KomoditasRaw"].apply(split_komoditas)
-    df_long["Komoditas"] = kom_satuan.apply(lambda x: x[0])
-    df_long["Satuan"] = kom_satuan.apply(lambda x: x[1])
-
-    # Nilai angka Indonesia → float
-    df_long["Nilai"] = (
-        df_long["NilaiRaw"]
-        .astype(str)
-        .str.strip()
-        .str.replace(" ", "", regex=False)
-        .str.replace(".", "", regex=False)   # ribuan
-        .str.replace(",", ".", regex=False)  # desimal
-    )
-    df_long["Nilai"] = pd.to_numeric(df_long["Nilai"], errors="coerce").fillna(0.0)
-
-    # Bersihkan provinsi kosong
-    df_long["Provinsi"] = df_long["Provinsi"].astype(str).str.strip()
-    df_long = df_long[
-        (df_long["Provinsi"] != "") &
-        (~df_long["Provinsi"].str.lower().isin(["nan", "none"])) &
-        df_long["Provinsi"].notna()
-    ]
-
-    # Buang tahun NaN, paksa ke int
-    df_long = df_long[df_long["Tahun"].notna()]
-    df_long["Tahun"] = df_long["Tahun"].astype(int)
+    add_region_ids(df_long, "Provinsi")
 
     logger.info(
         f"📄 [KOMODITAS] Data dimuat dari Excel: {len(df_long)} baris | "
@@ -115,6 +138,7 @@ def load_komoditas_data():
 DATA_PATH_KOM_KAB = os.path.join("data", "Data Komoditi (1).xlsx")
 SHEET_NAME_KOM_KAB = "Sheet1"
 
+@file_cached(DATA_PATH_KOM_KAB)
 def load_komoditas_kabkota_data():
     """
     Data bentuk:
@@ -138,31 +162,235 @@ def load_komoditas_kabkota_data():
         "Luas Lahan (Ha)": "LuasLahan",
     })
 
-    print(df)
-
     # Bersihkan teks  ✅ pakai .str.strip()
     for col in ["Komoditas", "Provinsi", "KabKota"]:
         df[col] = df[col].astype(str).str.strip()
 
     # Angka Indonesia -> float
     for col in ["Produksi", "LuasLahan"]:
-        series = (
-            df[col]
-            .astype(str)
-            .str.strip()
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)   # ribuan
-            .str.replace(",", ".", regex=False)  # desimal
-        )
-        df[col] = pd.to_numeric(series, errors="coerce").fillna(0.0)
+        df[col] = clean_angka_id(df[col])
 
+    add_region_ids(df, "Provinsi", "KabKota")
     return df
 
 
+# Jumlah kab/kota per chart ranking panel
+KAB_TOP_K = 5
+
+EMPTY_KAB_PANEL = dict(
+    kab_total_produksi=0.0, kab_total_luas=0.0, kab_rata_prod_per_ha=0.0,
+    kab_top_prod_kab="", kab_top_prod_val=0.0,
+    kab_top_prodperha_kab="", kab_top_prodperha_val=0.0,
+    kab_prod_top_labels=[], kab_prod_top_values=[],
+    kab_luas_top_labels=[], kab_luas_top_values=[],
+    kab_prodperha_top_labels=[], kab_prodperha_top_values=[],
+)
+
+_kab_ranking = None  # (versi, frame sumber, indeks) — diganti utuh saat data berubah
+_kab_lock = threading.Lock()
+
+
+def _kab_panel(df: pd.DataFrame, k: int = KAB_TOP_K) -> dict:
+    """KPI + top-K (produksi, luas lahan, produktivitas) untuk satu subset kab/kota."""
+    if df.empty:
+        return dict(EMPTY_KAB_PANEL)
+
+    kab = df["KabKota"]
+    produksi = df["Produksi"]
+    luas = df["LuasLahan"]
+    # Produktivitas (Ton/Ha) per Kab/Kota, hindari divide-by-zero
+    prod_per_ha = (produksi / luas.mask(luas == 0)).fillna(0.0)
+
+    total_produksi = float(produksi.sum())
+    total_luas = float(luas.sum())
+
+    # Seleksi parsial: hanya K teratas yang diurutkan, bukan seluruh subset
+    top_prod = produksi.nlargest(k)
+    top_luas = luas.nlargest(k)
+    top_prodperha = prod_per_ha.nlargest(k)
+
+    return dict(
+        kab_total_produksi=total_produksi,
+        kab_total_luas=total_luas,
+        kab_rata_prod_per_ha=(total_produksi / total_luas) if total_luas > 0 else 0.0,
+        kab_top_prod_kab=kab[top_prod.index[0]],
+        kab_top_prod_val=float(top_prod.iloc[0]),
+        kab_top_prodperha_kab=kab[top_prodperha.index[0]],
+        kab_top_prodperha_val=float(top_prodperha.iloc[0]),
+        kab_prod_top_labels=kab[top_prod.index].tolist(),
+        kab_prod_top_values=top_prod.round(2).tolist(),
+        kab_luas_top_labels=kab[top_luas.index].tolist(),
+        kab_luas_top_values=top_luas.round(2).tolist(),
+        kab_prodperha_top_labels=kab[top_prodperha.index].tolist(),
+        kab_prodperha_top_values=top_prodperha.round(3).tolist(),
+    )
+
+
+def build_kabkota_ranking(df: pd.DataFrame, k: int = KAB_TOP_K) -> dict:
+    """
+    Indeks panel kab/kota: (komoditas lower | None, prov_id | None) → panel.
+    None berarti filter tersebut tidak dipilih ("Semua").
+    """
+    index = {(None, None): _kab_panel(df, k)}
+    if df.empty:
+        return index
+    kom_key = df["Komoditas"].str.lower()
+    for kom, sub in df.groupby(kom_key, sort=False):
+        index[(kom, None)] = _kab_panel(sub, k)
+    for prov, sub in df.groupby("prov_id", sort=False):
+        index[(None, int(prov))] = _kab_panel(sub, k)
+    for (kom, prov), sub in df.groupby([kom_key, "prov_id"], sort=False):
+        index[(kom, int(prov))] = _kab_panel(sub, k)
+    return index
+
+
+def get_kabkota_panel(komoditas: str, prov_id: int | None) -> dict:
+    """
+    Panel kab/kota untuk filter dashboard. Indeks dibangun sekali per versi
+    data (frame hasil load_komoditas_kabkota_data), request cukup lookup dict.
+    """
+    global _kab_ranking
+    # Versi dibaca sebelum frame: kalau data berganti di antaranya, indeks
+    # tercatat dengan versi lama dan dibangun ulang pada request berikutnya
+    version = data_versions.get_version("komoditas_kabkota")
+    try:
+        df = load_komoditas_kabkota_data()
+    except Exception as e:
+        logger.warning(f"[KOM-KAB] Error load: {e}")
+        return dict(EMPTY_KAB_PANEL)
+
+    cached = _kab_ranking
+    if cached is None or cached[0] != version or cached[1] is not df:
+        # Hanya satu thread yang membangun indeks; yang lain menunggu hasilnya
+        with _kab_lock:
+            cached = _kab_ranking
+            if cached is None or cached[0] != version or cached[1] is not df:
+                cached = (version, df, build_kabkota_ranking(df))
+                _kab_ranking = cached
+
+    key = (komoditas.lower() if komoditas else None, prov_id)
+    return dict(cached[2].get(key, EMPTY_KAB_PANEL))
+
+
+# --- DATA JUMLAH PETANI (tabel PostgreSQL) ---
+PETANI_COLUMNS = ["Komoditi", "Provinsi", "KabKota", "JumlahPetani", "prov_id", "kab_id"]
+
+# Umur maksimum snapshot jumlah petani (detik); tabel bisa diubah di luar aplikasi
+PETANI_CACHE_TTL = float(os.environ.get("PETANI_CACHE_TTL", "300"))
+
+
+def _prepare_petani(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalisasi sekali per muat: teks di-strip, ID wilayah, urut JumlahPetani menurun."""
+    df = df.copy()
+    for col in ["Provinsi", "KabKota"]:
+        df[col] = df[col].str.strip()
+    add_region_ids(df, "Provinsi", "KabKota")
+    return df.sort_values("JumlahPetani", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _option_lists(df: pd.DataFrame) -> tuple[list, list]:
+    return (
+        sorted(df["Provinsi"].dropna().str.strip().unique().tolist()),
+        sorted(df["KabKota"].dropna().str.strip().unique().tolist()),
+    )
+
+
+def _petani_pushdown(options: pd.DataFrame, provinsi: str, kabkota: str) -> dict | None:
+    """
+    Filter SQL yang setara dengan `filter_region`: ejaan Provinsi / KabKota
+    di tabel yang ID wilayahnya sama dengan parameter (alias seperti "Sumsel"
+    atau "Kab. X" ikut cocok). None kalau tidak ada baris yang cocok.
+    """
+    filters = {}
+    for col, value, to_id in (("Provinsi", provinsi, region_id), ("KabKota", kabkota, kabkota_id)):
+        if not value:
+            continue
+        target = to_id(value)
+        names = [nm for nm in options[col].dropna().unique() if to_id(nm) == target]
+        if not names:
+            return None
+        filters[col] = names
+    return filters
+
+
+def _build_petani_snapshot() -> pd.DataFrame:
+    """Seluruh tabel jumlah petani, dinormalisasi sekali per muat."""
+    from db_loaders import load_jumlah_petani_data_from_db
+
+    return _prepare_petani(load_jumlah_petani_data_from_db())
+
+
+# Frame dipakai panel komoditas dan query / ekspor (query_engine); dropdown
+# diturunkan dari frame yang sama
+snapshots.register("jumlah_petani", _build_petani_snapshot, interval=PETANI_CACHE_TTL)
+snapshots.register("jumlah_petani_options", _option_lists, source="jumlah_petani")
+
+
+def load_jumlah_petani_options():
+    """
+    Dropdown jumlah petani (provinsi_list, kabkota_list) tanpa baris datanya:
+    dari snapshot kalau sudah ada, selain itu query opsi saja sementara tabel
+    lengkap dimuat ke snapshot di background.
+    """
+    if snapshots.is_loaded("jumlah_petani_options"):
+        return snapshots.get("jumlah_petani_options")
+
+    from db_loaders import load_jumlah_petani_options_from_db
+
+    submit(snapshots.get, "jumlah_petani_options")
+    return _option_lists(load_jumlah_petani_options_from_db())
 
-def build_komoditas_context(request):
-    df = load_komoditas_data()
 
+def load_jumlah_petani(provinsi: str = "", kabkota: str = ""):
+    """
+    Data jumlah petani untuk panel komoditas.
+    Return: (provinsi_list, kabkota_list, df_filtered urut JumlahPetani menurun).
+
+    Tabel diambil dari snapshot "jumlah_petani". Saat snapshot belum ada dan
+    ada filter, filter dijalankan di SQL (hanya baris yang cocok + daftar
+    dropdown yang ditarik) sementara tabel lengkap dimuat di background;
+    hasilnya sama dengan filter ID wilayah di snapshot.
+    """
+    if snapshots.is_loaded("jumlah_petani") or not (provinsi or kabkota):
+        provinsi_list, kabkota_list = snapshots.get("jumlah_petani_options")
+        return provinsi_list, kabkota_list, filter_region(snapshots.get("jumlah_petani"), provinsi, kabkota)
+
+    from db_loaders import load_jumlah_petani_data_from_db, load_jumlah_petani_options_from_db
+
+    submit(snapshots.get, "jumlah_petani_options")
+    options = load_jumlah_petani_options_from_db()
+    filters = _petani_pushdown(options, provinsi, kabkota)
+    if filters is None:
+        df = pd.DataFrame(columns=PETANI_COLUMNS)
+    else:
+        df = _prepare_petani(load_jumlah_petani_data_from_db(
+            provinsi=filters.get("Provinsi"), kabkota=filters.get("KabKota")
+        ))
+    return (*_option_lists(options), filter_region(df, provinsi, kabkota))
+
+
+def empty_komoditas_context(error: str | None = None):
+    """
+    Context placeholder untuk section komoditas (dipakai kalau builder gagal /
+    lewat batas waktu) supaya halaman tetap bisa dirender.
+    """
+    return dict(
+        kom_section_error=error,
+        provinsi_list=[], tahun_list=[], klasifikasi_list=[], komoditas_list=[],
+        provinsi_selected="", tahun_selected="", klasifikasi_selected="", komoditas_selected="",
+        kom_unit_label="", kom_total_val=0.0, kom_komoditas_count=0,
+        kom_top_komoditas="", kom_top_komoditas_val=0.0, kom_top_komoditas_share=0.0,
+        kom_top_provinsi="", kom_top_provinsi_val=0.0,
+        kom_kom_labels=[], kom_kom_values=[], kom_prov_labels=[], kom_prov_values=[],
+        **EMPTY_KAB_PANEL,
+        petani_provinsi_list=[], petani_kabkota_list=[],
+        petani_provinsi_selected="", petani_kabkota_selected="",
+        petani_labels=[], petani_values=[],
+    )
+
+
+def _komoditas_selection(request, df: pd.DataFrame) -> dict:
+    """Dropdown dan filter terpilih panel komoditas (tanpa jumlah petani)."""
     # --------------------------
     # DROPDOWN OPTIONS DASAR
     # --------------------------
@@ -194,10 +422,6 @@ def build_komoditas_context(request):
 
     komoditas_param = (request.args.get("komoditas") or "").strip()
 
-    # Filter jumlah petani
-    petani_provinsi_param = (request.args.get("petani_provinsi") or "").strip()
-    petani_kabkota_param = (request.args.get("petani_kabkota") or "").strip()
-
     # --------------------------
     # TAHUN TERPILIH
     # - pertama kali buka → tahun terbaru
@@ -247,6 +471,53 @@ def build_komoditas_context(request):
     else:
         selected_komoditas = ""   # "Semua"
 
+    return dict(
+        provinsi_list=provinsi_list,
+        tahun_list=tahun_list,
+        klasifikasi_list=klasifikasi_list,
+        komoditas_list=komoditas_list,
+        provinsi_selected=provinsi,
+        tahun_selected=str(selected_year) if selected_year is not None else "",
+        klasifikasi_selected=selected_klas,
+        komoditas_selected=selected_komoditas,
+    )
+
+
+def build_komoditas_filters(request) -> dict:
+    """
+    Dropdown dan filter terpilih panel komoditas + jumlah petani. Cukup untuk
+    merender shell HTML: tanpa KPI, chart, maupun baris data petani.
+    """
+    filters = _komoditas_selection(request, load_komoditas_data())
+    try:
+        petani_provinsi_list, petani_kabkota_list = load_jumlah_petani_options()
+    except Exception as e:
+        logger.warning(f"[JUMLAH PETANI] Error load opsi: {e}")
+        petani_provinsi_list, petani_kabkota_list = [], []
+    filters.update(
+        petani_provinsi_list=petani_provinsi_list,
+        petani_kabkota_list=petani_kabkota_list,
+        petani_provinsi_selected=(request.args.get("petani_provinsi") or "").strip(),
+        petani_kabkota_selected=(request.args.get("petani_kabkota") or "").strip(),
+    )
+    return filters
+
+
+def build_komoditas_context(request):
+    df = load_komoditas_data()
+
+    selection = _komoditas_selection(request, df)
+    provinsi = selection["provinsi_selected"]
+    selected_year = int(selection["tahun_selected"]) if selection["tahun_selected"] else None
+    selected_klas = selection["klasifikasi_selected"]
+    selected_komoditas = selection["komoditas_selected"]
+
+    # Filter jumlah petani
+    petani_provinsi_param = (request.args.get("petani_provinsi") or "").strip()
+    petani_kabkota_param = (request.args.get("petani_kabkota") or "").strip()
+
+    prov_id = region_id(provinsi) if provinsi else None
+
     # --------------------------
     # FILTER DATA KPI
     #   (Tahun + Klasifikasi + Komoditas + Provinsi)
@@ -258,8 +529,8 @@ def build_komoditas_context(request):
         df_filtered = df_filtered[df_filtered["Klasifikasi"] == selected_klas]
     if selected_komoditas:
         df_filtered = df_filtered[df_filtered["Komoditas"] == selected_komoditas]
-    if provinsi:
-        df_filtered = df_filtered[df_filtered["Provinsi"] == provinsi]
+    if prov_id is not None:
+        df_filtered = df_filtered[df_filtered["prov_id"] == prov_id]
 
     # Nilai default
     unit_label = ""
@@ -301,8 +572,8 @@ def build_komoditas_context(request):
         df_for_kom_chart = df_for_kom_chart[df_for_kom_chart["Tahun"] == selected_year]
     if selected_klas:
         df_for_kom_chart = df_for_kom_chart[df_for_kom_chart["Klasifikasi"] == selected_klas]
-    if provinsi:
-        df_for_kom_chart = df_for_kom_chart[df_for_kom_chart["Provinsi"] == provinsi]
+    if prov_id is not None:
+        df_for_kom_chart = df_for_kom_chart[df_for_kom_chart["prov_id"] == prov_id]
 
     kom_kom_labels = []
     kom_kom_values = []
@@ -355,142 +626,40 @@ def build_komoditas_context(request):
 
     # =====================================================
     #  DETAIL KOMODITAS PER KAB/KOTA (contoh: Kopi)
+    #  Ikut komoditas & provinsi yang sedang dipilih di dashboard
     # =====================================================
-    # =====================================================
-    #  DETAIL KOMODITAS PER KAB/KOTA (contoh: Kopi)
-    # =====================================================
-    try:
-        df_kab = load_komoditas_kabkota_data()
-    except Exception as e:
-        print("[KOM-KAB] ERROR load:", e)
-        df_kab = pd.DataFrame(columns=["Komoditas", "Provinsi", "KabKota", "Produksi", "LuasLahan"])
-
-    df_kab_filtered = df_kab.copy()
-
-    # Filter ikut komoditas & provinsi yang sedang dipilih di dashboard
-    if selected_komoditas:
-        df_kab_filtered = df_kab_filtered[
-            df_kab_filtered["Komoditas"].str.lower() == selected_komoditas.lower()
-        ]
-    if provinsi:
-        df_kab_filtered = df_kab_filtered[
-            df_kab_filtered["Provinsi"].str.lower() == provinsi.lower()
-        ]
-
-    # ---- KPI utama & data chart ----
-    if not df_kab_filtered.empty:
-        total_produksi = float(df_kab_filtered["Produksi"].sum())
-        total_luas = float(df_kab_filtered["LuasLahan"].sum())
-        rata_prod_per_ha = (total_produksi / total_luas) if total_luas > 0 else 0.0
-
-        # Kab/Kota dengan produksi tertinggi (untuk kartu KPI)
-        df_sorted_prod = df_kab_filtered.sort_values("Produksi", ascending=False)
-        kab_top_prod = df_sorted_prod.iloc[0]["KabKota"]
-        kab_top_prod_val = float(df_sorted_prod.iloc[0]["Produksi"])
-
-        # Hitung produktivitas (Ton/Ha) per Kab/Kota, hindari divide-by-zero
-        luas_nonzero = df_kab_filtered["LuasLahan"].copy()
-        luas_nonzero = luas_nonzero.mask(luas_nonzero == 0)
-        prod_per_ha = (df_kab_filtered["Produksi"] / luas_nonzero).fillna(0.0)
-
-        # Kab/Kota dengan produktivitas tertinggi (untuk KPI)
-        df_tmp = df_kab_filtered.copy()
-        df_tmp["ProdPerHa"] = prod_per_ha
-        df_sorted_prodperha = df_tmp.sort_values("ProdPerHa", ascending=False)
-        kab_top_prodperha = df_sorted_prodperha.iloc[0]["KabKota"]
-        kab_top_prodperha_val = float(df_sorted_prodperha.iloc[0]["ProdPerHa"])
-
-        # ---- Top 5 untuk tiap chart ----
-        # 1) Top 5 produksi
-        df_top_prod = df_sorted_prod.head(5)
-        kab_prod_top_labels = df_top_prod["KabKota"].tolist()
-        kab_prod_top_values = df_top_prod["Produksi"].round(2).tolist()
-
-        # 2) Top 5 luas lahan
-        df_sorted_luas = df_kab_filtered.sort_values("LuasLahan", ascending=False)
-        df_top_luas = df_sorted_luas.head(5)
-        kab_luas_top_labels = df_top_luas["KabKota"].tolist()
-        kab_luas_top_values = df_top_luas["LuasLahan"].round(2).tolist()
-
-        # 3) Top 5 produktivitas (Ton/Ha)
-        df_top_prodperha = df_sorted_prodperha.head(5)
-        kab_prodperha_top_labels = df_top_prodperha["KabKota"].tolist()
-        kab_prodperha_top_values = df_top_prodperha["ProdPerHa"].round(3).tolist()
-    else:
-        total_produksi = 0.0
-        total_luas = 0.0
-        rata_prod_per_ha = 0.0
-        kab_top_prod = ""
-        kab_top_prod_val = 0.0
-        kab_top_prodperha = ""
-        kab_top_prodperha_val = 0.0
-        kab_prod_top_labels = []
-        kab_prod_top_values = []
-        kab_luas_top_labels = []
-        kab_luas_top_values = []
-        kab_prodperha_top_labels = []
-        kab_prodperha_top_values = []
+    kab_panel = get_kabkota_panel(selected_komoditas, prov_id)
 
     # =====================================================
     #  DATA JUMLAH PETANI
     # =====================================================
     try:
-        from db_loaders import load_jumlah_petani_data_from_db
-        df_petani = load_jumlah_petani_data_from_db()
+        petani_provinsi_list, petani_kabkota_list, df_petani_filtered = load_jumlah_petani(
+            petani_provinsi_param, petani_kabkota_param
+        )
     except Exception as e:
         logger.warning(f"[JUMLAH PETANI] Error load: {e}")
-        df_petani = pd.DataFrame(columns=["Komoditi", "Provinsi", "KabKota", "JumlahPetani"])
-
-    # Dropdown options untuk filter jumlah petani
-    petani_provinsi_list = []
-    petani_kabkota_list = []
-    
-    if not df_petani.empty:
-        petani_provinsi_list = sorted(df_petani["Provinsi"].dropna().unique().tolist())
-        petani_kabkota_list = sorted(df_petani["KabKota"].dropna().unique().tolist())
-
-    # Filter data jumlah petani berdasarkan filter yang dipilih
-    df_petani_filtered = df_petani.copy()
-    
-    if petani_provinsi_param:
-        df_petani_filtered = df_petani_filtered[
-            df_petani_filtered["Provinsi"].str.strip().str.lower() == petani_provinsi_param.lower()
-        ]
-    
-    if petani_kabkota_param:
-        df_petani_filtered = df_petani_filtered[
-            df_petani_filtered["KabKota"].str.strip().str.lower() == petani_kabkota_param.lower()
-        ]
+        petani_provinsi_list, petani_kabkota_list = [], []
+        df_petani_filtered = pd.DataFrame(columns=PETANI_COLUMNS)
 
     # Proses data jumlah petani untuk chart
     petani_labels = []
     petani_values = []
     
     if not df_petani_filtered.empty:
-        # Sort by jumlah petani descending dan ambil top entries
-        df_petani_sorted = df_petani_filtered.sort_values("JumlahPetani", ascending=False)
-        # Ambil top 10 atau semua jika kurang dari 10
-        df_petani_top = df_petani_sorted.head(10)
+        # Sudah urut JumlahPetani menurun; ambil top 10 atau semua jika kurang dari 10
+        df_petani_top = df_petani_filtered.head(10)
         
         # Format label: Kabupaten/Kota
-        petani_labels = df_petani_top["KabKota"].astype(str).str.strip().tolist()
+        petani_labels = df_petani_top["KabKota"].astype(str).tolist()
         petani_values = df_petani_top["JumlahPetani"].astype(int).tolist()
 
     # --------------------------
     # SUSUN CONTEXT
     # --------------------------
     ctx = dict(
-        # Dropdown list
-        provinsi_list=provinsi_list,
-        tahun_list=tahun_list,
-        klasifikasi_list=klasifikasi_list,
-        komoditas_list=komoditas_list,
-
-        # Selected
-        provinsi_selected=provinsi,
-        tahun_selected=str(selected_year) if selected_year is not None else "",
-        klasifikasi_selected=selected_klas,
-        komoditas_selected=selected_komoditas,
+        # Dropdown list + pilihan
+        **selection,
 
         # KPI
         kom_unit_label=unit_label,
@@ -509,19 +678,7 @@ def build_komoditas_context(request):
         kom_prov_values=kom_prov_values,
 
         # --- Detail Kab/Kota ---
-        kab_total_produksi=total_produksi,
-        kab_total_luas=total_luas,
-        kab_rata_prod_per_ha=rata_prod_per_ha,
-        kab_top_prod_kab=kab_top_prod,
-        kab_top_prod_val=kab_top_prod_val,
-        kab_top_prodperha_kab=kab_top_prodperha,
-        kab_top_prodperha_val=kab_top_prodperha_val,
-        kab_prod_top_labels=kab_prod_top_labels,
-        kab_prod_top_values=kab_prod_top_values,
-        kab_luas_top_labels=kab_luas_top_labels,
-        kab_luas_top_values=kab_luas_top_values,
-        kab_prodperha_top_labels=kab_prodperha_top_labels,
-        kab_prodperha_top_values=kab_prodperha_top_values,
+        **kab_panel,
 
         # --- Jumlah Petani ---
         petani_provinsi_list=petani_provinsi_list,
@@ -628,11 +785,6 @@ def load_kredit_lokasi_data_from_excel():
 
     df_raw = df_raw[~(is_empty | is_unknown | is_total_lokasi | is_date)].copy()
 
-    # >>> HANYA AMBIL SEKTOR YANG MENGANDUNG KATA "PERKEBUNAN"
-    mask_perkebunan = df_raw["Sektor"].str.contains("perkebunan", case=False, na=False)
-    df_raw = df_raw[mask_perkebunan].copy()
-    # <<<
-
     # Buang kolom 'All' (total per sektor) – nanti kita hitung sendiri via groupby
     if "All" in df_raw.columns:
         df_raw = df_raw.drop(columns=["All"])
@@ -650,16 +802,8 @@ def load_kredit_lokasi_data_from_excel():
 
     df_long["Lokasi"] = df_long["Lokasi"].astype(str).str.strip()
 
-    # Angka Indonesia → float
-    df_long["Kredit"] = (
-        df_long["KreditRaw"]
-        .astype(str)
-        .str.strip()
-        .str.replace(" ", "", regex=False)
-        .str.replace(".", "", regex=False)   # ribuan
-        .str.replace(",", ".", regex=False)  # desimal
-    )
-    df_long["Kredit"] = pd.to_numeric(df_long["Kredit"], errors="coerce").fillna(0.0)
+    # Angka Indonesia → float (sel numerik Excel dipakai apa adanya)
+    df_long["Kredit"] = clean_angka_id(df_long["KreditRaw"])
 
     # Buang baris lokasi kosong
     df_long = df_long[
@@ -667,94 +811,270 @@ def load_kredit_lokasi_data_from_excel():
         df_long["Lokasi"].notna()
     ]
 
-    print(
-        "[KRL] rows:", len(df_long),
-        "| sektor unik:", df_long["Sektor"].nunique(),
-        "| lokasi unik:", df_long["Lokasi"].nunique(),
-        "| tahun:", krl_tahun,
-        "| bulan:", krl_jumlah_bulan,
+    logger.info(
+        f"📊 [KREDIT LOKASI] {len(df_long)} baris | sektor unik: {df_long['Sektor'].nunique()} | "
+        f"lokasi unik: {df_long['Lokasi'].nunique()} | tahun: {krl_tahun} | bulan: {krl_jumlah_bulan}"
     )
 
     return df_long, krl_tahun, krl_jumlah_bulan
 
 
+# -------------------------------------------------
+# MATRIKS SEKTOR × LOKASI
+# -------------------------------------------------
+# Interval muat ulang matriks kredit lokasi di background (detik); tabel DB bisa diubah di luar aplikasi
+KRL_CACHE_TTL = float(os.environ.get("KRL_CACHE_TTL", "300"))
+
+# View dashboard: sub-sektor perkebunan (tampilan awal) / semua sektor utama
+KRL_VIEW_PERKEBUNAN = "PERKEBUNAN"
+KRL_VIEW_SEMUA = "SEMUA"
+
+
+def _krl_matrix(sektor: list, lokasi: list, values: np.ndarray, present: np.ndarray,
+                krl_tahun=None, krl_jumlah_bulan=None) -> dict:
+    """Matriks sektor × lokasi + jumlah baris/kolom & urutan menurunnya (lihat build_kredit_lokasi_matrix)."""
+    row_sum = values.sum(axis=1)
+    col_sum = values.sum(axis=0)
+    return dict(
+        sektor=sektor,
+        lokasi=lokasi,
+        sektor_index={name: i for i, name in enumerate(sektor)},
+        lokasi_index={name: j for j, name in enumerate(lokasi)},
+        values=values,
+        present=present,
+        row_sum=row_sum,
+        col_sum=col_sum,
+        total=float(values.sum()),
+        sektor_order=np.argsort(-row_sum, kind="stable"),
+        lokasi_order=np.argsort(-col_sum, kind="stable"),
+        lokasi_order_by_sektor=np.argsort(-values, axis=1, kind="stable"),
+        sektor_order_by_lokasi=np.argsort(-values, axis=0, kind="stable"),
+        tahun=krl_tahun,
+        jumlah_bulan=krl_jumlah_bulan,
+    )
+
+
+def build_kredit_lokasi_matrix(df: pd.DataFrame, krl_tahun=None, krl_jumlah_bulan=None) -> dict:
+    """
+    Susun data long (Sektor | Lokasi | Kredit) menjadi matriks padat
+    sub-sektor × lokasi beserta jumlah baris/kolom dan urutan menurunnya.
+    Sektor & lokasi diurutkan alfabetis (indeks baris/kolom).
+
+    Kunci:
+      sektor, lokasi                 : daftar nama (urutan baris / kolom)
+      sektor_index, lokasi_index     : nama → posisi
+      values                         : ndarray (S, L) total kredit
+      present                        : ndarray bool (S, L), ada baris data atau tidak
+      row_sum, col_sum, total        : total per sektor / per lokasi / keseluruhan
+      sektor_order, lokasi_order     : posisi urut total menurun
+      lokasi_order_by_sektor         : (S, L) urutan lokasi menurun per sektor
+      sektor_order_by_lokasi         : (S, L) urutan sektor menurun per lokasi (per kolom)
+
+    Hierarki sektor (sektor.sektor_utama):
+      grup                           : daftar sektor utama
+      sektor_grup                    : sektor utama tiap baris
+      views                          : KRL_VIEW_SEMUA → matriks sektor utama × lokasi
+                                       (subtotal per lokasi); nama sektor utama →
+                                       matriks sub-sektornya; KRL_VIEW_PERKEBUNAN →
+                                       sub-sektor perkebunan. Semua view punya kunci
+                                       yang sama dengan matriks di atas.
+    """
+    sektor_codes, sektor = pd.factorize(df["Sektor"], sort=True)
+    lokasi_codes, lokasi = pd.factorize(df["Lokasi"], sort=True)
+    valid = (sektor_codes >= 0) & (lokasi_codes >= 0)
+    sektor_codes, lokasi_codes = sektor_codes[valid], lokasi_codes[valid]
+    kredit = pd.to_numeric(df["Kredit"], errors="coerce").fillna(0.0).to_numpy(dtype=float)[valid]
+
+    values = np.zeros((len(sektor), len(lokasi)))
+    np.add.at(values, (sektor_codes, lokasi_codes), kredit)
+    present = np.zeros(values.shape, dtype=bool)
+    present[sektor_codes, lokasi_codes] = True
+
+    sektor = sektor.tolist()
+    lokasi = lokasi.tolist()
+    matrix = _krl_matrix(sektor, lokasi, values, present, krl_tahun, krl_jumlah_bulan)
+
+    # ---- Hierarki: sektor utama → sub-sektor, subtotal per lokasi ----
+    sektor_grup = [sektor_utama(s) for s in sektor]
+    grup_codes, grup = pd.factorize(pd.Series(sektor_grup, dtype=object), sort=True)
+    grup = grup.tolist()
+    grup_values = np.zeros((len(grup), len(lokasi)))
+    np.add.at(grup_values, grup_codes, values)
+    grup_present = np.zeros(grup_values.shape, dtype=bool)
+    np.logical_or.at(grup_present, grup_codes, present)
+
+    def sub_view(rows):
+        return _krl_matrix(
+            [sektor[r] for r in rows], lokasi, values[rows], present[rows],
+            krl_tahun, krl_jumlah_bulan,
+        )
+
+    views = {KRL_VIEW_SEMUA: _krl_matrix(grup, lokasi, grup_values, grup_present, krl_tahun, krl_jumlah_bulan)}
+    for g, name in enumerate(grup):
+        views[name] = sub_view(np.flatnonzero(grup_codes == g))
+    views[KRL_VIEW_PERKEBUNAN] = sub_view(
+        np.array([i for i, s in enumerate(sektor) if "perkebunan" in s.lower()], dtype=int)
+    )
+
+    matrix.update(grup=grup, sektor_grup=sektor_grup, views=views)
+    return matrix
+
+
+def _build_kredit_lokasi_snapshot(data: tuple) -> dict:
+    df, krl_tahun, krl_jumlah_bulan = data
+    return build_kredit_lokasi_matrix(df, krl_tahun, krl_jumlah_bulan)
+
+
+# Data bersih (frame, tahun, bulan) dimuat sekali per versi; matriks
+# (dashboard) dan frame query / ekspor (query_engine) memakai snapshot ini
+snapshots.register("kredit_lokasi_data", load_kredit_lokasi_data, dataset="kredit_lokasi", interval=KRL_CACHE_TTL)
+snapshots.register("kredit_lokasi", _build_kredit_lokasi_snapshot, source="kredit_lokasi_data")
+
+
+def get_kredit_lokasi_matrix() -> dict:
+    """
+    Snapshot matriks kredit lokasi terakhir. Dibangun sekali, dipakai bersama
+    semua request; dimuat ulang di background saat versi data "kredit_lokasi"
+    berubah atau setelah KRL_CACHE_TTL detik.
+    """
+    return snapshots.get("kredit_lokasi")
+
+
+def kredit_lokasi_heatmap(matrix: dict, top_sektor: int | None = None, top_lokasi: int | None = None) -> dict:
+    """
+    Data heatmap sektor × lokasi: baris & kolom urut total menurun,
+    opsional dibatasi ke N sektor / lokasi teratas.
+    """
+    rows = matrix["sektor_order"][:top_sektor]
+    cols = matrix["lokasi_order"][:top_lokasi]
+    return dict(
+        sektor=[matrix["sektor"][i] for i in rows],
+        lokasi=[matrix["lokasi"][j] for j in cols],
+        values=matrix["values"][np.ix_(rows, cols)].round(2).tolist(),
+        sektor_total=matrix["row_sum"][rows].round(2).tolist(),
+        lokasi_total=matrix["col_sum"][cols].round(2).tolist(),
+        total=round(matrix["total"], 2),
+        tahun=matrix["tahun"],
+        jumlah_bulan=matrix["jumlah_bulan"],
+    )
+
+
+def _krl_ranking(names: list, values: np.ndarray, order: np.ndarray, limit: int = 10):
+    """(label top-N, nilai top-N, nama teratas, nilai teratas) dari vektor + urutannya."""
+    if len(order) == 0:
+        return [], [], "", 0.0
+    top = order[:limit]
+    return (
+        [names[k] for k in top],
+        values[top].round(2).tolist(),
+        names[order[0]],
+        float(values[order[0]]),
+    )
+
+
+def empty_kredit_lokasi_context(error: str | None = None):
+    """Context placeholder untuk section kredit lokasi (lihat empty_komoditas_context)."""
+    return dict(
+        krl_section_error=error,
+        krl_grup_list=[], krl_grup_selected="",
+        krl_sektor_list=[], krl_lokasi_list=[],
+        krl_sektor_selected="", krl_lokasi_selected="",
+        krl_tahun=None, krl_jumlah_bulan=None,
+        krl_total_kredit=0.0,
+        krl_top_lokasi="", krl_top_lokasi_val=0.0,
+        krl_top_sektor="", krl_top_sektor_val=0.0,
+        krl_lokasi_labels=[], krl_lokasi_values=[],
+        krl_sektor_labels=[], krl_sektor_values=[],
+    )
+
+
+def build_kredit_lokasi_filters(request) -> dict:
+    """
+    Dropdown dan filter terpilih bagian Kredit berdasarkan Lokasi (cukup untuk
+    shell HTML). Parameter pakai prefix 'krl_'.
+    """
+    matrix = get_kredit_lokasi_matrix()
+
+    # Kelompok sektor: default sub-sektor perkebunan; "SEMUA" = sektor utama;
+    # nama sektor utama = drill-down ke sub-sektornya
+    grup_param = (request.args.get("krl_grup") or "").strip() or KRL_VIEW_PERKEBUNAN
+    if grup_param not in matrix["views"]:
+        grup_param = KRL_VIEW_PERKEBUNAN
+    m = matrix["views"][grup_param]
+    return dict(
+        krl_grup_list=[KRL_VIEW_PERKEBUNAN, KRL_VIEW_SEMUA] + matrix["grup"],
+        krl_grup_selected=grup_param,
+        krl_sektor_list=m["sektor"],
+        krl_lokasi_list=m["lokasi"],
+        krl_sektor_selected=(request.args.get("krl_sektor") or "").strip(),
+        krl_lokasi_selected=(request.args.get("krl_lokasi") or "").strip(),
+    )
+
+
 def build_kredit_lokasi_context(request):
     """
     Context untuk bagian dashboard Kredit berdasarkan Lokasi.
     Parameter pakai prefix 'krl_' supaya tidak tabrakan dengan filter komoditas.
     """
-    df, krl_tahun, krl_jumlah_bulan = load_kredit_lokasi_data()
+    matrix = get_kredit_lokasi_matrix()
+
+    filters = build_kredit_lokasi_filters(request)
+    m = matrix["views"][filters["krl_grup_selected"]]
+    krl_tahun, krl_jumlah_bulan = m["tahun"], m["jumlah_bulan"]
+    values, present = m["values"], m["present"]
 
     # Dropdown
-    sektor_list = sorted(df["Sektor"].dropna().unique().tolist())
-    lokasi_list = sorted(df["Lokasi"].dropna().unique().tolist())
+    sektor_list = filters["krl_sektor_list"]
+    lokasi_list = filters["krl_lokasi_list"]
 
-    sektor_param = (request.args.get("krl_sektor") or "").strip()
-    lokasi_param = (request.args.get("krl_lokasi") or "").strip()
+    sektor_param = filters["krl_sektor_selected"]
+    lokasi_param = filters["krl_lokasi_selected"]
 
-    # ---------- TOTAL KREDIT (FILTER SAAT INI) ----------
-    df_filtered = df.copy()
-    if sektor_param:
-        df_filtered = df_filtered[df_filtered["Sektor"] == sektor_param]
-    if lokasi_param:
-        df_filtered = df_filtered[df_filtered["Lokasi"] == lokasi_param]
+    # Posisi baris / kolom filter; filter yang tidak dikenal → subset kosong
+    i = m["sektor_index"].get(sektor_param) if sektor_param else None
+    j = m["lokasi_index"].get(lokasi_param) if lokasi_param else None
+    sektor_unknown = bool(sektor_param) and i is None
+    lokasi_unknown = bool(lokasi_param) and j is None
 
-    krl_total_kredit = float(df_filtered["Kredit"].sum()) if not df_filtered.empty else 0.0
+    # ---------- TOTAL KREDIT (FILTER SAAT INI) ----------
+    if sektor_unknown or lokasi_unknown:
+        krl_total_kredit = 0.0
+    elif i is not None and j is not None:
+        krl_total_kredit = float(values[i, j])
+    elif i is not None:
+        krl_total_kredit = float(m["row_sum"][i])
+    elif j is not None:
+        krl_total_kredit = float(m["col_sum"][j])
+    else:
+        krl_total_kredit = m["total"]
 
     # ---------- TOP LOKASI (respek filter sektor, abaikan filter lokasi) ----------
-    if sektor_param:
-        df_for_lokasi = df[df["Sektor"] == sektor_param]
+    if sektor_unknown:
+        vec, order = np.empty(0), np.empty(0, dtype=int)
+    elif i is not None:
+        vec, order = values[i], m["lokasi_order_by_sektor"][i]
+        order = order[present[i, order]]
     else:
-        df_for_lokasi = df.copy()
-
-    df_by_lokasi = (
-        df_for_lokasi
-        .groupby("Lokasi", as_index=False)["Kredit"]
-        .sum()
-        .sort_values("Kredit", ascending=False)
+        vec, order = m["col_sum"], m["lokasi_order"]
+    krl_lokasi_labels, krl_lokasi_values, krl_top_lokasi, krl_top_lokasi_val = _krl_ranking(
+        lokasi_list, vec, order
     )
-    df_top10_lokasi = df_by_lokasi.head(10)
-
-    krl_lokasi_labels = df_top10_lokasi["Lokasi"].tolist()
-    krl_lokasi_values = df_top10_lokasi["Kredit"].round(2).tolist()
-
-    if not df_by_lokasi.empty:
-        krl_top_lokasi = df_by_lokasi.iloc[0]["Lokasi"]
-        krl_top_lokasi_val = float(df_by_lokasi.iloc[0]["Kredit"])
-    else:
-        krl_top_lokasi = ""
-        krl_top_lokasi_val = 0.0
 
     # ---------- TOP SEKTOR (respek filter lokasi, abaikan filter sektor) ----------
-    if lokasi_param:
-        df_for_sektor = df[df["Lokasi"] == lokasi_param]
+    if lokasi_unknown:
+        vec, order = np.empty(0), np.empty(0, dtype=int)
+    elif j is not None:
+        vec, order = values[:, j], m["sektor_order_by_lokasi"][:, j]
+        order = order[present[order, j]]
     else:
-        df_for_sektor = df.copy()
-
-    df_by_sektor = (
-        df_for_sektor
-        .groupby("Sektor", as_index=False)["Kredit"]
-        .sum()
-        .sort_values("Kredit", ascending=False)
+        vec, order = m["row_sum"], m["sektor_order"]
+    krl_sektor_labels, krl_sektor_values, krl_top_sektor, krl_top_sektor_val = _krl_ranking(
+        sektor_list, vec, order
     )
-    df_top10_sektor = df_by_sektor.head(10)
-
-    krl_sektor_labels = df_top10_sektor["Sektor"].tolist()
-    krl_sektor_values = df_top10_sektor["Kredit"].round(2).tolist()
-
-    if not df_by_sektor.empty:
-        krl_top_sektor = df_by_sektor.iloc[0]["Sektor"]
-        krl_top_sektor_val = float(df_by_sektor.iloc[0]["Kredit"])
-    else:
-        krl_top_sektor = ""
-        krl_top_sektor_val = 0.0
 
     ctx = dict(
         # dropdown
-        krl_sektor_list=sektor_list,
-        krl_lokasi_list=lokasi_list,
-        krl_sektor_selected=sektor_param,
-        krl_lokasi_selected=lokasi_param,
+        **filters,
 
         # metadata
         krl_tahun=krl_tahun,
@@ -7,6 +7,9 @@ from db_loaders import (
     load_umkm_data_from_db,
     load_konv_syariah_data_from_db,
 )
+import snapshots
+from executor import submit
+from regions import SUMSEL_ID, add_region_ids, region_id
 
 logger = logging.getLogger(__name__)
 
@@ -159,6 +162,9 @@ def load_data():
 
     # Kolom periode (datetime) untuk sort
     df["periode"] = pd.to_datetime(dict(year=df["Tahun"], month=df["Bulan"], day=1))
+
+    # ID wilayah kanonik (sekali saat load)
+    add_region_ids(df, "Provinsi")
     return df
 
 
@@ -280,6 +286,7 @@ def load_umkm_data():
     ).fillna(0).astype(int)
 
     df["periode"] = pd.to_datetime(dict(year=df["Tahun"], month=df["Bulan"], day=1))
+    add_region_ids(df, "Provinsi")
     return df
 
 
@@ -376,9 +383,67 @@ def load_konv_syariah_data():
     # periode anchor
     df["periode"] = pd.to_datetime(dict(year=df["Tahun"], month=df["Bulan"], day=1))
 
+    add_region_ids(df, "Provinsi", "Kab/Kota")
     return df
 
 
+# -------------------------------------------------
+# NPL & LDR TAHUNAN SUMATERA SELATAN (langsung dari DB)
+# -------------------------------------------------
+def load_npl_ldr_trend():
+    """
+    Nilai Desember NPL Gross & LDR Sumatera Selatan untuk semua tahun.
+    AMBIL LANGSUNG DARI DATABASE tanpa normalisasi atau perhitungan apapun.
+    Return: (npl_labels, npl_series, ldr_series); list kosong kalau tidak
+    ada data Desember. Error DB diteruskan: snapshot lama tetap dipakai dan
+    refresher mencoba lagi setelah SNAPSHOT_RETRY.
+    """
+    from db_loaders import parse_bulan_from_db, read_query
+
+    df_raw = read_query("npl_ldr")
+
+    # Query sudah menyaring Sumatera Selatan secara kasar; kepastiannya lewat ID wilayah
+    if not df_raw.empty:
+        add_region_ids(df_raw, "Provinsi")
+        df_raw = df_raw[df_raw["prov_id"] == SUMSEL_ID]
+
+    if df_raw.empty:
+        logger.warning("⚠️  Tidak ada data Desember untuk Sumatra Selatan di database")
+        return [], [], []
+
+    # Parse Bulan untuk memastikan hanya ambil data Desember (bulan 12)
+    # Handle berbagai format: 12, '12', 'Desember', 'Des', dll
+    if df_raw["Bulan"].dtype == object:
+        df_raw["Bulan"] = df_raw["Bulan"].apply(parse_bulan_from_db).astype(int)
+    elif df_raw["Bulan"].dtype not in [int, 'int64', 'int32']:
+        df_raw["Bulan"] = df_raw["Bulan"].apply(parse_bulan_from_db).astype(int)
+
+    # Filter hanya bulan Desember (12), jika ada duplikat tahun ambil yang pertama
+    df_raw = df_raw[df_raw["Bulan"] == 12]
+    df_raw = df_raw.sort_values("Tahun")
+    df_raw = df_raw.drop_duplicates(subset=["Tahun"], keep="first")
+
+    # Nilai di database dalam format desimal (0.0316 = 3.16%), dikali 100 untuk display
+    npl_series = [x * 100 for x in df_raw["Rasio NPL Gross"].fillna(0.0).astype(float)]
+    ldr_series = [x * 100 for x in df_raw["Loan to Deposit Rastio (LDR)"].fillna(0.0).astype(float)]
+    npl_labels = [f"Des'{str(y)[-2:]}" for y in df_raw["Tahun"]]
+
+    logger.info(f"📊 NPL/LDR Trend - Mengambil {len(npl_labels)} data Desember dari Sumatra Selatan langsung dari DB (tanpa perhitungan)")
+    logger.info(f"   Tahun: {df_raw['Tahun'].tolist()}")
+    logger.info(f"   NPL: {npl_series}")
+    logger.info(f"   LDR: {ldr_series}")
+    return npl_labels, npl_series, ldr_series
+
+
+# -------------------------------------------------
+# SNAPSHOT DATASET (dimuat ulang di background, lihat snapshots)
+# -------------------------------------------------
+snapshots.register("perbankan", load_data)
+snapshots.register("umkm", load_umkm_data)
+snapshots.register("konv_syariah", load_konv_syariah_data)
+snapshots.register("npl_ldr", load_npl_ldr_trend, dataset="perbankan")
+
+
 # -------------------------------------------------
 # HELPER AGREGASI & GROWTH
 # -------------------------------------------------
@@ -517,27 +582,55 @@ def growth_class(v: float | None) -> str:
     return "success" if v >= 0 else "danger"
 
 
+# -------------------------------------------------
+# FILTER DASHBOARD PERBANKAN (dropdown + pilihan)
+# -------------------------------------------------
+def build_dashboard_filters(request) -> dict:
+    """
+    Dropdown dan filter terpilih dashboard perbankan. Cukup untuk merender
+    shell HTML: hanya membaca snapshot data utama, tanpa KPI / chart.
+    """
+    df = snapshots.get("perbankan")
+    return dict(
+        negara_list=sorted(df["Negara"].dropna().unique().tolist()),
+        provinsi_list=sorted(df["Provinsi"].dropna().unique().tolist()),
+        tahun_list=sorted(df["Tahun"].dropna().unique().tolist()),
+        bulan_list=sorted(df["Bulan"].dropna().unique().tolist()),
+        negara_selected=request.args.get("negara") or "",
+        provinsi_selected=request.args.get("provinsi") or "",
+        tahun_selected=request.args.get("tahun") or "",
+        bulan_selected=request.args.get("bulan") or "",
+        interval_selected=request.args.get("interval") or "bulanan",
+    )
+
+
 # -------------------------------------------------
 # FUNCTION PEMBANGUN CONTEXT DASHBOARD PERBANKAN
 # (isi sama persis dengan body route `dashboard` sebelumnya)
 # -------------------------------------------------
 def build_dashboard_context(request):
-    # ---------- Data utama ----------
-    df = load_data()
+    # ---------- Ambil snapshot keempat sumber data secara paralel ----------
+    # Snapshot yang sudah ada langsung kembali; hanya saat cache dingin loader
+    # benar-benar jalan (paralel, tiap loader meminjam koneksi pool sendiri).
+    # Builder hanya menunggu (.result()) tepat saat datanya dibutuhkan.
+    data_future = submit(snapshots.get, "perbankan")
+    npl_ldr_future = submit(snapshots.get, "npl_ldr")
+    umkm_future = submit(snapshots.get, "umkm")
+    ks_future = submit(snapshots.get, "konv_syariah")
 
-    negara_list = sorted(df["Negara"].dropna().unique().tolist())
-    provinsi_list = sorted(df["Provinsi"].dropna().unique().tolist())
-    tahun_list = sorted(df["Tahun"].dropna().unique().tolist())
-    bulan_list = sorted(df["Bulan"].dropna().unique().tolist())
+    # ---------- Data utama ----------
+    df = data_future.result()
 
-    negara = request.args.get("negara") or ""
-    provinsi = request.args.get("provinsi") or ""
-    tahun = request.args.get("tahun") or ""
-    bulan = request.args.get("bulan") or ""
-    interval = request.args.get("interval") or "bulanan"
+    filters = build_dashboard_filters(request)
+    negara = filters["negara_selected"]
+    provinsi = filters["provinsi_selected"]
+    tahun = filters["tahun_selected"]
+    bulan = filters["bulan_selected"]
+    interval = filters["interval_selected"]
 
     selected_year = int(tahun) if tahun else None
     selected_month = int(bulan) if bulan else None
+    prov_id = region_id(provinsi) if provinsi else None
 
     # Filter wilayah data utama
     df_region = df.copy()
@@ -547,7 +640,7 @@ def build_dashboard_context(request):
         df_region = df_region[df_region["Negara"] == negara]
         logger.info(f"📊 build_dashboard_context: Setelah filter negara '{negara}': {len(df_region)} baris")
     if provinsi:
-        df_region = df_region[df_region["Provinsi"] == provinsi]
+        df_region = df_region[df_region["prov_id"] == prov_id]
         logger.info(f"📊 build_dashboard_context: Setelah filter provinsi '{provinsi}': {len(df_region)} baris")
     if df_region.empty:
         df_region = df.copy()
@@ -776,88 +869,21 @@ def build_dashboard_context(request):
 
     # ---------- NPL & LDR tahunan (Desember, semua tahun) ----------
     # Khusus untuk 2 grafik ini: tidak mengikuti filter, hanya ambil nilai Desember di Sumatra Selatan
-    # AMBIL LANGSUNG DARI DATABASE tanpa normalisasi atau perhitungan apapun
-    from db_loaders import get_db_session
-    from sqlalchemy import text
-    
-    npl_labels = []
-    npl_series = []
-    ldr_series = []
-    
     try:
-        session = get_db_session()
-        # Query langsung ke database untuk mendapatkan nilai asli tanpa normalisasi
-        # Kolom "Bulan" di database adalah string, jadi ambil semua dulu lalu filter di Python
-        query = text("""
-            SELECT 
-                "Tahun",
-                "Bulan",
-                "Provinsi",
-                "Rasio NPL Gross",
-                "Loan to Deposit Rastio (LDR)"
-            FROM kinerja_perbankan_summary
-            WHERE (
-                UPPER(TRIM("Provinsi")) LIKE '%SUMATERA SELATAN%'
-                OR UPPER(TRIM("Provinsi")) LIKE '%SUMATERASELATAN%'
-                OR UPPER(TRIM("Provinsi")) LIKE '%SUMSEL%'
-            )
-            ORDER BY "Tahun", "Bulan"
-        """)
-        df_raw = pd.read_sql(query, session.bind)
-
-        session.close()
-        
-        if not df_raw.empty:
-            # Parse Bulan untuk memastikan hanya ambil data Desember (bulan 12)
-            # Handle berbagai format: 12, '12', 'Desember', 'Des', dll
-            from db_loaders import parse_bulan_from_db
-            if df_raw["Bulan"].dtype == object:
-                df_raw["Bulan"] = df_raw["Bulan"].apply(parse_bulan_from_db).astype(int)
-            elif df_raw["Bulan"].dtype not in [int, 'int64', 'int32']:
-                df_raw["Bulan"] = df_raw["Bulan"].apply(parse_bulan_from_db).astype(int)
-            
-            # Filter hanya bulan Desember (12)
-            df_raw = df_raw[df_raw["Bulan"] == 12]          
-            # Sort by tahun
-            df_raw = df_raw.sort_values("Tahun")
-            # Jika ada duplikat tahun, ambil yang pertama
-            df_raw = df_raw.drop_duplicates(subset=["Tahun"], keep="first")
-            
-            # Ambil nilai langsung dari database, TANPA perhitungan apapun
-            # Nilai di database dalam format desimal (0.0316 = 3.16%), jadi perlu dikalikan 100 untuk display
-            npl_series = df_raw["Rasio NPL Gross"].fillna(0.0).astype(float).tolist()
-            ldr_series = df_raw["Loan to Deposit Rastio (LDR)"].fillna(0.0).astype(float).tolist()
-            
-            npl_labels = [f"Des'{str(y)[-2:]}" for y in df_raw["Tahun"]]
-
-            # Konversi dari desimal ke persen (kalikan 100) untuk display di grafik
-            npl_series = [x * 100 for x in npl_series]
-            ldr_series = [x * 100 for x in ldr_series]
-                
-            logger.info(f"📊 NPL/LDR Trend - Mengambil {len(npl_labels)} data Desember dari Sumatra Selatan langsung dari DB (tanpa perhitungan)")
-            logger.info(f"   Tahun: {df_raw['Tahun'].tolist()}")
-            logger.info(f"   NPL: {npl_series}")
-            logger.info(f"   LDR: {ldr_series}")
-        else:
-            logger.warning("⚠️  Tidak ada data Desember untuk Sumatra Selatan di database")
-            npl_labels = []
-            npl_series = []
-            ldr_series = []
+        npl_labels, npl_series, ldr_series = npl_ldr_future.result()
     except Exception as e:
+        # Snapshot belum pernah berhasil dimuat (cache dingin, DB gagal)
         logger.error(f"❌ Error mengambil data NPL/LDR dari database: {e}")
-        npl_labels = []
-        npl_series = []
-        ldr_series = []
+        npl_labels, npl_series, ldr_series = [], [], []
 
     # -------------------------------------------------
     # DATA UMKM
     # -------------------------------------------------
-    df_umkm = load_umkm_data()
+    df_umkm = umkm_future.result()
 
     umkm_region = df_umkm.copy()
-    if provinsi:
-        prov_norm = provinsi.strip().upper()
-        tmp = umkm_region[umkm_region["Provinsi"].astype(str).str.upper() == prov_norm]
+    if prov_id is not None:
+        tmp = umkm_region[umkm_region["prov_id"] == prov_id]
         # kalau ketemu, pakai yang match; kalau tidak, biarkan
         if not tmp.empty:
             umkm_region = tmp
@@ -985,12 +1011,11 @@ def build_dashboard_context(request):
     # -------------------------------------------------
     # KREDIT KONVENSIONAL vs SYARIAH (Bank Umum)
     # -------------------------------------------------
-    df_ks = load_konv_syariah_data()  # fungsi ini sudah HANYA ambil Kab/Kota yang ada "all"
+    df_ks = ks_future.result()  # loader ini sudah HANYA ambil Kab/Kota yang ada "all"
 
     ks_region = df_ks.copy()
-    if provinsi:
-        prov_norm = provinsi.strip().upper()
-        tmp = ks_region[ks_region["Provinsi"].astype(str).str.upper() == prov_norm]
+    if prov_id is not None:
+        tmp = ks_region[ks_region["prov_id"] == prov_id]
         # kalau ketemu, pakai provinsi tsb; kalau tidak, biarkan tetap nasional
         if not tmp.empty:
             ks_region = tmp
@@ -1046,15 +1071,7 @@ def build_dashboard_context(request):
     # CONTEXT UNTUK TEMPLATE
     # -------------------------------------------------
     ctx = dict(
-        negara_list=negara_list,
-        provinsi_list=provinsi_list,
-        tahun_list=tahun_list,
-        bulan_list=bulan_list,
-        negara_selected=negara,
-        provinsi_selected=provinsi,
-        tahun_selected=tahun,
-        bulan_selected=bulan,
-        interval_selected=interval,
+        **filters,
         # KPI utama
         aset_val=aset_val,
         aset_yoy=aset_yoy,
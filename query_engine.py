@@ -0,0 +1,422 @@
+# query_engine.py
+"""
+Query ad-hoc atas dataset yang sudah dibersihkan (endpoint /api/v1/query).
+
+Spec JSON:
+
+    {
+      "dataset": "konv_syariah",
+      "filters": {"Tahun": 2023, "Skema": ["Konvensional", "Syariah"],
+                  "Bulan": {"gte": 6}},
+      "group_by": ["Kab/Kota", "Skema"],
+      "measures": ["Kredit", {"column": "NPL", "agg": "mean", "as": "npl_rata2"}],
+      "sort": ["-Kredit"],
+      "limit": 100
+    }
+
+- filters: kolom → nilai (sama dengan), list (salah satu), atau objek
+  operator {eq, ne, in, gt, gte, lt, lte}. Teks dicocokkan tanpa beda huruf
+  besar/kecil & spasi di tepi, sama seperti filter SQL di db_loaders.
+- measures: "Kolom" (= sum) atau {column, agg, as}; tanpa measures → jumlah baris.
+- sort: nama kolom hasil, awalan "-" untuk urutan menurun.
+
+Frame dataset dibaca dari snapshot (snapshots, dimuat ulang di background),
+hasil query di-cache lewat context_cache dengan kunci spec ternormalisasi +
+versi data snapshot. Query
+berjalan di thread pool "query" (jumlah query paralel per proses dibatasi)
+dengan batas waktu QUERY_TIME_BUDGET, batas baris QUERY_MAX_ROWS dan batas
+grup QUERY_MAX_GROUPS.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+
+import snapshots
+import asuransi_module  # noqa: F401 (mendaftarkan snapshot asuransi_frame)
+from context_cache import get_or_build
+import dana_pensiun_module  # noqa: F401 (mendaftarkan snapshot dana_pensiun_frame)
+from executor import submit_to
+from komoditas_module import load_komoditas_data, load_komoditas_kabkota_data
+import perbankan_module  # noqa: F401 (mendaftarkan snapshot perbankan/umkm/konv_syariah)
+from sektor import sektor_utama
+
+logger = logging.getLogger(__name__)
+
+# Batas per query
+QUERY_TIME_BUDGET = float(os.environ.get("QUERY_TIME_BUDGET", "5"))
+QUERY_DEFAULT_LIMIT = int(os.environ.get("QUERY_DEFAULT_LIMIT", "1000"))
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "5000"))
+QUERY_MAX_GROUPS = int(os.environ.get("QUERY_MAX_GROUPS", "50000"))
+QUERY_MAX_FILTER_VALUES = int(os.environ.get("QUERY_MAX_FILTER_VALUES", "500"))
+
+# Interval muat ulang frame dataset di background (detik); tabel DB bisa diubah di luar aplikasi
+QUERY_FRAME_TTL = float(os.environ.get("QUERY_FRAME_TTL", "300"))
+
+QUERY_AGGS = ("sum", "mean", "median", "min", "max", "count", "nunique")
+QUERY_OPS = ("eq", "ne", "in", "gt", "gte", "lt", "lte")
+SPEC_KEYS = ("dataset", "filters", "group_by", "measures", "sort", "limit")
+
+
+def _kredit_lokasi_frame(data: tuple):
+    df = data[0][["Sektor", "Lokasi", "Kredit"]].copy()
+    df.insert(0, "Sektor Utama", df["Sektor"].map(sektor_utama))
+    return df
+
+
+# Dataset → sumber frame bersih, salah satu dari:
+# - snapshot: snapshot modul dashboard yang sudah berisi frame yang sama,
+# - source + derive: frame diturunkan dari snapshot modul dashboard,
+# - loader: loader sendiri (db=False kalau loader hanya membaca Excel),
+# lalu kolom dimensi (filter & group_by) dan kolom ukuran (filter &
+# agregasi). Nama dataset = nama di data_versions. Tabel yang sama tidak
+# dimuat dua kali untuk dashboard dan query.
+QUERY_DATASETS = {
+    "perbankan": dict(
+        snapshot="perbankan",
+        dimensions=("Negara", "Provinsi", "Tahun", "Bulan"),
+        measures=(
+            "Total Aset", "Giro", "Tabungan", "Deposito", "Total DPK",
+            "Modal Kerja", "Investasi", "Konsumsi", "Total Kredit",
+            "Nominal NPL Gross", "Rasio NPL Gross", "Nominal NPL Net", "Rasio NPL Net",
+            "Loan to Deposit Rastio (LDR)",
+        ),
+    ),
+    "umkm": dict(
+        snapshot="umkm",
+        dimensions=("Provinsi", "Tahun", "Bulan", "Jenis"),
+        measures=("Nominal Kredit", "Nominal NPL", "Nominal NPL Net", "Jumlah Rekening UMKM"),
+    ),
+    "konv_syariah": dict(
+        snapshot="konv_syariah",
+        dimensions=("Provinsi", "Kab/Kota", "Tahun", "Bulan", "Jenis Bank", "Skema"),
+        measures=("Aset", "Kredit", "DPK", "NPL"),
+    ),
+    "asuransi": dict(
+        snapshot="asuransi_frame",
+        dimensions=("Provinsi", "Kabupaten", "Jenis", "Tahun", "Quarter", "Periode"),
+        measures=("Premi", "Klaim", "Peserta Premi", "Peserta Klaim", "Polis Premi", "Polis Klaim"),
+    ),
+    "dana_pensiun": dict(
+        snapshot="dana_pensiun_frame",
+        dimensions=("Negara", "Provinsi", "Tahun", "Bulan"),
+        measures=("Aset", "Aset Neto", "Investasi", "Jumlah Dana Pensiun"),
+    ),
+    "kredit_lokasi": dict(
+        source="kredit_lokasi_data",
+        derive=_kredit_lokasi_frame,
+        dimensions=("Sektor Utama", "Sektor", "Lokasi"),
+        measures=("Kredit",),
+    ),
+    "komoditas": dict(
+        loader=load_komoditas_data,
+        db=False,
+        dimensions=("Provinsi", "Klasifikasi", "Tahun", "Komoditas", "Satuan"),
+        measures=("Nilai",),
+    ),
+    "komoditas_kabkota": dict(
+        loader=load_komoditas_kabkota_data,
+        db=False,
+        dimensions=("Komoditas", "Provinsi", "KabKota"),
+        measures=("Produksi", "LuasLahan"),
+    ),
+    "jumlah_petani": dict(
+        snapshot="jumlah_petani",
+        dimensions=("Komoditi", "Provinsi", "KabKota"),
+        measures=("JumlahPetani",),
+    ),
+}
+
+_norms = {}  # dataset → (frame, kolom_teks_ternormalisasi); diganti saat snapshot berganti
+
+
+class QueryError(ValueError):
+    """Spec query tidak valid (HTTP 400)."""
+
+
+class QueryTimeout(Exception):
+    """Query melewati QUERY_TIME_BUDGET (HTTP 503)."""
+
+
+# -------------------------------------------------
+# FRAME DATASET PER VERSI DATA
+# -------------------------------------------------
+def _frame_snapshot(name: str) -> str:
+    return QUERY_DATASETS[name].get("snapshot") or f"query.{name}"
+
+
+def _frame_builder(name: str):
+    def build():
+        start = time.perf_counter()
+        df = QUERY_DATASETS[name]["loader"]()
+        logger.info(f"📥 [QUERY] Frame {name} dimuat: {len(df)} baris ({time.perf_counter() - start:.1f} detik)")
+        return df
+    return build
+
+
+for _name, _spec in QUERY_DATASETS.items():
+    if "loader" in _spec:
+        snapshots.register(
+            f"query.{_name}", _frame_builder(_name), dataset=_name,
+            interval=QUERY_FRAME_TTL, db=_spec.get("db", True),
+        )
+    elif "derive" in _spec:
+        snapshots.register(f"query.{_name}", _spec["derive"], source=_spec["source"])
+
+
+def get_frame(name: str):
+    """
+    Snapshot frame bersih dataset `name`, plus dict kolom teks → nilai
+    ternormalisasi (diisi lazy saat difilter, dibuang saat frame berganti).
+    """
+    df = snapshots.get(_frame_snapshot(name))
+    cached = _norms.get(name)
+    if cached is None or cached[0] is not df:
+        cached = _norms[name] = (df, {})
+    return df, cached[1]
+
+
+# -------------------------------------------------
+# VALIDASI SPEC
+# -------------------------------------------------
+def _as_list(value, what: str) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        return [value]
+    if isinstance(value, list):
+        return value
+    raise QueryError(f"{what} harus string atau list")
+
+
+def _check_scalar(value, what: str):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise QueryError(f"nilai {what} harus string atau angka")
+    return value
+
+
+def parse_spec(spec) -> dict:
+    """Validasi & normalisasi spec; hasilnya dipakai juga sebagai kunci cache."""
+    if not isinstance(spec, dict):
+        raise QueryError("spec harus objek JSON")
+    unknown = sorted(set(spec) - set(SPEC_KEYS))
+    if unknown:
+        raise QueryError(f"key spec tidak dikenal: {unknown}")
+
+    dataset = spec.get("dataset")
+    if dataset not in QUERY_DATASETS:
+        raise QueryError(f"dataset '{dataset}' tidak dikenal, pilih salah satu: {list(QUERY_DATASETS)}")
+    dims = QUERY_DATASETS[dataset]["dimensions"]
+    columns = dims + QUERY_DATASETS[dataset]["measures"]
+
+    filters = spec.get("filters") or {}
+    if not isinstance(filters, dict):
+        raise QueryError("filters harus objek kolom → kondisi")
+    norm_filters = []
+    for col in sorted(filters):
+        if col not in columns:
+            raise QueryError(f"kolom filter '{col}' tidak ada di dataset {dataset}")
+        cond = filters[col]
+        if not isinstance(cond, dict):
+            cond = {"in": cond} if isinstance(cond, list) else {"eq": cond}
+        for op in sorted(cond):
+            if op not in QUERY_OPS:
+                raise QueryError(f"operator '{op}' tidak dikenal, pilih salah satu: {list(QUERY_OPS)}")
+            value = cond[op]
+            if op == "in":
+                if not isinstance(value, list) or not value:
+                    raise QueryError(f"filter {col}.in harus list tidak kosong")
+                if len(value) > QUERY_MAX_FILTER_VALUES:
+                    raise QueryError(f"filter {col}.in maksimal {QUERY_MAX_FILTER_VALUES} nilai")
+                value = [_check_scalar(v, f"filter {col}") for v in value]
+            else:
+                _check_scalar(value, f"filter {col}")
+                if op in ("gt", "gte", "lt", "lte") and isinstance(value, str):
+                    raise QueryError(f"filter {col}.{op} harus angka")
+            norm_filters.append((col, op, value))
+
+    group_by = _as_list(spec.get("group_by"), "group_by")
+    for col in group_by:
+        if col not in dims:
+            raise QueryError(f"group_by '{col}' bukan dimensi dataset {dataset}: {list(dims)}")
+    if len(set(group_by)) != len(group_by):
+        raise QueryError("group_by tidak boleh berisi kolom ganda")
+
+    measures = []
+    for m in _as_list(spec.get("measures"), "measures"):
+        if isinstance(m, str):
+            m = {"column": m}
+        if not isinstance(m, dict):
+            raise QueryError("measure harus string atau objek {column, agg, as}")
+        agg = m.get("agg", "sum")
+        col = m.get("column")
+        if agg not in QUERY_AGGS:
+            raise QueryError(f"agg '{agg}' tidak dikenal, pilih salah satu: {list(QUERY_AGGS)}")
+        if col is None:
+            if agg != "count":
+                raise QueryError(f"measure dengan agg '{agg}' butuh column")
+        elif col not in columns or (agg not in ("count", "nunique") and col not in QUERY_DATASETS[dataset]["measures"]):
+            raise QueryError(f"kolom measure '{col}' tidak bisa di-{agg} di dataset {dataset}")
+        alias = m.get("as") or (col if agg == "sum" else f"{agg}_{col}" if col else "count")
+        measures.append((alias, col, agg))
+    if not measures:
+        measures = [("count", None, "count")]
+    aliases = list(group_by) + [a for a, _, _ in measures]
+    if len(set(aliases)) != len(aliases):
+        raise QueryError("nama kolom hasil (group_by + measures.as) tidak boleh ganda")
+
+    sort = []
+    for s in _as_list(spec.get("sort"), "sort"):
+        if not isinstance(s, str) or not s.lstrip("-"):
+            raise QueryError("sort harus nama kolom hasil, awalan '-' untuk menurun")
+        col = s.lstrip("-")
+        if col not in aliases:
+            raise QueryError(f"sort '{col}' bukan kolom hasil: {aliases}")
+        sort.append((col, not s.startswith("-")))
+
+    limit = spec.get("limit", QUERY_DEFAULT_LIMIT)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise QueryError("limit harus bilangan bulat positif")
+    if limit > QUERY_MAX_ROWS:
+        raise QueryError(f"limit maksimal {QUERY_MAX_ROWS} baris")
+
+    return dict(
+        dataset=dataset,
+        filters=norm_filters,
+        group_by=group_by,
+        measures=measures,
+        sort=sort,
+        limit=limit,
+    )
+
+
+# -------------------------------------------------
+# EKSEKUSI
+# -------------------------------------------------
+def _check_deadline(deadline: float, stage: str):
+    if time.monotonic() > deadline:
+        raise QueryTimeout(f"query melewati batas waktu {QUERY_TIME_BUDGET:g} detik ({stage})")
+
+
+def _normalized(df: pd.DataFrame, norm: dict, col: str) -> pd.Series:
+    """Kolom teks versi lower/strip, dihitung sekali per frame."""
+    s = norm.get(col)
+    if s is None:
+        s = df[col].astype(str).str.strip().str.lower()
+        norm[col] = s
+    return s
+
+
+def _filter_mask(df: pd.DataFrame, norm: dict, col: str, op: str, value) -> np.ndarray:
+    s = df[col]
+    if s.dtype == object:
+        s = _normalized(df, norm, col)
+        value = [str(v).strip().lower() for v in value] if op == "in" else (
+            str(value).strip().lower() if op in ("eq", "ne") else value
+        )
+    elif op in ("eq", "ne", "in"):
+        try:
+            value = [float(v) for v in value] if op == "in" else float(value)
+        except ValueError:
+            raise QueryError(f"filter {col} harus angka")
+
+    if op == "eq":
+        return (s == value).to_numpy()
+    if op == "ne":
+        return (s != value).to_numpy()
+    if op == "in":
+        return s.isin(value).to_numpy()
+    if s.dtype == object:
+        raise QueryError(f"filter {col}.{op} hanya untuk kolom angka")
+    return {"gt": s > value, "gte": s >= value, "lt": s < value, "lte": s <= value}[op].to_numpy()
+
+
+def execute_query(q: dict, deadline: float) -> dict:
+    """Jalankan spec ternormalisasi (parse_spec) atas frame dataset."""
+    df, norm = get_frame(q["dataset"])
+    _check_deadline(deadline, "memuat dataset")
+
+    used = set(q["group_by"]) | {c for _, c, _ in q["measures"] if c} | {c for c, _, _ in q["filters"]}
+    missing = sorted(used - set(df.columns))
+    if missing:
+        raise QueryError(f"kolom {missing} tidak tersedia di data {q['dataset']} saat ini")
+
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, value in q["filters"]:
+        mask &= _filter_mask(df, norm, col, op, value)
+    sub = df.loc[mask, sorted(used)] if used else df.loc[mask, []]
+    _check_deadline(deadline, "filter")
+
+    if q["group_by"]:
+        grouped = sub.groupby(q["group_by"], sort=True, dropna=False)
+        if grouped.ngroups > QUERY_MAX_GROUPS:
+            raise QueryError(f"hasil {grouped.ngroups} grup melebihi batas {QUERY_MAX_GROUPS}")
+        out = grouped.agg(**{
+            alias: (col or q["group_by"][0], "size" if col is None else agg)
+            for alias, col, agg in q["measures"]
+        }).reset_index()
+    else:
+        out = pd.DataFrame([{
+            alias: len(sub) if col is None else sub[col].agg(agg)
+            for alias, col, agg in q["measures"]
+        }])
+    _check_deadline(deadline, "agregasi")
+
+    if q["sort"]:
+        out = out.sort_values(
+            [c for c, _ in q["sort"]], ascending=[a for _, a in q["sort"]],
+            kind="stable", na_position="last",
+        )
+    total = len(out)
+    out = out.head(q["limit"])
+
+    return dict(
+        dataset=q["dataset"],
+        columns=list(out.columns),
+        rows=out.to_numpy(dtype=object).tolist(),
+        row_count=len(out),
+        total_rows=total,
+        truncated=total > len(out),
+        matched_rows=int(mask.sum()),
+    )
+
+
+def run_query(spec) -> dict:
+    """
+    Validasi spec lalu jalankan (atau ambil dari cache) di thread pool
+    "query" dengan batas waktu QUERY_TIME_BUDGET.
+    """
+    q = parse_spec(spec)
+    version = snapshots.served_version(q["dataset"])
+    key = ("query", json.dumps(q, sort_keys=True, default=str), version)
+    deadline = time.monotonic() + QUERY_TIME_BUDGET
+
+    future = submit_to("query", get_or_build, key, lambda: execute_query(q, deadline))
+    try:
+        result = future.result(timeout=QUERY_TIME_BUDGET)
+    except FutureTimeoutError:
+        logger.warning(f"⏱️  [QUERY] {q['dataset']} melewati batas waktu {QUERY_TIME_BUDGET:g} detik")
+        raise QueryTimeout(f"query melewati batas waktu {QUERY_TIME_BUDGET:g} detik")
+    return dict(result, version=str(version))
+
+
+def query_catalog() -> dict:
+    """Daftar dataset, kolom dan batas yang bisa dipakai di spec."""
+    return dict(
+        datasets={
+            name: dict(dimensions=list(d["dimensions"]), measures=list(d["measures"]))
+            for name, d in QUERY_DATASETS.items()
+        },
+        aggs=list(QUERY_AGGS),
+        operators=list(QUERY_OPS),
+        limits=dict(
+            default_limit=QUERY_DEFAULT_LIMIT,
+            max_rows=QUERY_MAX_ROWS,
+            max_groups=QUERY_MAX_GROUPS,
+            time_budget_seconds=QUERY_TIME_BUDGET,
+        ),
+    )
@@ -0,0 +1,335 @@
+# regions.py
+"""
+Dimensi wilayah kanonik (provinsi → kab/kota) dengan ID integer stabil.
+
+Semua dataset menulis nama wilayah dengan ejaan berbeda-beda
+("SUMATERA SELATAN", "Sumatera Selatan", "SUMSEL", "Kab. Lematang Ilir
+Ogan Tengah (Muara Enim)", "Muara Enim", ...). Modul ini memetakan setiap
+varian ke kode wilayah Kemendagri:
+
+    provinsi  → 2 digit  (16 = Sumatera Selatan)
+    kab/kota  → 4 digit  (1603 = Muara Enim, 1671 = Kota Palembang)
+    "All <provinsi>" → kode provinsi × 100 (1600 = seluruh Sumatera Selatan)
+
+Pemetaan dilakukan SEKALI saat load lewat `add_region_ids`, sehingga filter
+di request cukup membandingkan integer (`df["prov_id"] == region_id(...)`).
+Nama yang tidak dikenal tetap mendapat ID stabil (hash dari nama yang sudah
+dinormalisasi) supaya filter tetap konsisten.
+"""
+import re
+import zlib
+from functools import lru_cache
+
+import pandas as pd
+
+# -------------------------------------------------
+# TABEL KANONIK
+# -------------------------------------------------
+NASIONAL_ID = 0
+SUMBAGSEL_ID = 90  # agregat regional Sumatera Bagian Selatan (bukan provinsi)
+SUMSEL_ID = 16
+
+# ID untuk nama yang tidak dikenal: UNKNOWN_BASE + crc32(nama) % 10^8
+UNKNOWN_BASE = 100_000_000
+
+PROVINSI = {
+    11: "ACEH",
+    12: "SUMATERA UTARA",
+    13: "SUMATERA BARAT",
+    14: "RIAU",
+    15: "JAMBI",
+    16: "SUMATERA SELATAN",
+    17: "BENGKULU",
+    18: "LAMPUNG",
+    19: "KEPULAUAN BANGKA BELITUNG",
+    21: "KEPULAUAN RIAU",
+    31: "DKI JAKARTA",
+    32: "JAWA BARAT",
+    33: "JAWA TENGAH",
+    34: "DI YOGYAKARTA",
+    35: "JAWA TIMUR",
+    36: "BANTEN",
+    51: "BALI",
+    52: "NUSA TENGGARA BARAT",
+    53: "NUSA TENGGARA TIMUR",
+    61: "KALIMANTAN BARAT",
+    62: "KALIMANTAN TENGAH",
+    63: "KALIMANTAN SELATAN",
+    64: "KALIMANTAN TIMUR",
+    65: "KALIMANTAN UTARA",
+    71: "SULAWESI UTARA",
+    72: "SULAWESI TENGAH",
+    73: "SULAWESI SELATAN",
+    74: "SULAWESI TENGGARA",
+    75: "GORONTALO",
+    76: "SULAWESI BARAT",
+    81: "MALUKU",
+    82: "MALUKU UTARA",
+    91: "PAPUA",
+    92: "PAPUA BARAT",
+    SUMBAGSEL_ID: "SUMBAGSEL",
+    NASIONAL_ID: "INDONESIA",
+}
+
+# Kab/Kota wilayah kerja (Sumbagsel). Kota diberi awalan "KOTA".
+KABKOTA = {
+    # Jambi
+    1501: "KERINCI",
+    1502: "MERANGIN",
+    1503: "SAROLANGUN",
+    1504: "BATANGHARI",
+    1505: "MUARO JAMBI",
+    1506: "TANJUNG JABUNG TIMUR",
+    1507: "TANJUNG JABUNG BARAT",
+    1508: "TEBO",
+    1509: "BUNGO",
+    1571: "KOTA JAMBI",
+    1572: "KOTA SUNGAI PENUH",
+    # Sumatera Selatan
+    1601: "OGAN KOMERING ULU",
+    1602: "OGAN KOMERING ILIR",
+    1603: "MUARA ENIM",
+    1604: "LAHAT",
+    1605: "MUSI RAWAS",
+    1606: "MUSI BANYUASIN",
+    1607: "BANYUASIN",
+    1608: "OGAN KOMERING ULU SELATAN",
+    1609: "OGAN KOMERING ULU TIMUR",
+    1610: "OGAN ILIR",
+    1611: "EMPAT LAWANG",
+    1612: "PENUKAL ABAB LEMATANG ILIR",
+    1613: "MUSI RAWAS UTARA",
+    1671: "KOTA PALEMBANG",
+    1672: "KOTA PRABUMULIH",
+    1673: "KOTA PAGAR ALAM",
+    1674: "KOTA LUBUKLINGGAU",
+    # Bengkulu
+    1701: "BENGKULU SELATAN",
+    1702: "REJANG LEBONG",
+    1703: "BENGKULU UTARA",
+    1704: "KAUR",
+    1705: "SELUMA",
+    1706: "MUKOMUKO",
+    1707: "LEBONG",
+    1708: "KEPAHIANG",
+    1709: "BENGKULU TENGAH",
+    1771: "KOTA BENGKULU",
+    # Lampung
+    1801: "LAMPUNG BARAT",
+    1802: "TANGGAMUS",
+    1803: "LAMPUNG SELATAN",
+    1804: "LAMPUNG TIMUR",
+    1805: "LAMPUNG TENGAH",
+    1806: "LAMPUNG UTARA",
+    1807: "WAY KANAN",
+    1808: "TULANG BAWANG",
+    1809: "PESAWARAN",
+    1810: "PRINGSEWU",
+    1811: "MESUJI",
+    1812: "TULANG BAWANG BARAT",
+    1813: "PESISIR BARAT",
+    1871: "KOTA BANDAR LAMPUNG",
+    1872: "KOTA METRO",
+    # Kepulauan Bangka Belitung
+    1901: "BANGKA",
+    1902: "BELITUNG",
+    1903: "BANGKA SELATAN",
+    1904: "BANGKA TENGAH",
+    1905: "BANGKA BARAT",
+    1906: "BELITUNG TIMUR",
+    1971: "KOTA PANGKAL PINANG",
+}
+
+# Varian ejaan yang tidak bisa diturunkan dari normalisasi biasa
+PROVINSI_ALIASES = {
+    "SUMSEL": 16,
+    "SUMATERASELATAN": 16,
+    "SUMATRA SELATAN": 16,
+    "KEP BANGKA BELITUNG": 19,
+    "KEPBANGKA BELITUNG": 19,
+    "BANGKA BELITUNG": 19,
+    "BABEL": 19,
+    "KEP RIAU": 21,
+    "DAERAH ISTIMEWA YOGYAKARTA": 34,
+    "NASIONAL": NASIONAL_ID,
+}
+
+KABKOTA_ALIASES = {
+    "OKU": 1601,
+    "OKI": 1602,
+    "LEMATANG ILIR OGAN TENGAH MUARA ENIM": 1603,
+    "LEMATANG ILIR OGAN TENGAH": 1603,
+    "OKU SELATAN": 1608,
+    "OKU TIMUR": 1609,
+    "PALI": 1612,
+    "MURATARA": 1613,
+    "LUBUK LINGGAU": 1674,
+    "PAGARALAM": 1673,
+    "TULANGBAWANG": 1808,
+    "TULANGBAWANG BARAT": 1812,
+    "PANGKALPINANG": 1971,
+    "MUKO MUKO": 1706,
+}
+
+_PUNCT_RE = re.compile(r"[.,()/\-]+")
+_SPACE_RE = re.compile(r"\s+")
+_KAB_PREFIX_RE = re.compile(r"^(KABUPATEN|KAB)\s+")
+_KOTA_PREFIX_RE = re.compile(r"^KOTA\s+")
+_ALL_PREFIX_RE = re.compile(r"^(ALL|SEMUA|TOTAL)\s+")
+
+
+def normalize_name(name) -> str:
+    """Nama wilayah → kunci pembanding: huruf besar, tanpa tanda baca & spasi ganda."""
+    if name is None or (isinstance(name, float) and pd.isna(name)):
+        return ""
+    s = str(name).replace("\xa0", " ").upper()
+    s = _PUNCT_RE.sub(" ", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+def _build_index(names: dict, aliases: dict) -> dict:
+    index = {}
+    for code, nm in names.items():
+        key = normalize_name(nm)
+        index[key] = code
+        index[key.replace(" ", "")] = code
+    for alias, code in aliases.items():
+        index[normalize_name(alias)] = code
+    return index
+
+
+_PROV_INDEX = _build_index(PROVINSI, PROVINSI_ALIASES)
+_KAB_INDEX = _build_index(KABKOTA, KABKOTA_ALIASES)
+# Kota juga bisa ditulis tanpa awalan "Kota" (mis. "Palembang", "Metro")
+for _code, _nm in KABKOTA.items():
+    if _nm.startswith("KOTA "):
+        _KAB_INDEX.setdefault(_nm[len("KOTA "):], _code)
+
+
+def _unknown_id(key: str) -> int:
+    return UNKNOWN_BASE + zlib.crc32(key.encode("utf-8")) % 100_000_000
+
+
+# -------------------------------------------------
+# LOOKUP SKALAR
+# -------------------------------------------------
+@lru_cache(maxsize=4096)
+def province_id(name) -> int | None:
+    """ID provinsi untuk satu nama (varian ejaan apa pun). None kalau kosong."""
+    key = normalize_name(name)
+    if not key or key in ("NAN", "NONE"):
+        return None
+    if key in _PROV_INDEX:
+        return _PROV_INDEX[key]
+    compact = key.replace(" ", "")
+    if compact in _PROV_INDEX:
+        return _PROV_INDEX[compact]
+    return _unknown_id("P:" + key)
+
+
+@lru_cache(maxsize=4096)
+def kabkota_id(name) -> int | None:
+    """
+    ID kab/kota untuk satu nama. Baris agregat "All <provinsi>" dipetakan ke
+    kode provinsi × 100 (mis. "All Sumatera Selatan" → 1600).
+    """
+    key = normalize_name(name)
+    if not key or key in ("NAN", "NONE"):
+        return None
+
+    m = _ALL_PREFIX_RE.match(key)
+    if m:
+        prov = province_id(key[m.end():])
+        if prov is not None and prov < UNKNOWN_BASE:
+            return prov * 100
+        return _unknown_id("K:" + key)
+
+    candidates = [key]
+    stripped = _KAB_PREFIX_RE.sub("", key)
+    if stripped != key:
+        candidates.append(stripped)
+    elif _KOTA_PREFIX_RE.match(key):
+        candidates.append(_KOTA_PREFIX_RE.sub("", key))
+
+    for cand in candidates:
+        if cand in _KAB_INDEX:
+            return _KAB_INDEX[cand]
+        compact = cand.replace(" ", "")
+        if compact in _KAB_INDEX:
+            return _KAB_INDEX[compact]
+    return _unknown_id("K:" + stripped)
+
+
+def region_id(name) -> int | None:
+    """Alias `province_id` — dipakai untuk filter provinsi dari query string."""
+    return province_id(name)
+
+
+def province_name(pid: int | None) -> str | None:
+    """Nama kanonik (huruf besar) untuk ID provinsi, None kalau tidak dikenal."""
+    if pid is None:
+        return None
+    return PROVINSI.get(int(pid))
+
+
+def canonical_province(name) -> str | None:
+    """Nama provinsi kanonik; kalau tidak dikenal, kembalikan nama asli yang dirapikan."""
+    pid = province_id(name)
+    if pid is None:
+        return None
+    return PROVINSI.get(pid) or normalize_name(name)
+
+
+def province_of(kab_id: int | None) -> int | None:
+    """Provinsi induk dari ID kab/kota (kode Kemendagri: 2 digit pertama)."""
+    if kab_id is None or kab_id >= UNKNOWN_BASE:
+        return None
+    return int(kab_id) // 100
+
+
+# -------------------------------------------------
+# PEMETAAN KOLOM (SEKALI SAAT LOAD)
+# -------------------------------------------------
+def _map_unique(series: pd.Series, fn) -> pd.Series:
+    """Terapkan fn per nilai unik saja, lalu sebar kembali ke seluruh baris."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if len(uniques) == 0:  # kolom kosong / seluruhnya NaN
+        return pd.Series(-1, index=series.index, dtype="int64")
+    ids = [fn(u) for u in uniques]
+    ids = [-1 if v is None else v for v in ids]
+    mapped = pd.Series(ids, dtype="int64").take(codes.clip(min=0)).to_numpy()
+    mapped[codes < 0] = -1
+    return pd.Series(mapped, index=series.index, dtype="int64")
+
+
+def add_region_ids(
+    df: pd.DataFrame,
+    prov_col: str | None = "Provinsi",
+    kab_col: str | None = None,
+) -> pd.DataFrame:
+    """
+    Tambahkan kolom `prov_id` (dan `kab_id` kalau kab_col diberikan) ke df.
+    Nilai kosong → -1. Dipanggil sekali di loader, bukan per request.
+    """
+    if prov_col and prov_col in df.columns:
+        df["prov_id"] = _map_unique(df[prov_col], province_id)
+    if kab_col and kab_col in df.columns:
+        df["kab_id"] = _map_unique(df[kab_col], kabkota_id)
+        if "prov_id" not in df.columns:
+            df["prov_id"] = df["kab_id"].map(
+                lambda k: province_of(k) if k >= 0 else -1
+            ).fillna(-1).astype("int64")
+    return df
+
+
+def filter_region(
+    df: pd.DataFrame,
+    provinsi: str | None = None,
+    kabkota: str | None = None,
+) -> pd.DataFrame:
+    """Filter df berdasarkan nama provinsi/kab-kota lewat perbandingan ID integer."""
+    if provinsi and "prov_id" in df.columns:
+        df = df[df["prov_id"] == province_id(provinsi)]
+    if kabkota and "kab_id" in df.columns:
+        df = df[df["kab_id"] == kabkota_id(kabkota)]
+    return df
@@ -0,0 +1,128 @@
+# sektor.py
+"""
+Hierarki sektor ekonomi untuk data kredit lokasi.
+
+File "Kredit Lok Bank - Sub Sektor" hanya berisi sub-sektor KBLI (±480 baris,
+mis. "PERKEBUNAN BUAH KELAPA SAWIT", "KONSTRUKSI JALAN TOL"). Modul ini
+memetakan setiap sub-sektor ke sektor utama (kategori KBLI) lewat awalan
+nama; awalan terpanjang yang cocok menang. Nama yang tidak dikenali masuk
+ke SEKTOR_LAINNYA.
+"""
+import re
+from functools import lru_cache
+
+SEKTOR_LAINNYA = "LAINNYA"
+
+# Sektor utama → awalan nama sub-sektor
+SEKTOR_UTAMA = {
+    "PERTANIAN, KEHUTANAN DAN PERIKANAN": (
+        "PERTANIAN", "PERKEBUNAN", "PETERNAKAN", "PEMBIBITAN", "BUDIDAYA",
+        "PEMBENIHAN", "PENANGKAPAN", "PERIKANAN", "PERBURUAN", "PENCETAKAN LAHAN",
+        "JASA BUDIDAYA", "JASA PENANGKAPAN", "JASA PENUNJANG PERTANIAN",
+        "JASA PENUNJANG KEHUTANAN", "PENGUSAHAAN HUTAN", "PENGUSAHAAN HASIL HUTAN",
+        "PENGUSAHAAN PEMBIBITAN TANAMAN KEHUTANAN", "USAHA KEHUTANAN",
+    ),
+    "PERTAMBANGAN DAN PENGGALIAN": (
+        "PERTAMBANGAN", "PERTAMBNGAN", "PENGGALIAN", "EKSTRAKSI", "PENGUSAHAAN TENAGA PANAS BUMI",
+        "AKTIVITAS PENUNJANG PERTAMBANGAN",
+    ),
+    "INDUSTRI PENGOLAHAN": (
+        "INDUSTRI", "REPRODUKSI MEDIA REKAMAN", "REPARASI DAN PEMASANGAN MESIN",
+    ),
+    "PENGADAAN LISTRIK, GAS, UAP/AIR PANAS DAN UDARA DINGIN": (
+        "PENGADAAN", "KETENAGALISTRIKAN",
+    ),
+    "PENGELOLAAN AIR, PENGELOLAAN AIR LIMBAH, PENGELOLAAN DAN DAUR ULANG SAMPAH, DAN AKTIVITAS REMEDIASI": (
+        "PENGELOLAAN", "AKTIVITAS REMEDIASI",
+    ),
+    "KONSTRUKSI": (
+        "KONSTRUKSI", "INSTALASI", "PENYELESAIAN KONSTRUKSI", "PENYEWAAN ALAT KONSTRUKSI",
+        "PENYIAPAN",
+    ),
+    "PERDAGANGAN BESAR DAN ECERAN; REPARASI DAN PERAWATAN MOBIL DAN SEPEDA MOTOR": (
+        "PERDAGANGAN", "REPARASI DAN PERAWATAN",
+    ),
+    "PENGANGKUTAN DAN PERGUDANGAN": (
+        "PENGANGKUTAN", "ANGKUTAN", "PERGUDANGAN", "AKTIVITAS PENUNJANG ANGKUTAN",
+        "AKTIVITAS POS DAN KURIR",
+    ),
+    "PENYEDIAAN AKOMODASI DAN PENYEDIAAN MAKAN MINUM": (
+        "PENYEDIAAN AKOMODASI", "PENYEDIAAN MAKANAN", "HOTEL", "RESTORAN",
+    ),
+    "INFORMASI DAN KOMUNIKASI": (
+        "INFORMASI DAN KOMUNIKASI", "TELEKOMUNIKASI", "AKTIVITAS TELEKOMUNIKASI",
+        "AKTIVITAS PENERBITAN", "AKTIVITAS PENYIARAN", "AKTIVITAS PRODUKSI GAMBAR",
+        "AKTIVITAS PEREKAMAN", "AKTIVITAS PEMROGRAMAN", "AKTIVITAS KONSULTASI KOMPUTER",
+        "AKTIVITAS HOSTING", "AKTIVITAS PENGOLAHAN DATA", "AKTIVITAS JASA INFORMASI",
+        "AKTIVITAS KANTOR BERITA", "PORTAL WEB", "JASA NILAI TAMBAH TELEPONI",
+    ),
+    "AKTIVITAS KEUANGAN DAN ASURANSI": (
+        "AKTIVITAS KEUANGAN", "PERANTARA MONETER", "ASURANSI", "AKTIVITAS JASA KEUANGAN",
+        "AKTIVITAS PENUNJANG JASA KEUANGAN", "AKTIVITAS PENUNJANG ASURANSI",
+        "KEGIATAN PENUKARAN VALUTA", "SEWA GUNA USAHA DENGAN HAK OPSI",
+    ),
+    "REAL ESTAT": (
+        "REAL ESTAT", "KAWASAN INDUSTRI", "KAWASAN PARIWISATA",
+    ),
+    "AKTIVITAS PROFESIONAL, ILMIAH DAN TEKNIS": (
+        "AKTIVITAS PROFESIONAL", "AKTIVITAS HUKUM", "AKTIVITAS ARSITEKTUR",
+        "AKTIVITAS KONSULTASI MANAJEMEN", "AKTIVITAS KONSULTASI PARIWISATA",
+        "AKTIVITAS KESEHATAN HEWAN", "PENELITIAN", "PERIKLANAN",
+    ),
+    "AKTIVITAS PENYEWAAN DAN SEWA GUNA USAHA TANPA HAK OPSI, KETENAGAKERJAAN, AGEN PERJALANAN DAN PENUNJANG USAHA LAINNYA": (
+        "AKTIVITAS PENYEWAAN", "AKTIVITAS KETENAGAKERJAAN", "AKTIVITAS AGEN PERJALANAN",
+        "AKTIVITAS BIRO PERJALANAN", "JASA RESERVASI", "AKTIVITAS JASA PENUNJANG USAHA",
+        "PENYELENGGARA KONVENSI",
+    ),
+    "ADMINISTRASI PEMERINTAHAN, PERTAHANAN DAN JAMINAN SOSIAL WAJIB": (
+        "ADMINISTRASI PEMERINTAHAN", "PENYEDIAAN LAYANAN UNTUK MASYARAKAT", "JAMINAN SOSIAL WAJIB",
+    ),
+    "PENDIDIKAN": (
+        "PENDIDIKAN", "KEGIATAN PENUNJANG PENDIDIKAN",
+    ),
+    "AKTIVITAS KESEHATAN MANUSIA DAN AKTIVITAS SOSIAL": (
+        "AKTIVITAS KESEHATAN MANUSIA", "AKTIVITAS RUMAH SAKIT", "AKTIVITAS PRAKTIK DOKTER",
+        "AKTIVITAS PELAYANAN KESEHATAN", "AKTIVITAS SOSIAL",
+    ),
+    "KESENIAN, HIBURAN DAN REKREASI": (
+        "KESENIAN", "AKTIVITAS HIBURAN", "AKTIVITAS OLAHRAGA", "MUSEUM", "PERPUSTAKAAN",
+        "JASA IMPRESARIAT",
+    ),
+    "AKTIVITAS JASA LAINNYA": (
+        "AKTIVITAS JASA LAINNYA", "AKTIVITAS JASA PERORANGAN", "AKTIVITAS ORGANISASI",
+        "AKTIVITAS PANTI PIJAT", "REPARASI KOMPUTER",
+    ),
+    "AKTIVITAS RUMAH TANGGA SEBAGAI PEMBERI KERJA": (
+        "AKTIVITAS RUMAH TANGGA",
+    ),
+    "AKTIVITAS BADAN INTERNASIONAL DAN BADAN EKSTRA INTERNASIONAL LAINNYA": (
+        "AKTIVITAS BADAN INTERNASIONAL",
+    ),
+    "RUMAH TANGGA": (
+        "RUMAH TANGGA",
+    ),
+    "BUKAN LAPANGAN USAHA": (
+        "BUKAN LAPANGAN USAHA",
+    ),
+}
+
+# (awalan, sektor utama), awalan terpanjang dicoba lebih dulu
+_PREFIXES = sorted(
+    ((prefix, sektor) for sektor, prefixes in SEKTOR_UTAMA.items() for prefix in prefixes),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+
+
+def normalize_sektor(name) -> str:
+    return re.sub(r"\s+", " ", str(name or "")).strip().upper()
+
+
+@lru_cache(maxsize=4096)
+def sektor_utama(name) -> str:
+    """Sektor utama (kategori KBLI) dari nama sub-sektor."""
+    key = normalize_sektor(name)
+    for prefix, sektor in _PREFIXES:
+        if key.startswith(prefix):
+            return sektor
+    return SEKTOR_LAINNYA
@@ -0,0 +1,30 @@
+# serialization.py
+"""Konversi nilai context dashboard (numpy/pandas) ke tipe JSON standar."""
+import datetime as dt
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def to_jsonable(obj):
+    """Ubah nilai numpy/pandas di context menjadi tipe JSON standar (NaN → null)."""
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return [to_jsonable(v) for v in obj.tolist()]
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, (pd.Timestamp, dt.date, dt.datetime)):
+        return obj.isoformat()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.DataFrame):
+        return to_jsonable(obj.to_dict(orient="records"))
+    if isinstance(obj, pd.Series):
+        return to_jsonable(obj.tolist())
+    return obj
@@ -5,22 +5,27 @@ Melayani data untuk kwd-dashboard frontend
 
 import os
 import json
+import threading
 import pandas as pd
-from flask import Flask, render_template, request, jsonify, redirect
+from flask import Flask, Response, render_template, request, jsonify, redirect, send_file
 from datetime import datetime
-from functools import lru_cache
+
+from compression import init_compression
+from executor import submit
+from file_cache import file_cached
 
 app = Flask(__name__, 
             template_folder=os.path.join(os.path.dirname(__file__), 'kwd-dashboard', 'dist'),
             static_folder=os.path.join(os.path.dirname(__file__), 'kwd-dashboard', 'dist'),
             static_url_path='')
+init_compression(app)
 
 # -------------------------------------------------
 # KONFIGURASI FILE EXCEL
 # -------------------------------------------------
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "KINERJA PERBANKAN.xlsx")
 
-@lru_cache(maxsize=1)
+@file_cached(DATA_PATH)
 def load_data():
     """Load data utama dari sheet SUMMARY"""
     df = pd.read_excel(DATA_PATH, sheet_name="SUMMARY")
@@ -75,7 +80,7 @@ def load_data():
     return df
 
 
-@lru_cache(maxsize=1)
+@file_cached(DATA_PATH)
 def load_umkm_data():
     """Load data UMKM"""
     df = pd.read_excel(DATA_PATH, sheet_name="PERBANKAN - Per Jenis Usaha")
@@ -563,13 +568,60 @@ def get_dashboard_data():
         return jsonify({"error": str(e)}), 500
 
 
+# -------------------------------------------------
+# CACHE HALAMAN HTML (index.html, keuangan.html)
+# -------------------------------------------------
+# Isi file disimpan di memori dan divalidasi ulang lewat mtime/ukuran setiap
+# request (satu os.stat). File yang belum ada di cache dikirim lewat send_file
+# (file wrapper WSGI) sementara cache diisi di thread loader.
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", str(2 * 1024 * 1024)))
+
+_page_cache = {}  # path → (mtime_ns, size, body)
+_page_cache_lock = threading.Lock()
+
+
+def _page_etag(st) -> str:
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _fill_page_cache(path, st):
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+    except OSError:
+        return
+    # Hanya disimpan kalau file tidak berubah selama dibaca
+    if len(body) == st.st_size:
+        with _page_cache_lock:
+            _page_cache[path] = (st.st_mtime_ns, st.st_size, body)
+
+
+def serve_page(path):
+    """Kirim file HTML dengan ETag/Last-Modified + dukungan conditional GET."""
+    st = os.stat(path)
+    etag = _page_etag(st)
+
+    with _page_cache_lock:
+        entry = _page_cache.get(path)
+    if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+        response = Response(entry[2], mimetype="text/html")
+        response.set_etag(etag)
+        response.last_modified = st.st_mtime
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    response = send_file(path, mimetype="text/html", etag=etag, last_modified=st.st_mtime, max_age=None)
+    if st.st_size <= PAGE_CACHE_MAX_BYTES:
+        submit(_fill_page_cache, path, st)
+    return response.make_conditional(request)
+
+
 @app.route("/")
 def index():
     """Serve landing page"""
     landing_path = os.path.join(os.path.dirname(__file__), 'index.html')
     if os.path.exists(landing_path):
-        with open(landing_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return serve_page(landing_path)
     return redirect('/keuangan')
 
 
@@ -579,14 +631,12 @@ def keuangan():
     # Serve the built HTML from kwd-dashboard dist folder
     keuangan_path = os.path.join(os.path.dirname(__file__), 'kwd-dashboard', 'dist', 'keuangan.html')
     if os.path.exists(keuangan_path):
-        with open(keuangan_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return serve_page(keuangan_path)
     
     # Fallback to standalone if dist doesn't exist
     keuangan_fallback = os.path.join(os.path.dirname(__file__), 'kwd-dashboard', 'src', 'html', 'keuangan-standalone.html')
     if os.path.exists(keuangan_fallback):
-        with open(keuangan_fallback, 'r', encoding='utf-8') as f:
-            return f.read()
+        return serve_page(keuangan_fallback)
     
     return "File keuangan.html tidak ditemukan", 404
 
@@ -0,0 +1,93 @@
+# single_flight.py
+"""
+Single-flight antar worker untuk snapshot dataset.
+
+Di dalam satu proses, snapshots.get / refresh sudah menjamin hanya satu
+builder per snapshot yang berjalan (lock per nama), jadi modul ini hanya
+menangani antar proses: opsional (SINGLE_FLIGHT_ADVISORY_LOCK=1)
+snapshots._build mengambil PostgreSQL advisory lock per snapshot, sehingga
+antar worker gunicorn hanya satu yang memuat snapshot yang sama pada satu
+waktu. Hasil tidak dibagi antar proses; worker berikutnya memuat setelah
+lock dilepas. Kalau DB tidak bisa dihubungi atau lock tidak didapat dalam
+SINGLE_FLIGHT_LOCK_TIMEOUT detik, builder tetap dijalankan tanpa lock.
+"""
+import logging
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+import db_breaker
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ADVISORY_LOCK = os.environ.get("SINGLE_FLIGHT_ADVISORY_LOCK", "0") == "1"
+SINGLE_FLIGHT_LOCK_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_LOCK_TIMEOUT", "60"))
+_LOCK_POLL = 0.2
+
+
+def _int4(value: int) -> int:
+    return value - 2**32 if value >= 2**31 else value
+
+
+# Kunci advisory lock: (namespace aplikasi, crc32 nama snapshot)
+_LOCK_NAMESPACE = _int4(zlib.crc32(b"dashboard-loader"))
+
+
+# -------------------------------------------------
+# ADVISORY LOCK POSTGRESQL (antar worker)
+# -------------------------------------------------
+def _acquire(name: str):
+    """Koneksi yang memegang advisory lock `name`, atau None (lanjut tanpa lock)."""
+    from database import get_db_engine
+
+    if db_breaker.is_open():
+        return None
+    key = {"ns": _LOCK_NAMESPACE, "k": _int4(zlib.crc32(name.encode()))}
+    try:
+        conn = get_db_engine().connect()
+    except Exception as e:
+        logger.warning(f"⚠️  [SINGLE FLIGHT] {name}: advisory lock dilewati, DB tidak tersedia ({e.__class__.__name__})")
+        return None
+
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_TIMEOUT
+    waited = False
+    try:
+        while not conn.execute(text("SELECT pg_try_advisory_lock(:ns, :k)"), key).scalar():
+            if time.monotonic() >= deadline:
+                logger.warning(f"⚠️  [SINGLE FLIGHT] {name}: advisory lock tidak didapat, memuat tanpa lock")
+                conn.close()
+                return None
+            if not waited:
+                logger.info(f"⏳ [SINGLE FLIGHT] {name}: menunggu worker lain selesai memuat")
+                waited = True
+            time.sleep(_LOCK_POLL)
+    except Exception as e:
+        logger.warning(f"⚠️  [SINGLE FLIGHT] {name}: advisory lock gagal ({e.__class__.__name__}), memuat tanpa lock")
+        conn.invalidate()
+        return None
+    return conn
+
+
+def _release(conn, name: str):
+    key = {"ns": _LOCK_NAMESPACE, "k": _int4(zlib.crc32(name.encode()))}
+    try:
+        conn.execute(text("SELECT pg_advisory_unlock(:ns, :k)"), key)
+        conn.close()
+    except Exception as e:
+        # Tutup koneksi fisiknya: lock level sesi ikut lepas
+        logger.warning(f"⚠️  [SINGLE FLIGHT] {name}: unlock gagal, koneksi dibuang ({e.__class__.__name__})")
+        conn.invalidate()
+
+
+@contextmanager
+def advisory_lock(name: str):
+    """Pegang advisory lock `name` selama blok berjalan (kalau diaktifkan & DB tersedia)."""
+    conn = _acquire(name) if SINGLE_FLIGHT_ADVISORY_LOCK else None
+    try:
+        yield conn is not None
+    finally:
+        if conn is not None:
+            _release(conn, name)
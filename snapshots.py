@@ -0,0 +1,271 @@
+# snapshots.py
+"""
+Snapshot data yang dimuat ulang di background (stale-while-revalidate).
+
+Modul dataset mendaftarkan builder-nya lewat register(). Request cukup
+memanggil get(nama): selalu mendapat snapshot terakhir yang berhasil
+dibangun, tanpa menunggu loader. Hanya pemanggil pertama (cache dingin)
+yang membangun snapshot secara sinkron.
+
+Satu thread refresher per proses (lazy, aman setelah fork) memuat ulang
+snapshot yang sudah pernah dipakai kalau:
+- versi data sumbernya berubah (data_versions: file di data/, submit-data,
+  NOTIFY dari worker lain) — thread dibangunkan langsung oleh event, atau
+- umurnya melewati interval snapshot tersebut.
+Hasil baru dipasang dengan satu assignment (atomic swap); kalau builder
+gagal, snapshot lama tetap dipakai dan dicoba lagi setelah SNAPSHOT_RETRY.
+
+Snapshot turunan (register(..., source=nama)) tidak memuat data sendiri:
+builder-nya menerima nilai snapshot sumber dan dijalankan ulang setiap kali
+sumber itu berganti. Dengan begitu satu tabel cukup dimuat sekali per versi
+data walau dipakai beberapa struktur (frame query, cube, matriks).
+
+Builder snapshot yang membaca DB dijalankan di bawah advisory lock
+PostgreSQL per nama (single_flight, opsional), jadi antar worker hanya satu
+yang memuat snapshot yang sama pada satu waktu.
+
+Selama circuit breaker DB terbuka (db_breaker), snapshot yang bersumber dari
+DB tidak dimuat ulang (loader hanya akan jatuh ke Excel); begitu breaker
+tertutup semua snapshot yang sudah dipakai dimuat ulang.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+import data_versions
+import db_breaker
+from single_flight import advisory_lock
+
+logger = logging.getLogger(__name__)
+
+# Umur maksimum default snapshot sebelum dimuat ulang (detik)
+SNAPSHOT_REFRESH_INTERVAL = float(os.environ.get("SNAPSHOT_REFRESH_INTERVAL", "300"))
+# Jeda sebelum mencoba lagi builder yang gagal
+SNAPSHOT_RETRY = float(os.environ.get("SNAPSHOT_RETRY", "30"))
+# Refresher memeriksa umur snapshot minimal sekali per SNAPSHOT_TICK detik
+SNAPSHOT_TICK = float(os.environ.get("SNAPSHOT_TICK", "5"))
+
+_registry = {}   # nama → dict(builder, dataset, interval, db, source)
+_snapshots = {}  # nama → (versi, waktu_muat, nilai)
+_status = {}     # nama → dict(refreshing, last_error, last_duration_ms, retry_at, source_at)
+_locks = {}
+_forced = set()  # nama snapshot yang harus dimuat ulang di putaran berikutnya
+_swapped = threading.Condition()
+_started = False
+_start_lock = threading.Lock()
+
+
+def register(name: str, builder, dataset: str | None = None, interval: float | None = None, db: bool = True,
+             source: str | None = None):
+    """
+    Daftarkan snapshot `name` yang dibangun oleh builder() tanpa argumen.
+    `dataset` = nama di data_versions yang menentukan versinya (default: name).
+    `db` = builder membaca PostgreSQL (ditahan selama breaker DB terbuka).
+    `source` = snapshot turunan: builder(nilai_source) dijalankan setiap kali
+    snapshot `source` (harus sudah terdaftar) berganti; versinya ikut source.
+    """
+    if source is not None:
+        dataset = dataset or _registry[source]["dataset"]
+        interval, db = _registry[source]["interval"], False
+    _registry[name] = dict(
+        builder=builder,
+        dataset=dataset or name,
+        interval=SNAPSHOT_REFRESH_INTERVAL if interval is None else interval,
+        db=db,
+        source=source,
+    )
+    _locks.setdefault(name, threading.Lock())
+    _status.setdefault(name, dict(refreshing=False, last_error=None, last_duration_ms=None, retry_at=0.0, source_at=None))
+
+
+def _build(name: str):
+    """
+    Bangun snapshot `name` lalu pasang; versi dibaca sebelum builder jalan.
+    Snapshot turunan dibangun dari nilai snapshot sumber saat ini (dimuat
+    dulu kalau belum ada) dan memakai versinya.
+    """
+    spec = _registry[name]
+    status = _status[name]
+    if spec["source"] is not None:
+        get(spec["source"])
+        version, source_at, source_value = _snapshots[spec["source"]]
+    else:
+        version = data_versions.get_version(spec["dataset"])
+    status["refreshing"] = True
+    start = time.perf_counter()
+    try:
+        if spec["source"] is not None:
+            value = spec["builder"](source_value)
+        else:
+            with advisory_lock(name) if spec["db"] else nullcontext():
+                value = spec["builder"]()
+    except Exception as e:
+        status["last_error"] = f"{e.__class__.__name__}: {e}"
+        status["retry_at"] = time.monotonic() + SNAPSHOT_RETRY
+        raise
+    finally:
+        status["refreshing"] = False
+    status["last_duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    status["last_error"] = None
+    if spec["source"] is not None:
+        status["source_at"] = source_at
+    with _swapped:
+        _snapshots[name] = (version, time.monotonic(), value)
+        _swapped.notify_all()
+    return value
+
+
+# -------------------------------------------------
+# API PUBLIK
+# -------------------------------------------------
+def get(name: str):
+    """
+    Snapshot terakhir `name`. Dibangun sinkron hanya kalau belum pernah ada;
+    selebihnya pembaruan berjalan di thread refresher.
+    """
+    ensure_started()
+    snap = _snapshots.get(name)
+    if snap is not None:
+        return snap[2]
+    with _locks[name]:
+        snap = _snapshots.get(name)
+        if snap is not None:
+            return snap[2]
+        return _build(name)
+
+
+def is_loaded(name: str) -> bool:
+    """True kalau snapshot `name` sudah ada (get() tidak akan memuat apa pun)."""
+    return name in _snapshots
+
+
+def refresh(name: str) -> bool:
+    """Muat ulang snapshot sekarang; True kalau berhasil (gagal → snapshot lama tetap)."""
+    with _locks[name]:
+        try:
+            _build(name)
+        except Exception as e:
+            logger.error(f"❌ [SNAPSHOT] {name}: gagal dimuat ulang, tetap memakai snapshot lama: {e}")
+            return False
+    logger.info(f"🔄 [SNAPSHOT] {name} diperbarui ({_status[name]['last_duration_ms']:.0f} ms)")
+    return True
+
+
+def served_version(dataset: str) -> int:
+    """
+    Versi data `dataset` yang benar-benar sedang dilayani: versi snapshot
+    tertua yang bergantung padanya (atau versi terkini kalau belum ada
+    snapshot). Dipakai untuk kunci cache context supaya context tidak
+    tersimpan dengan versi yang lebih baru dari datanya.
+    """
+    versions = [
+        snap[0] for name, snap in list(_snapshots.items())
+        if _registry[name]["dataset"] == dataset
+    ]
+    return min(versions) if versions else data_versions.get_version(dataset)
+
+
+def wait_served(dataset: str, version: int, timeout: float) -> bool:
+    """Tunggu (maks `timeout` detik) sampai semua snapshot `dataset` minimal versi `version`."""
+    with _swapped:
+        return _swapped.wait_for(lambda: served_version(dataset) >= version, timeout=timeout)
+
+
+def status() -> dict:
+    """Kondisi tiap snapshot terdaftar: versi, umur (detik), usang/tidak, error terakhir."""
+    now = time.monotonic()
+    result = {}
+    for name, spec in _registry.items():
+        snap = _snapshots.get(name)
+        st = _status[name]
+        latest = data_versions.get_version(spec["dataset"])
+        result[name] = dict(
+            dataset=spec["dataset"],
+            loaded=snap is not None,
+            version=str(snap[0]) if snap else None,
+            latest_version=str(latest),
+            age_seconds=round(now - snap[1], 1) if snap else None,
+            stale=snap is not None and _stale(name, snap, now),
+            refresh_interval=spec["interval"],
+            refreshing=st["refreshing"],
+            last_duration_ms=st["last_duration_ms"],
+            last_error=st["last_error"],
+        )
+    return result
+
+
+# -------------------------------------------------
+# THREAD REFRESHER
+# -------------------------------------------------
+def _stale(name: str, snap: tuple, now: float) -> bool:
+    spec = _registry[name]
+    if spec["source"] is not None:
+        # Turunan usang kalau sumbernya sudah diganti sejak turunan dibangun
+        source = _snapshots.get(spec["source"])
+        return source is not None and source[1] != _status[name]["source_at"]
+    return snap[0] != data_versions.get_version(spec["dataset"]) or now - snap[1] >= spec["interval"]
+
+
+def _due(name: str, now: float) -> bool:
+    snap = _snapshots.get(name)
+    if snap is None:
+        return False  # belum pernah dipakai
+    spec = _registry[name]
+    if spec["db"] and db_breaker.is_open():
+        return False  # DB mati: snapshot terakhir lebih baik daripada fallback Excel
+    if name in _forced:
+        _forced.discard(name)
+        return True
+    if _status[name]["retry_at"] > now:
+        return False
+    return _stale(name, snap, now)
+
+
+def _refresh_all_after_recovery():
+    # Turunan ikut diperbarui begitu sumbernya diganti
+    _forced.update(name for name in _snapshots if _registry[name]["source"] is None)
+
+
+db_breaker.add_listener(_refresh_all_after_recovery)
+
+
+def _refresh_loop():
+    seq = data_versions.current_seq()
+    while True:
+        try:
+            seq, _ = data_versions.wait_events(seq, timeout=SNAPSHOT_TICK)
+            for name in list(_registry):
+                if _due(name, time.monotonic()):
+                    refresh(name)
+        except Exception as e:
+            logger.error(f"❌ [SNAPSHOT] Refresher error: {e}")
+            time.sleep(SNAPSHOT_TICK)
+
+
+def ensure_started():
+    """Mulai thread refresher sekali per proses (lazy, aman setelah fork)."""
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        data_versions.ensure_started()
+        threading.Thread(target=_refresh_loop, name="snapshot-refresh", daemon=True).start()
+        _started = True
+
+
+def _reset_after_fork():
+    # Thread tidak ikut ter-fork; snapshot milik master tetap dipakai sampai diperbarui
+    global _started, _swapped, _start_lock
+    _started = False
+    _swapped = threading.Condition()
+    _start_lock = threading.Lock()
+    for name in _locks:
+        _locks[name] = threading.Lock()
+        _status[name]["refreshing"] = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,51 @@
+// Muat ulang halaman hanya kalau dataset yang dipakai halaman ini berubah.
+// Dipasang lewat:
+//   <script src=".../data-versions.js" data-datasets="perbankan,umkm" defer></script>
+;(function () {
+  const script = document.currentScript
+  if (!script || !window.EventSource) return
+
+  const datasets = (script.dataset.datasets || '')
+    .split(',')
+    .map((s) => s.trim())
+    .filter(Boolean)
+  const url = script.dataset.url || '/events/data-versions'
+
+  // Patokan = snapshot pertama dari server. Tiap worker punya salinan versi
+  // sendiri, jadi halaman tidak dibandingkan dengan versi saat dirender
+  // (bisa beda worker → reload berulang).
+  let known = null
+
+  let reloadTimer = null
+  const scheduleReload = () => {
+    // Beberapa event beruntun (mis. satu file → beberapa dataset) cukup satu reload
+    if (reloadTimer) return
+    reloadTimer = setTimeout(() => window.location.reload(), 1000)
+  }
+
+  // Versi = nanodetik (string dari server), dibandingkan sebagai BigInt
+  const changed = (dataset, version) =>
+    known !== null &&
+    datasets.includes(dataset) &&
+    version !== undefined &&
+    BigInt(version) > BigInt(known[dataset] || 0)
+
+  const source = new EventSource(url)
+
+  source.addEventListener('snapshot', (e) => {
+    const versions = JSON.parse(e.data)
+    if (known === null) {
+      known = versions
+      return
+    }
+    // Reconnect: tangkap perubahan yang terjadi selama koneksi terputus
+    if (datasets.some((d) => changed(d, versions[d]))) scheduleReload()
+  })
+
+  source.addEventListener('data-version', (e) => {
+    const ev = JSON.parse(e.data)
+    if (changed(ev.dataset, ev.version)) scheduleReload()
+  })
+
+  window.addEventListener('beforeunload', () => source.close())
+})()
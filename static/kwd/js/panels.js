@@ -0,0 +1,25 @@
+// Isi panel dashboard (KPI, tabel, legend) dimuat terpisah dari shell HTML.
+// Dipasang lewat (tanpa defer, sebelum script chart halaman):
+//   <script src=".../panels.js" data-url="/api/panels/perbankan?v=..."></script>
+// Elemen <... data-panel="nama"> diisi HTML dari JSON {nama: html}.
+// window.kwdPanels = Promise yang selesai setelah panel terpasang, supaya
+// chart baru digambar setelah canvas di dalam panel ada.
+;(function () {
+  const script = document.currentScript
+  const url = script && script.dataset.url
+
+  const fill = (panels) => {
+    document.querySelectorAll('[data-panel]').forEach((el) => {
+      const html = panels[el.dataset.panel]
+      if (html !== undefined) el.innerHTML = html
+    })
+    document.dispatchEvent(new CustomEvent('panels:loaded'))
+  }
+
+  window.kwdPanels = url
+    ? fetch(url, { credentials: 'same-origin' })
+        .then((r) => (r.ok ? r.json() : Promise.reject(new Error('HTTP ' + r.status))))
+        .then(fill)
+        .catch((e) => console.error('Gagal memuat panel dashboard:', e))
+    : Promise.resolve()
+})()
@@ -0,0 +1,80 @@
+# templating.py
+"""
+Bytecode cache Jinja + kompilasi template saat boot.
+
+Tanpa ini setiap worker gunicorn mengompilasi template (sampai ~60 KB) saat
+render pertama, dan mengulanginya setiap restart. Dengan FileSystemBytecodeCache
+hasil kompilasi disimpan di disk dan dipakai bersama oleh semua worker;
+precompile_templates() memuat semuanya saat startup sehingga request pertama
+tidak membayar biaya kompilasi.
+
+Juga: macro format bersama (register_macros) dan render block per panel
+(render_blocks) untuk isi dashboard yang dimuat terpisah dari shell HTML.
+"""
+import logging
+import os
+import tempfile
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+MACRO_TEMPLATE = "macros/format.html"
+
+JINJA_CACHE_DIR = os.environ.get(
+    "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dashboard-kopg-jinja")
+)
+
+
+def init_template_cache(app, cache_dir: str = JINJA_CACHE_DIR):
+    """
+    Pasang FileSystemBytecodeCache. Harus dipanggil sebelum app.jinja_env
+    pertama kali diakses (opsi dibaca saat environment dibuat).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(cache_dir)}
+    return app
+
+
+def precompile_templates(app) -> int:
+    """Muat (kompilasi / ambil dari bytecode cache) semua template; return jumlahnya."""
+    env = app.jinja_env
+    start = time.perf_counter()
+    count = 0
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+            count += 1
+        except Exception as e:
+            logger.error(f"❌ [TEMPLATE] Gagal kompilasi {name}: {e}")
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info(f"🧩 [TEMPLATE] {count} template siap dalam {elapsed:.0f} ms")
+    return count
+
+
+def register_macros(app, name: str = MACRO_TEMPLATE):
+    """
+    Jadikan macro di template `name` global Jinja. Macro top-level sebuah
+    template tidak terlihat saat satu block-nya dirender sendiri, global terlihat.
+    """
+    module = app.jinja_env.get_template(name).module
+    macros = {k: v for k, v in vars(module).items() if not k.startswith("_")}
+    app.jinja_env.globals.update(macros)
+    return macros
+
+
+def render_blocks(app, template_name: str, prefix: str, context: dict) -> dict:
+    """
+    Render setiap block `prefix*` dari template secara terpisah.
+    Return: dict nama block → HTML. Harus dipanggil di dalam request context.
+    """
+    template = app.jinja_env.get_template(template_name)
+    context = dict(context)
+    app.update_template_context(context)
+    ctx = template.new_context(context)
+    return {
+        name: "".join(block(ctx))
+        for name, block in template.blocks.items()
+        if name.startswith(prefix)
+    }